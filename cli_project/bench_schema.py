@@ -0,0 +1,171 @@
+"""Benchmark for converting MCP tool schemas to Gemini function declarations.
+
+Generates catalogs of tools with pydantic-style input schemas (nested
+models behind `$ref`, optional fields and models as `anyOf` with null,
+enums, lists of objects) and times the converter cold, with a warm cache,
+and after one tool of the catalog changes. Every declaration is also
+checked against the Gemini SDK's own FunctionDeclaration type when the SDK
+is installed.
+
+    python bench_schema.py
+    python bench_schema.py --tools 500 --servers 5 --runs 20 --json
+"""
+import argparse
+import copy
+import enum
+import json
+import statistics
+import sys
+import time
+from typing import Optional
+
+from pydantic import BaseModel, Field, create_model
+
+from core.gemini_schema import SchemaCache, convert_schema
+
+
+class Priority(str, enum.Enum):
+    low = "low"
+    normal = "normal"
+    high = "high"
+
+
+class Range(BaseModel):
+    start: int = Field(description="First line, 1-based")
+    end: Optional[int] = Field(None, description="Last line; to the end when omitted")
+
+
+class Filter(BaseModel):
+    field: str
+    values: list[str] = Field(default_factory=list)
+    ranges: list[Range] = Field(default_factory=list)
+
+
+def make_catalog(tools: int, servers: int) -> list[dict]:
+    """Tool dicts in the shape ToolManager.get_all_tools returns."""
+    catalog = []
+    for i in range(tools):
+        model = create_model(
+            f"Tool{i}Input",
+            doc_id=(str, Field(description="The ID of the document.")),
+            priority=(Priority, Priority.normal),
+            filters=(list[Filter], Field(default_factory=list)),
+            limit=(Optional[int], Field(None, ge=1, le=100)),
+            window=(Optional[Range], None),
+            **{f"option_{i % 7}": (Optional[bool], None)},
+        )
+        catalog.append(
+            {
+                "name": f"server{i % servers}_tool_{i}",
+                "description": f"Tool {i} served by server {i % servers}.",
+                "input_schema": model.model_json_schema(),
+            }
+        )
+    return catalog
+
+
+def timed(fn, runs: int) -> float:
+    """Median milliseconds per call of `fn` over `runs` calls."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def validate(declarations: list[dict]) -> Optional[str]:
+    """Returns an error when the Gemini SDK rejects a declaration."""
+    try:
+        from google.generativeai.types import content_types
+    except ImportError:
+        return None
+    for declaration in declarations:
+        try:
+            content_types.FunctionDeclaration(**declaration)
+        except Exception as e:
+            return f"{declaration['name']}: {e}"
+    return None
+
+
+def run(tools: int, servers: int, runs: int) -> dict:
+    catalog = make_catalog(tools, servers)
+
+    def cold():
+        SchemaCache().convert_tools(catalog)
+
+    def uncached():
+        for tool in catalog:
+            convert_schema(tool["input_schema"])
+
+    warm_cache = SchemaCache()
+    warm_cache.convert_tools(catalog)
+    rebuilt = [copy.deepcopy(catalog) for _ in range(runs)]
+    rebuilt_versions = iter(rebuilt)
+
+    def warm():
+        # Equal content in new objects, like a fresh tools/list response
+        warm_cache.convert_tools(next(rebuilt_versions))
+
+    def warm_same_objects():
+        warm_cache.convert_tools(catalog)
+
+    changed = [copy.deepcopy(catalog) for _ in range(runs)]
+    for version, variant in enumerate(changed):
+        variant[0]["description"] += f" (v{version})"
+        variant[0]["input_schema"]["properties"]["doc_id"]["description"] += f" v{version}"
+    versions = iter(changed)
+    changed_cache = SchemaCache()
+    changed_cache.convert_tools(catalog)
+
+    def one_changed():
+        changed_cache.convert_tools(next(versions))
+
+    report = {
+        "tools": tools,
+        "servers": servers,
+        "schema_bytes": sum(len(json.dumps(t["input_schema"])) for t in catalog),
+        "uncached_ms": round(timed(uncached, runs), 3),
+        "cold_ms": round(timed(cold, runs), 3),
+        "warm_ms": round(timed(warm, runs), 3),
+        "warm_same_objects_ms": round(timed(warm_same_objects, runs), 3),
+        "one_changed_ms": round(timed(one_changed, runs), 3),
+        "schemas_converted_per_change": (changed_cache.misses - tools) / runs,
+    }
+    report["validation_error"] = validate(warm_cache.convert_tools(catalog))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tools", type=int, default=300)
+    parser.add_argument("--servers", type=int, default=3)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    report = run(args.tools, args.servers, args.runs)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(
+            f"{report['tools']} tools from {report['servers']} servers "
+            f"({report['schema_bytes'] / 1024:.0f} KiB of schemas), median of {args.runs} runs"
+        )
+        print(f"  uncached conversion   {report['uncached_ms']:>9.3f} ms")
+        print(f"  cold cache            {report['cold_ms']:>9.3f} ms")
+        print(f"  warm catalog          {report['warm_ms']:>9.3f} ms")
+        print(f"  warm, same objects    {report['warm_same_objects_ms']:>9.3f} ms")
+        print(
+            f"  one tool changed      {report['one_changed_ms']:>9.3f} ms "
+            f"({report['schemas_converted_per_change']:g} schemas converted)"
+        )
+        if report["validation_error"]:
+            print(f"  rejected by the Gemini SDK: {report['validation_error']}")
+
+    sys.exit(1 if report["validation_error"] else 0)
+
+
+if __name__ == "__main__":
+    main()
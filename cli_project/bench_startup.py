@@ -0,0 +1,112 @@
+"""Startup benchmark for the CLI and the MCP server.
+
+Runs `python -X importtime` for each entry point, reports the median
+import time and fails when it exceeds the threshold or when a module that
+should be deferred is loaded at startup.
+
+    python bench_startup.py
+    python bench_startup.py --runs 10 --max-cli-ms 900 --max-server-ms 900
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+# Modules that must not be imported just by starting each entry point
+FORBIDDEN = {
+    "cli": ["google.generativeai", "anthropic", "prompt_toolkit"],
+    "server": ["google.generativeai", "anthropic", "prompt_toolkit"],
+}
+
+ENTRY_POINTS = {
+    "cli": "import main",
+    "server": "import mcp_server",
+}
+
+
+def measure(code: str) -> tuple[float, set[str]]:
+    """Returns (total import time in ms, imported module names)."""
+    env = {**os.environ, "GOOGLE_API_KEY": os.getenv("GOOGLE_API_KEY") or "bench"}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"'{code}' failed:\n{result.stderr[-2000:]}")
+
+    total_us = 0
+    modules = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, _cumulative, name = line[len("import time:") :].split("|")
+        if not self_us.strip().isdigit():
+            continue  # header line
+        total_us += int(self_us)
+        modules.add(name.strip())
+    return total_us / 1000, modules
+
+
+def run(runs: int, thresholds: dict[str, float]) -> dict:
+    report = {}
+    for target, code in ENTRY_POINTS.items():
+        timings = []
+        modules: set[str] = set()
+        for _ in range(runs):
+            elapsed, modules = measure(code)
+            timings.append(elapsed)
+
+        loaded = sorted(
+            name
+            for name in FORBIDDEN[target]
+            if any(m == name or m.startswith(name + ".") for m in modules)
+        )
+        median = statistics.median(timings)
+        report[target] = {
+            "median_ms": round(median, 1),
+            "min_ms": round(min(timings), 1),
+            "max_ms": round(max(timings), 1),
+            "modules": len(modules),
+            "threshold_ms": thresholds[target],
+            "forbidden_loaded": loaded,
+            "ok": median <= thresholds[target] and not loaded,
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-cli-ms", type=float, default=1000)
+    parser.add_argument("--max-server-ms", type=float, default=1000)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    report = run(
+        args.runs, {"cli": args.max_cli_ms, "server": args.max_server_ms}
+    )
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for target, stats in report.items():
+            status = "OK" if stats["ok"] else "FAIL"
+            print(
+                f"[{status}] {target}: median {stats['median_ms']}ms "
+                f"(min {stats['min_ms']}, max {stats['max_ms']}, "
+                f"threshold {stats['threshold_ms']}ms, {stats['modules']} modules)"
+            )
+            if stats["forbidden_loaded"]:
+                print(f"       eagerly imported: {', '.join(stats['forbidden_loaded'])}")
+
+    sys.exit(0 if all(s["ok"] for s in report.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import asyncio
+import json
+import sys
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, TextIO, Tuple
+
+from core.chat import Chat
+from core import scheduler
+
+
+class _WorkerError:
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+async def run_bounded(
+    items: Iterable[Any] | AsyncIterator[Any],
+    worker: Callable[[Any], Awaitable[Any]],
+    concurrency: int,
+) -> AsyncIterator[Any]:
+    """Runs `worker` over `items` with at most `concurrency` in flight.
+
+    Results are yielded as they complete, not in input order. Items are
+    pulled lazily, so arbitrarily long inputs run in constant memory.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+
+    pending: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+    results: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    async def feed():
+        try:
+            if hasattr(items, "__aiter__"):
+                async for item in items:
+                    await pending.put(item)
+            else:
+                for item in items:
+                    await pending.put(item)
+        except Exception as e:
+            await results.put(_WorkerError(e))
+            return
+        # Only after a complete feed: when cancelled, the workers are
+        # cancelled too and nobody would drain the bounded queue.
+        for _ in range(concurrency):
+            await pending.put(done)
+
+    async def work():
+        while True:
+            item = await pending.get()
+            if item is done:
+                await results.put(done)
+                return
+            try:
+                await results.put(await worker(item))
+            except Exception as e:
+                await results.put(_WorkerError(e))
+
+    tasks = [asyncio.create_task(feed())]
+    tasks += [asyncio.create_task(work()) for _ in range(concurrency)]
+
+    try:
+        finished = 0
+        while finished < concurrency:
+            result = await results.get()
+            if result is done:
+                finished += 1
+                continue
+            if isinstance(result, _WorkerError):
+                raise result.error
+            yield result
+        await tasks[0]
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def read_queries(stream: TextIO) -> AsyncIterator[Tuple[int, str]]:
+    """Reads (line number, line) for every non-blank line of a JSONL stream.
+
+    Lines are parsed by `parse_query` per query, so a malformed line fails
+    only its own result.
+    """
+    line_number = 0
+    while True:
+        line = await asyncio.to_thread(stream.readline)
+        if not line:
+            return
+        line_number += 1
+        line = line.strip()
+        if line:
+            yield line_number, line
+
+
+def parse_query(line: str, line_number: int) -> Dict[str, Any]:
+    """Parses a query line: {"id": ..., "query": ...} or a plain string.
+    The ID defaults to the line number; the query is checked by the caller
+    so a record without one still reports its own ID."""
+    record = json.loads(line)
+    if isinstance(record, str):
+        record = {"query": record}
+    if not isinstance(record, dict):
+        raise ValueError(f"expected an object or a string, got {type(record).__name__}")
+    record.setdefault("id", line_number)
+    return record
+
+
+async def run_batch(
+    chat_factory: Callable[[], Chat],
+    input_stream: TextIO,
+    output_stream: TextIO,
+    concurrency: int = 4,
+) -> Dict[str, Any]:
+    """Runs every query in its own Chat session and writes JSONL results.
+
+    Sessions share the MCP clients passed to `chat_factory`; only the
+    conversation state is per query.
+    """
+
+    async def run_query(item: Tuple[int, str]) -> Dict[str, Any]:
+        line_number, line = item
+        started_at = time.time()
+        start = time.perf_counter()
+        result: Dict[str, Any] = {"id": line_number}
+        try:
+            record = parse_query(line, line_number)
+            result["id"] = record["id"]
+            query = record.get("query")
+            if not isinstance(query, str):
+                raise ValueError('missing "query" string')
+            result["query"] = query
+            chat = chat_factory()
+            with scheduler.priority(scheduler.BATCH):
+                result["response"] = await chat.run(query)
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        result["started_at"] = started_at
+        result["duration_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        return result
+
+    summary = {"queries": 0, "errors": 0}
+    start = time.perf_counter()
+
+    async for result in run_bounded(
+        read_queries(input_stream), run_query, concurrency
+    ):
+        summary["queries"] += 1
+        summary["errors"] += "error" in result
+        output_stream.write(json.dumps(result, ensure_ascii=False) + "\n")
+        output_stream.flush()
+
+    summary["duration_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    print(
+        f"Batch finished: {summary['queries']} queries, "
+        f"{summary['errors']} errors in {summary['duration_ms']:.0f}ms",
+        file=sys.stderr,
+    )
+    return summary
@@ -0,0 +1,275 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+CACHE_MODES = ("off", "readwrite", "record", "replay")
+
+
+class CacheMissError(LookupError):
+    """Raised in replay mode when a request has no recorded response."""
+
+
+def _json_default(value: Any) -> Any:
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    if hasattr(value, "__dict__"):
+        return vars(value)
+    return str(value)
+
+
+def request_fingerprint(
+    model: str,
+    system: Any,
+    messages: Any,
+    tools: Any,
+    temperature: float,
+    **extra: Any,
+) -> str:
+    """Returns a stable hash for a provider request."""
+    payload = {
+        "model": model,
+        "system": system,
+        "messages": messages,
+        "tools": tools,
+        "temperature": temperature,
+        **extra,
+    }
+    canonical = json.dumps(
+        payload,
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=_json_default,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class MemoryCacheBackend:
+    """In-process LRU backend."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: str):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def close(self):
+        pass
+
+
+class DiskCacheBackend:
+    """SQLite-backed LRU backend bounded by entry count and total bytes."""
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 10000,
+        max_bytes: Optional[int] = None,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE responses SET last_access = ? WHERE key = ?",
+                (time.time(), key),
+            )
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key: str, value: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, len(value.encode("utf-8")), time.time()),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        count, total = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+
+        while count > self.max_entries or (
+            self.max_bytes is not None and total > self.max_bytes and count > 1
+        ):
+            key, size = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_access LIMIT 1"
+            ).fetchone()
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            count -= 1
+            total -= size
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCache:
+    """Stores serialized provider responses under a request fingerprint.
+
+    Modes:
+        readwrite: serve hits, call the provider and store on a miss.
+        record: always call the provider and overwrite the stored response.
+        replay: serve hits only; a miss raises CacheMissError.
+    """
+
+    def __init__(self, backend, mode: str = "readwrite"):
+        if mode not in CACHE_MODES or mode == "off":
+            raise ValueError(f"Invalid cache mode: {mode}")
+        self.backend = backend
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[dict]:
+        if self.mode == "record":
+            return None
+
+        raw = self.backend.get(key)
+        if raw is None:
+            self.misses += 1
+            if self.mode == "replay":
+                raise CacheMissError(f"No recorded response for request {key}")
+            return None
+
+        self.hits += 1
+        return json.loads(raw)
+
+    def put(self, key: str, value: dict):
+        self.backend.put(key, json.dumps(value, default=_json_default))
+
+    def close(self):
+        self.backend.close()
+
+    @classmethod
+    def from_env(cls) -> Optional["ResponseCache"]:
+        """Builds a cache from LLM_CACHE_* variables, or None when disabled."""
+        mode = os.getenv("LLM_CACHE_MODE", "off")
+        if mode == "off":
+            return None
+
+        max_entries = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+        max_bytes = os.getenv("LLM_CACHE_MAX_BYTES")
+        path = os.getenv("LLM_CACHE_PATH", ".llm_cache.sqlite3")
+
+        if path == ":memory:":
+            backend = MemoryCacheBackend(max_entries=max_entries)
+        else:
+            backend = DiskCacheBackend(
+                path,
+                max_entries=max_entries,
+                max_bytes=int(max_bytes) if max_bytes else None,
+            )
+        return cls(backend, mode=mode)
+
+
+class CachedProvider:
+    """Wraps a provider (Gemini, Claude) and caches its chat responses.
+
+    Every other attribute is forwarded to the wrapped provider, so the
+    wrapper can be passed anywhere a provider is expected.
+    """
+
+    def __init__(self, provider, cache: ResponseCache):
+        self.provider = provider
+        self.cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self.provider, name)
+
+    def _model_id(self) -> str:
+        provider = self.provider
+        # Look through other wrappers (e.g. ScheduledProvider)
+        while hasattr(provider, "provider"):
+            provider = provider.provider
+        model = getattr(provider, "model_name", None) or getattr(
+            provider, "model", ""
+        )
+        return f"{type(provider).__name__}:{model}"
+
+    def chat(
+        self,
+        messages,
+        system=None,
+        temperature=1.0,
+        stop_sequences=[],
+        tools=None,
+        thinking=False,
+        thinking_budget=1024,
+    ):
+        key = request_fingerprint(
+            model=self._model_id(),
+            system=system,
+            messages=messages,
+            tools=tools,
+            temperature=temperature,
+            stop_sequences=stop_sequences,
+            thinking=thinking,
+            thinking_budget=thinking_budget if thinking else None,
+        )
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            return self.provider.message_from_dict(cached)
+
+        response = self.provider.chat(
+            messages=messages,
+            system=system,
+            temperature=temperature,
+            stop_sequences=stop_sequences,
+            tools=tools,
+            thinking=thinking,
+            thinking_budget=thinking_budget,
+        )
+        self.cache.put(key, self.provider.message_to_dict(response))
+        return response
@@ -1,47 +1,135 @@
+import asyncio
+
 from core.gemini import Gemini
 from mcp_client import MCPClient
 from core.tools import ToolManager
-from typing import Dict, Any
+from core.tool_memo import ToolCallMemo
+from core import deadline, profiling, tracing
+from core.session_log import SessionLog
+from typing import Dict, Any, Optional
 
 
 class Chat:
-    def __init__(self, gemini_service: Gemini, clients: dict[str, MCPClient]):
+    def __init__(
+        self,
+        gemini_service: Gemini,
+        clients: dict[str, MCPClient],
+        verbose: bool = True,
+        session_log: Optional[SessionLog] = None,
+        tool_memo_scope: Optional[str] = "turn",
+        turn_timeout: Optional[float] = None,
+        max_iterations: int = 20,
+    ):
         self.gemini_service: Gemini = gemini_service
         self.clients: dict[str, MCPClient] = clients
         self.messages: list[Dict[str, Any]] = []
+        self.verbose = verbose
+        self.session_log = session_log
+        # "turn" reuses read-only tool results within one run, "session"
+        # across runs, None disables memoization.
+        if tool_memo_scope not in ("turn", "session", None):
+            raise ValueError(f"Invalid tool memo scope: {tool_memo_scope}")
+        self.tool_memo_scope = tool_memo_scope
+        self.tool_memo = ToolCallMemo() if tool_memo_scope else None
+        self.turn_timeout = turn_timeout
+        if max_iterations < 1:
+            raise ValueError(f"max_iterations must be at least 1: {max_iterations}")
+        self.max_iterations = max_iterations
+
+    def resume(self, last_turns: Optional[int] = None):
+        """Restores the conversation from the session log."""
+        if self.session_log is not None:
+            self.messages = self.session_log.load_messages(last_turns)
 
     async def _process_query(self, query: str):
         self.messages.append({"role": "user", "content": query})
 
+    def _rollback(self, turn_start: int):
+        """Removes the messages added by a failed or cancelled turn."""
+        del self.messages[turn_start:]
+
     async def run(
         self,
         query: str,
     ) -> str:
+        """Runs one turn of the conversation.
+
+        The turn is bounded by `turn_timeout` and `max_iterations`. If it
+        fails, times out or is cancelled, the messages it added are rolled
+        back so the conversation stays usable.
+        """
         final_text_response = ""
+        turn_start = len(self.messages)
+        if self.tool_memo_scope == "turn":
+            self.tool_memo.clear()
+
+        try:
+            with tracing.span("chat.turn") as turn_span, deadline.within(
+                self.turn_timeout
+            ), profiling.turn():
+                await deadline.wait_for(self._process_query(query))
+
+                iterations = 0
+                for iteration in range(self.max_iterations):
+                    # The last iteration goes without tools, so the model
+                    # has to answer with what it has gathered so far.
+                    last = iteration == self.max_iterations - 1
+                    iterations = iteration + 1
+                    with tracing.span("chat.iteration", iteration=iteration):
+                        tools = (
+                            None
+                            if last
+                            else await deadline.wait_for(
+                                ToolManager.get_all_tools(self.clients)
+                            )
+                        )
+
+                        with tracing.span(
+                            "provider.chat", messages=len(self.messages)
+                        ) as provider_span:
+                            # Provider SDKs are blocking; run them off the event
+                            # loop so concurrent sessions don't serialize.
+                            response = await deadline.wait_for(
+                                asyncio.to_thread(
+                                    self.gemini_service.chat,
+                                    messages=self.messages,
+                                    tools=tools,
+                                )
+                            )
+                            provider_span.set_attribute(
+                                "stop_reason", response.stop_reason
+                            )
+
+                        self.gemini_service.add_assistant_message(
+                            self.messages, response
+                        )
+
+                        if response.stop_reason == "tool_use" and not last:
+                            if self.verbose:
+                                print(
+                                    self.gemini_service.text_from_message(response)
+                                )
+                            tool_result_parts = await deadline.wait_for(
+                                ToolManager.execute_tool_requests(
+                                    self.clients, response, self.tool_memo
+                                )
+                            )
+
+                            self.gemini_service.add_user_message(
+                                self.messages, tool_result_parts
+                            )
+                        else:
+                            final_text_response = (
+                                self.gemini_service.text_from_message(response)
+                            )
+                            break
+
+                turn_span.set_attribute("iterations", iterations)
+        except BaseException:
+            self._rollback(turn_start)
+            raise
 
-        await self._process_query(query)
-
-        while True:
-            response = self.gemini_service.chat(
-                messages=self.messages,
-                tools=await ToolManager.get_all_tools(self.clients),
-            )
-
-            self.gemini_service.add_assistant_message(self.messages, response)
-
-            if response.stop_reason == "tool_use":
-                print(self.gemini_service.text_from_message(response))
-                tool_result_parts = await ToolManager.execute_tool_requests(
-                    self.clients, response
-                )
-
-                self.gemini_service.add_user_message(
-                    self.messages, tool_result_parts
-                )
-            else:
-                final_text_response = self.gemini_service.text_from_message(
-                    response
-                )
-                break
+        if self.session_log is not None:
+            self.session_log.append(self.messages[turn_start:])
 
         return final_text_response
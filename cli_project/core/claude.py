@@ -1,17 +1,36 @@
-from anthropic import Anthropic
-from anthropic.types import Message
+from typing import TYPE_CHECKING
+
+from core import deadline
+
+if TYPE_CHECKING:
+    from anthropic.types import Message
+
+
+def _message_type():
+    # Deferred so importing this module doesn't load the anthropic SDK
+    from anthropic.types import Message
+
+    return Message
 
 
 class Claude:
     def __init__(self, model: str):
-        self.client = Anthropic()
+        self._client = None
         self.model = model
 
+    @property
+    def client(self):
+        if self._client is None:
+            from anthropic import Anthropic
+
+            self._client = Anthropic()
+        return self._client
+
     def add_user_message(self, messages: list, message):
         user_message = {
             "role": "user",
             "content": message.content
-            if isinstance(message, Message)
+            if isinstance(message, _message_type())
             else message,
         }
         messages.append(user_message)
@@ -20,16 +39,22 @@ class Claude:
         assistant_message = {
             "role": "assistant",
             "content": message.content
-            if isinstance(message, Message)
+            if isinstance(message, _message_type())
             else message,
         }
         messages.append(assistant_message)
 
-    def text_from_message(self, message: Message):
+    def text_from_message(self, message: "Message"):
         return "\n".join(
             [block.text for block in message.content if block.type == "text"]
         )
 
+    def message_to_dict(self, message: "Message") -> dict:
+        return message.model_dump(mode="json")
+
+    def message_from_dict(self, data: dict) -> "Message":
+        return _message_type().model_validate(data)
+
     def chat(
         self,
         messages,
@@ -39,7 +64,7 @@ class Claude:
         tools=None,
         thinking=False,
         thinking_budget=1024,
-    ) -> Message:
+    ) -> "Message":
         params = {
             "model": self.model,
             "max_tokens": 8000,
@@ -60,5 +85,11 @@ class Claude:
         if system:
             params["system"] = system
 
+        # The turn deadline (if any) bounds the HTTP request as well
+        timeout = deadline.remaining()
+        if timeout is not None:
+            deadline.check()
+            params["timeout"] = timeout
+
         message = self.client.messages.create(**params)
         return message
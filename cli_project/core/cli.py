@@ -1,3 +1,6 @@
+import asyncio
+import signal
+import time
 from typing import List, Optional
 from prompt_toolkit import PromptSession
 from prompt_toolkit.completion import Completer, Completion
@@ -8,7 +11,17 @@ from prompt_toolkit.auto_suggest import AutoSuggest, Suggestion
 from prompt_toolkit.document import Document
 from prompt_toolkit.buffer import Buffer
 
+from core import deadline, metrics
 from core.cli_chat import CliChat
+from core.completion_index import ResourceIndex
+
+
+# Commands handled by the CLI itself rather than by a server prompt
+BUILTIN_COMMANDS = {"metrics": "Show request counts and latency percentiles"}
+
+# Times the document listing is read again when the server's change log no
+# longer reaches back to the revision the completer has
+MAX_RESOURCE_RELOADS = 1
 
 
 class CommandAutoSuggest(AutoSuggest):
@@ -37,17 +50,36 @@ class CommandAutoSuggest(AutoSuggest):
 
 
 class UnifiedCompleter(Completer):
-    def __init__(self):
+    def __init__(self, max_completions: int = 50):
         self.prompts = []
         self.prompt_dict = {}
-        self.resources = []
+        self.resource_index = ResourceIndex(limit=max_completions)
+
+    @property
+    def resources(self) -> List[str]:
+        return self.resource_index.ids()
 
     def update_prompts(self, prompts: List):
         self.prompts = prompts
         self.prompt_dict = {prompt.name: prompt for prompt in prompts}
 
     def update_resources(self, resources: List):
-        self.resources = resources
+        self.resource_index.update(resources)
+
+    def add_resources(self, resources: List):
+        self.resource_index.extend(resources)
+
+    def remove_resources(self, resources: List):
+        self.resource_index.discard_many(resources)
+
+    def _resource_completions(self, prefix: str, meta: Optional[str] = None):
+        for resource_id in self.resource_index.search(prefix):
+            yield Completion(
+                resource_id,
+                start_position=-len(prefix),
+                display=resource_id,
+                display_meta=meta,
+            )
 
     def get_completions(self, document, complete_event):
         text = document.text
@@ -57,14 +89,7 @@ class UnifiedCompleter(Completer):
             last_at_pos = text_before_cursor.rfind("@")
             prefix = text_before_cursor[last_at_pos + 1 :]
 
-            for resource_id in self.resources:
-                if resource_id.lower().startswith(prefix.lower()):
-                    yield Completion(
-                        resource_id,
-                        start_position=-len(prefix),
-                        display=resource_id,
-                        display_meta="Resource",
-                    )
+            yield from self._resource_completions(prefix, "Resource")
             return
 
         if text.startswith("/"):
@@ -73,6 +98,15 @@ class UnifiedCompleter(Completer):
             if len(parts) <= 1 and not text.endswith(" "):
                 cmd_prefix = parts[0] if parts else ""
 
+                for name, description in BUILTIN_COMMANDS.items():
+                    if name.startswith(cmd_prefix):
+                        yield Completion(
+                            name,
+                            start_position=-len(cmd_prefix),
+                            display=f"/{name}",
+                            display_meta=description,
+                        )
+
                 for prompt in self.prompts:
                     if prompt.name.startswith(cmd_prefix):
                         yield Completion(
@@ -87,34 +121,23 @@ class UnifiedCompleter(Completer):
                 cmd = parts[0]
 
                 if cmd in self.prompt_dict:
-                    for id in self.resources:
-                        yield Completion(
-                            id,
-                            start_position=0,
-                            display=id,
-                        )
+                    yield from self._resource_completions("")
                 return
 
             if len(parts) >= 2:
                 doc_prefix = parts[-1]
 
-                for resource in self.resources:
-                    if "id" in resource and resource["id"].lower().startswith(
-                        doc_prefix.lower()
-                    ):
-                        yield Completion(
-                            resource["id"],
-                            start_position=-len(doc_prefix),
-                            display=resource["id"],
-                        )
+                yield from self._resource_completions(doc_prefix)
                 return
 
 
 class CliApp:
     def __init__(self, agent: CliChat):
         self.agent = agent
-        self.resources = []
         self.prompts = []
+        self._resources_revision = 0
+        self._resources_lock = asyncio.Lock()
+        self._resources_task: Optional[asyncio.Task] = None
 
         self.completer = UnifiedCompleter()
 
@@ -175,15 +198,80 @@ class CliApp:
             complete_in_thread=True,
             auto_suggest=self.command_autosuggester,
         )
+        self.session.default_buffer.on_text_changed += self._prefetch_mentions
+
+    def _prefetch_mentions(self, buffer: Buffer):
+        """Starts reading @-mentioned documents as soon as their ID is complete."""
+        mentioned = [
+            word[1:]
+            for word in buffer.text.split()
+            if word.startswith("@") and word[1:] in self.completer.resource_index
+        ]
+        self.agent.prefetch_docs(mentioned)
+
+    @property
+    def resources(self) -> List[str]:
+        return self.completer.resources
 
     async def initialize(self):
-        await self.refresh_resources()
+        self.agent.watch_docs(self._on_resources_changed, self.refresh_resources)
+        # The listing can be large; stream it into the completer in the
+        # background instead of delaying the first prompt.
+        self._resources_task = asyncio.create_task(self.refresh_resources())
         await self.refresh_prompts()
 
     async def refresh_resources(self):
         try:
-            self.resources = await self.agent.list_docs_ids()
-            self.completer.update_resources(self.resources)
+            async with self._resources_lock:
+                await self._sync_resources(reload=True)
+        except Exception as e:
+            print(f"Error refreshing resources: {e}")
+
+    async def _sync_resources(self, reload: bool):
+        """Brings the completer up to date with the server's listing.
+
+        Applies the changes since the last seen revision, reading the whole
+        listing first when `reload` is set. When the change log has been
+        reset past that revision, the listing is read again, at most
+        MAX_RESOURCE_RELOADS times; after that the last full listing stands
+        and the next notification catches up from its revision.
+        """
+        reloads = 0
+        while True:
+            if reload:
+                await self._load_resources()
+            # Picks up anything that changed while paging
+            changes = await self.agent.list_docs_changes(self._resources_revision)
+            if not changes.get("reset"):
+                self.completer.add_resources(changes["added"])
+                self.completer.remove_resources(changes["removed"])
+                self._resources_revision = changes["revision"]
+                return
+            if reloads >= MAX_RESOURCE_RELOADS:
+                return
+            reloads += 1
+            reload = True
+
+    async def _load_resources(self):
+        cursor = None
+        first_page = True
+        while True:
+            page = await self.agent.list_docs_page(cursor)
+            if first_page:
+                self.completer.update_resources(page["ids"])
+                self._resources_revision = page["revision"]
+                first_page = False
+            else:
+                self.completer.add_resources(page["ids"])
+
+            cursor = page.get("next_cursor")
+            if not cursor:
+                return
+
+    async def _on_resources_changed(self, _notification):
+        try:
+            async with self._resources_lock:
+                await self._sync_resources(reload=False)
         except Exception as e:
             print(f"Error refreshing resources: {e}")
 
@@ -202,9 +290,74 @@ class CliApp:
                 user_input = await self.session.prompt_async("> ")
                 if not user_input.strip():
                     continue
+                # Built-in commands are handled before prompt commands
+                if user_input.strip() == "/metrics":
+                    print(metrics.REGISTRY.summary())
+                    continue
+
+                if await self.agent.is_batch_command(user_input):
+                    await self._run_cancellable(self._run_batch(user_input))
+                    continue
 
-                response = await self.agent.run(user_input)
-                print(f"\nResponse:\n{response}")
+                response = await self._run_turn(user_input)
+                if response is not None:
+                    print(f"\nResponse:\n{response}")
 
             except KeyboardInterrupt:
                 break
+
+    async def _run_batch(self, user_input: str):
+        """Prints each document's result as soon as it is ready."""
+        start = time.perf_counter()
+        done = failed = 0
+        async for result in self.agent.run_batch_command(user_input):
+            done += 1
+            seconds = result["duration_ms"] / 1000
+            if "error" in result:
+                failed += 1
+                print(f"\n[{done}] {result['doc_id']} failed after {seconds:.1f}s: {result['error']}")
+            else:
+                print(f"\n[{done}] {result['doc_id']} ({seconds:.1f}s):\n{result['response']}")
+        print(
+            f"\nFinished {done} documents ({failed} failed) "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+
+    async def _run_turn(self, user_input: str) -> Optional[str]:
+        return await self._run_cancellable(self.agent.run(user_input))
+
+    async def _run_cancellable(self, coro):
+        """Runs a turn; Ctrl-C cancels the turn instead of the app."""
+        turn = asyncio.create_task(coro)
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGINT, turn.cancel)
+            handles_sigint = True
+        except (NotImplementedError, RuntimeError):
+            # No loop signal handlers on Windows; Ctrl-C ends the app there
+            handles_sigint = False
+
+        try:
+            await asyncio.wait({turn})
+        except asyncio.CancelledError:
+            turn.cancel()
+            raise
+        finally:
+            if handles_sigint:
+                loop.remove_signal_handler(signal.SIGINT)
+
+        if turn.cancelled():
+            print("\nTurn cancelled.")
+            return None
+        error = turn.exception()
+        if isinstance(error, deadline.DeadlineExceeded):
+            print(f"\nTurn timed out: {error}")
+            return None
+        if isinstance(error, Exception):
+            # E.g. a failed provider call in a /summarize map step; the
+            # conversation was rolled back, so the prompt stays usable
+            print(f"\nTurn failed: {type(error).__name__}: {error}")
+            return None
+        if error is not None:
+            raise error
+        return turn.result()
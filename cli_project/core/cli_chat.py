@@ -1,8 +1,16 @@
-from typing import List, Tuple, Dict, Any
+import asyncio
+import fnmatch
+import time
+from typing import AsyncIterator, Iterable, List, Optional, Tuple, Dict, Any
 from mcp.types import Prompt, PromptMessage
 
+from core import profiling
+from core.batch import run_bounded
 from core.chat import Chat
 from core.gemini import Gemini
+from core.retrieval import ChunkRetriever, content_hash
+from core.session_log import SessionLog
+from core.summarize import MapReduceSummarizer
 from mcp_client import MCPClient
 
 
@@ -12,10 +20,38 @@ class CliChat(Chat):
         doc_client: MCPClient,
         clients: dict[str, MCPClient],
         gemini_service: Gemini,
+        verbose: bool = True,
+        retriever: Optional[ChunkRetriever] = None,
+        context_token_budget: int = 4000,
+        session_log: Optional[SessionLog] = None,
+        tool_memo_scope: Optional[str] = "turn",
+        turn_timeout: Optional[float] = None,
+        max_iterations: int = 20,
+        summarizer: Optional[MapReduceSummarizer] = None,
+        batch_concurrency: int = 4,
     ):
-        super().__init__(clients=clients, gemini_service=gemini_service)
+        super().__init__(
+            clients=clients,
+            gemini_service=gemini_service,
+            verbose=verbose,
+            session_log=session_log,
+            tool_memo_scope=tool_memo_scope,
+            turn_timeout=turn_timeout,
+            max_iterations=max_iterations,
+        )
 
         self.doc_client: MCPClient = doc_client
+        self.retriever = retriever or ChunkRetriever()
+        self.context_token_budget = context_token_budget
+        # doc_id -> in-flight or finished read, started while the user types
+        self._prefetched: Dict[str, asyncio.Task] = {}
+        # Summarizes documents that don't fit in one request chunk by chunk
+        self.summarizer = summarizer
+        # doc_id -> (content hash, {chunk index: index of the message that
+        # included it}), so repeat mentions don't resend the same text
+        self._docs_in_context: Dict[str, Tuple[str, Dict[int, int]]] = {}
+        # Documents processed at once by a command over several documents
+        self.batch_concurrency = batch_concurrency
 
     async def list_prompts(self) -> list[Prompt]:
         return await self.doc_client.list_prompts()
@@ -23,30 +59,244 @@ class CliChat(Chat):
     async def list_docs_ids(self) -> list[str]:
         return await self.doc_client.read_resource("docs://documents")
 
+    async def list_docs_page(self, cursor: Optional[str] = None) -> dict:
+        return await self.doc_client.read_resource(
+            f"docs://documents/pages/{cursor or 'start'}"
+        )
+
+    async def list_docs_changes(self, revision: int) -> dict:
+        return await self.doc_client.read_resource(
+            f"docs://documents/changes/{revision}"
+        )
+
+    def watch_docs(self, handler, on_restart=None):
+        """Calls `handler` whenever the server's document listing changes,
+        and `on_restart` (no arguments) after the server is respawned. The
+        new process has its own revisions and only sends list_changed to
+        clients that have read its listing, so `on_restart` should read
+        the whole listing again."""
+        self.doc_client.on_notification(
+            "notifications/resources/list_changed", handler
+        )
+        if on_restart is not None:
+            self.doc_client.on_reconnect(on_restart)
+
     async def get_doc_content(self, doc_id: str) -> str:
         return await self.doc_client.read_resource(f"docs://documents/{doc_id}")
 
+    def prefetch_docs(self, doc_ids: Iterable[str]):
+        """Keeps background reads running for exactly these documents.
+
+        Reads start for new IDs and are cancelled for IDs no longer
+        mentioned. Must be called from the event loop thread.
+        """
+        wanted = set(doc_ids)
+        for doc_id in list(self._prefetched):
+            if doc_id not in wanted:
+                self._prefetched.pop(doc_id).cancel()
+        for doc_id in wanted:
+            if doc_id not in self._prefetched:
+                task = asyncio.create_task(self.get_doc_content(doc_id))
+                # Errors surface when the read is consumed, not when dropped
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+                self._prefetched[doc_id] = task
+
+    async def _fetch_doc(self, doc_id: str) -> str:
+        """Uses a prefetched read if there is one; each is consumed once."""
+        task = self._prefetched.pop(doc_id, None)
+        if task is None:
+            return await self.get_doc_content(doc_id)
+        return await task
+
     async def get_prompt(
         self, command: str, doc_id: str
     ) -> list[PromptMessage]:
         return await self.doc_client.get_prompt(command, {"doc_id": doc_id})
 
-    async def _extract_resources(self, query: str) -> str:
-        mentions = [word[1:] for word in query.split() if word.startswith("@")]
+    async def is_batch_command(self, query: str) -> bool:
+        """True for a command over a glob pattern or several listed
+        documents, e.g. `/summarize *.pdf` or `/summarize a.md b.md`.
 
-        doc_ids = await self.list_docs_ids()
-        mentioned_docs: list[Tuple[str, str]] = []
+        Every word after the command must be a glob or a document ID, so
+        `/format report.pdf use bullet points` stays a single command.
+        """
+        words = query.split()
+        if not query.startswith("/") or len(words) < 2:
+            return False
+        if len(words) == 2:
+            return _is_glob(words[1])
+        names = [word for word in words[1:] if not _is_glob(word)]
+        if not names:
+            return True
+        listed = set(await self._list_all_doc_ids())
+        return all(name in listed for name in names)
+
+    async def expand_doc_ids(self, patterns: List[str]) -> List[str]:
+        """Resolves IDs and glob patterns against the document listing,
+        keeping the order they were given in and dropping duplicates."""
+        all_ids: Optional[List[str]] = None
+        doc_ids: Dict[str, None] = {}
+        for pattern in patterns:
+            if not _is_glob(pattern):
+                doc_ids[pattern] = None
+                continue
+            if all_ids is None:
+                all_ids = await self._list_all_doc_ids()
+            doc_ids.update(dict.fromkeys(fnmatch.filter(all_ids, pattern)))
+        return list(doc_ids)
 
+    async def _list_all_doc_ids(self) -> List[str]:
+        doc_ids: List[str] = []
+        cursor = None
+        while True:
+            page = await self.list_docs_page(cursor)
+            doc_ids += page["ids"]
+            cursor = page.get("next_cursor")
+            if not cursor:
+                return doc_ids
+
+    def fork(self) -> "CliChat":
+        """A new, empty conversation with the same clients and settings."""
+        return CliChat(
+            doc_client=self.doc_client,
+            clients=self.clients,
+            gemini_service=self.gemini_service,
+            verbose=False,
+            retriever=self.retriever,
+            context_token_budget=self.context_token_budget,
+            tool_memo_scope=self.tool_memo_scope,
+            turn_timeout=self.turn_timeout,
+            max_iterations=self.max_iterations,
+            summarizer=self.summarizer,
+            batch_concurrency=self.batch_concurrency,
+        )
+
+    async def run_batch_command(self, query: str) -> AsyncIterator[Dict[str, Any]]:
+        """Runs a command once per document, each in its own conversation,
+        with at most `batch_concurrency` at a time.
+
+        Yields {"doc_id", "response" or "error", "duration_ms"} as each
+        document finishes. Once all have, the combined results are added
+        to this conversation so follow-up questions can refer to them.
+        """
+        words = query.split()
+        command = words[0]
+        doc_ids = await self.expand_doc_ids(words[1:])
+
+        async def run_one(doc_id: str) -> Dict[str, Any]:
+            start = time.perf_counter()
+            result: Dict[str, Any] = {"doc_id": doc_id}
+            try:
+                result["response"] = await self.fork().run(f"{command} {doc_id}")
+            except Exception as e:
+                result["error"] = f"{type(e).__name__}: {e}"
+            result["duration_ms"] = round((time.perf_counter() - start) * 1000, 3)
+            return result
+
+        results: Dict[str, Dict[str, Any]] = {}
+        async for result in run_bounded(doc_ids, run_one, self.batch_concurrency):
+            results[result["doc_id"]] = result
+            yield result
+
+        sections = []
         for doc_id in doc_ids:
-            if doc_id in mentions:
-                content = await self.get_doc_content(doc_id)
-                mentioned_docs.append((doc_id, content))
+            result = results[doc_id]
+            body = result.get("response") or f"Failed: {result.get('error')}"
+            sections.append(f'<result document="{doc_id}">\n{body}\n</result>')
+        turn = [
+            {"role": "user", "content": query},
+            {
+                "role": "assistant",
+                "content": "\n\n".join(sections) or "No documents matched.",
+            },
+        ]
+        self.messages += turn
+        if self.session_log is not None:
+            self.session_log.append(turn)
 
-        return "".join(
-            f'\n<document id="{doc_id}">\n{content}\n</document>\n'
-            for doc_id, content in mentioned_docs
+    async def _extract_resources(self, query: str) -> str:
+        mentions = list(
+            dict.fromkeys(word[1:] for word in query.split() if word.startswith("@"))
         )
 
+        contents = await asyncio.gather(
+            *(self._fetch_doc(doc_id) for doc_id in mentions),
+            return_exceptions=True,
+        )
+        # Reads for mentions that didn't make it into the query are stale
+        self.prefetch_docs(())
+        # Mentions that aren't document IDs fail to resolve and are skipped
+        mentioned_docs: list[Tuple[str, str]] = [
+            (doc_id, content)
+            for doc_id, content in zip(mentions, contents)
+            if isinstance(content, str)
+        ]
+
+        if not mentioned_docs:
+            return ""
+
+        question = " ".join(
+            word for word in query.split() if not word.startswith("@")
+        )
+        selections = self.retriever.select(
+            question, mentioned_docs, self.context_token_budget
+        )
+
+        # The prompt built from these blocks becomes the next message
+        message_index = len(self.messages)
+        hashes = {doc_id: content_hash(content) for doc_id, content in mentioned_docs}
+
+        blocks = []
+        for doc_id, chunks, total_chunks in selections:
+            # Chunks of this document version already in the conversation
+            digest, sent = self._docs_in_context.get(doc_id, (None, {}))
+            if digest != hashes[doc_id]:
+                sent = {}
+            self._docs_in_context[doc_id] = (hashes[doc_id], sent)
+
+            if len(chunks) == total_chunks and len(sent) == total_chunks:
+                blocks.append(
+                    f'\n<document id="{doc_id}" unchanged="true">'
+                    "Included in full earlier in this conversation.</document>\n"
+                )
+                continue
+
+            new_chunks = [(index, text) for index, text in chunks if index not in sent]
+            for index, _ in new_chunks:
+                sent[index] = message_index
+
+            if len(chunks) == total_chunks and not sent.keys() - dict(new_chunks).keys():
+                content = "\n\n".join(text for _, text in chunks)
+                blocks.append(f'\n<document id="{doc_id}">\n{content}\n</document>\n')
+                continue
+
+            excerpts = "".join(
+                f'<excerpt chunk="{index + 1}">\n{text}\n</excerpt>\n'
+                for index, text in new_chunks
+            )
+            earlier = sorted(index + 1 for index, _ in chunks if sent[index] < message_index)
+            earlier_attr = (
+                f' earlier_excerpts="{",".join(map(str, earlier))}"' if earlier else ""
+            )
+            blocks.append(
+                f'\n<document id="{doc_id}" excerpts="{len(chunks)} of {total_chunks}"'
+                f"{earlier_attr}>\n{excerpts}</document>\n"
+            )
+        return "".join(blocks)
+
+    def _rollback(self, turn_start: int):
+        super()._rollback(turn_start)
+        # Forget documents whose only copy was in the removed messages
+        for doc_id, (digest, sent) in list(self._docs_in_context.items()):
+            for index in [i for i, at in sent.items() if at >= turn_start]:
+                del sent[index]
+            if not sent:
+                del self._docs_in_context[doc_id]
+
+    def resume(self, last_turns: Optional[int] = None):
+        super().resume(last_turns)
+        self._docs_in_context.clear()
+
     async def _process_command(self, query: str) -> bool:
         if not query.startswith("/"):
             return False
@@ -54,6 +304,10 @@ class CliChat(Chat):
         words = query.split()
         command = words[0].replace("/", "")
 
+        if command == "summarize" and self.summarizer is not None:
+            if await self._summarize_chunked(words[1]):
+                return True
+
         messages = await self.doc_client.get_prompt(
             command, {"doc_id": words[1]}
         )
@@ -61,6 +315,24 @@ class CliChat(Chat):
         self.messages += convert_prompt_messages_to_message_params(messages)
         return True
 
+    async def _summarize_chunked(self, doc_id: str) -> bool:
+        """Map-reduce summarization for documents of more than one chunk.
+        Returns False for short documents, which use the server's prompt."""
+        resource = await self.doc_client.read_resource(
+            f"docs://documents/{doc_id}/chunks"
+        )
+        chunks = resource["chunks"]
+        if len(chunks) <= 1:
+            return False
+
+        if self.verbose:
+            print(f"Summarizing {doc_id} in {len(chunks)} chunks")
+        summaries = await self.summarizer.summarize_chunks(doc_id, chunks)
+        self.messages.append(
+            {"role": "user", "content": self.summarizer.final_prompt(doc_id, summaries)}
+        )
+        return True
+
     async def _process_query(self, query: str):
         if await self._process_command(query):
             return
@@ -81,6 +353,8 @@ class CliChat(Chat):
         Note the user's query might contain references to documents like "@report.docx". The "@" is only
         included as a way of mentioning the doc. The actual name of the document would be "report.docx".
         If the document content is included in this prompt, you don't need to use an additional tool to read the document.
+        Long documents may only be included as <excerpt> blocks; read the document with a tool if the excerpts don't answer the question.
+        Documents marked unchanged="true", and the chunks listed in earlier_excerpts, were already included earlier in this conversation and haven't changed since; use that earlier content.
         Answer the user's question directly and concisely. Start with the exact information they need. 
         Don't refer to or mention the provided context in any way - just use it to inform your answer.
         """
@@ -88,6 +362,11 @@ class CliChat(Chat):
         self.messages.append({"role": "user", "content": prompt})
 
 
+def _is_glob(pattern: str) -> bool:
+    return any(char in pattern for char in "*?[")
+
+
+@profiling.hot_path
 def convert_prompt_message_to_message_param(
     prompt_message: "PromptMessage",
 ) -> Dict[str, Any]:
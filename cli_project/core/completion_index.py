@@ -0,0 +1,210 @@
+import re
+from bisect import bisect_left, bisect_right
+from typing import Iterable, List, Optional, Tuple
+
+
+class _Snapshot:
+    """One immutable version of the index. Writers build a new snapshot and
+    swap it in with a single assignment, so a completer running on another
+    thread always searches a consistent one."""
+
+    __slots__ = ("keys", "ids", "joined", "narrowing")
+
+    def __init__(self, pairs: Iterable[Tuple[str, str]]):
+        pairs = list(pairs)
+        self.keys: Tuple[str, ...] = tuple(key for key, _ in pairs)
+        self.ids: Tuple[str, ...] = tuple(resource_id for _, resource_id in pairs)
+        # (joined keys, line starts), built on the first fuzzy search
+        self.joined: Optional[Tuple[str, List[int]]] = None
+        self.narrowing: Optional[Tuple[str, List[int]]] = None
+
+    def find(self, resource_id: str) -> int:
+        """Position of `resource_id`, or -1."""
+        key = resource_id.casefold()
+        i = bisect_left(self.keys, key)
+        while i < len(self.keys) and self.keys[i] == key:
+            if self.ids[i] == resource_id:
+                return i
+            i += 1
+        return -1
+
+
+class ResourceIndex:
+    """Case-insensitive completion index over resource IDs.
+
+    IDs are case-folded once and kept in a sorted array, so prefix lookups
+    are a binary search. When a prefix doesn't fill the result limit, the
+    remaining slots are filled with fuzzy (subsequence) matches, found by a
+    single regex scan over all keys joined into one string.
+
+    Updates run on the event loop while prompt_toolkit completes on a
+    thread; every change replaces the whole snapshot instead of editing it
+    in place, and every search works on the snapshot it started with.
+    """
+
+    def __init__(self, ids: Iterable[str] = (), limit: int = 50):
+        self.limit = limit
+        self._snapshot = _Snapshot(())
+        self.update(ids)
+
+    def __len__(self) -> int:
+        return len(self._snapshot.ids)
+
+    def __contains__(self, resource_id: str) -> bool:
+        return self._snapshot.find(resource_id) >= 0
+
+    def update(self, ids: Iterable[str]):
+        """Replaces the whole index."""
+        self._snapshot = _Snapshot(sorted((str(i).casefold(), str(i)) for i in ids))
+
+    def extend(self, ids: Iterable[str]):
+        """Adds many IDs at once (e.g. a page of a listing)."""
+        snapshot = self._snapshot
+        new = {(i.casefold(), i) for i in ids if snapshot.find(i) < 0}
+        if not new:
+            return
+        # Both runs are already sorted, so this is a linear merge
+        self._snapshot = _Snapshot(
+            sorted([*zip(snapshot.keys, snapshot.ids), *sorted(new)])
+        )
+
+    def add(self, resource_id: str):
+        snapshot = self._snapshot
+        if snapshot.find(resource_id) >= 0:
+            return
+        key = resource_id.casefold()
+        i = bisect_right(snapshot.keys, key)
+        pairs = list(zip(snapshot.keys, snapshot.ids))
+        pairs.insert(i, (key, resource_id))
+        self._snapshot = _Snapshot(pairs)
+
+    def discard(self, resource_id: str):
+        self.discard_many((resource_id,))
+
+    def discard_many(self, ids: Iterable[str]):
+        """Removes many IDs with a single rebuild."""
+        snapshot = self._snapshot
+        positions = {snapshot.find(i) for i in ids} - {-1}
+        if not positions:
+            return
+        self._snapshot = _Snapshot(
+            pair
+            for i, pair in enumerate(zip(snapshot.keys, snapshot.ids))
+            if i not in positions
+        )
+
+    def ids(self) -> List[str]:
+        return list(self._snapshot.ids)
+
+    def prefix_matches(self, prefix: str, limit: Optional[int] = None) -> List[str]:
+        return self._prefix_matches(self._snapshot, prefix, limit or self.limit)
+
+    @staticmethod
+    def _prefix_matches(snapshot: _Snapshot, prefix: str, limit: int) -> List[str]:
+        keys = snapshot.keys
+        key = prefix.casefold()
+        start = bisect_left(keys, key)
+        results = []
+        for i in range(start, min(start + limit, len(keys))):
+            if not keys[i].startswith(key):
+                break
+            results.append(snapshot.ids[i])
+        return results
+
+    @staticmethod
+    def _joined(snapshot: _Snapshot) -> Tuple[str, List[int]]:
+        if snapshot.joined is None:
+            # Keys never contain newlines in practice; strip them so every
+            # key stays on its own line in the joined string.
+            keys = [key.replace("\n", " ") for key in snapshot.keys]
+            line_starts = []
+            offset = 0
+            for key in keys:
+                line_starts.append(offset)
+                offset += len(key) + 1
+            snapshot.joined = ("\n".join(keys), line_starts)
+        return snapshot.joined
+
+    @classmethod
+    def _scan(cls, snapshot: _Snapshot, pattern: "re.Pattern"):
+        """Yields (index, match start in key, match length) for every key."""
+        joined, line_starts = cls._joined(snapshot)
+        for match in pattern.finditer(joined):
+            index = bisect_right(line_starts, match.start()) - 1
+            start = match.start() - line_starts[index]
+            yield index, start, match.end() - match.start()
+
+    @staticmethod
+    def _rescan(snapshot: _Snapshot, pattern: "re.Pattern", indices: List[int]):
+        for index in indices:
+            match = pattern.search(snapshot.keys[index])
+            if match:
+                yield index, match.start(), match.end() - match.start()
+
+    def fuzzy_matches(
+        self, query: str, limit: Optional[int] = None, exclude: Iterable[str] = ()
+    ) -> List[str]:
+        """Ranks IDs containing the query characters in order."""
+        return self._fuzzy_matches(self._snapshot, query, limit or self.limit, exclude)
+
+    def _fuzzy_matches(
+        self, snapshot: _Snapshot, query: str, limit: int, exclude: Iterable[str]
+    ) -> List[str]:
+        key = query.casefold().replace("\n", "")
+        if not key:
+            return []
+
+        # "a[^b\n]*b[^c\n]*c" finds a subsequence match without the
+        # backtracking a lazy ".*?" would do; the leading literal lets the
+        # regex engine skip quickly to candidate positions.
+        chars = [re.escape(c) for c in key]
+        pattern = re.compile(
+            "".join(f"{c}[^{n}\n]*" for c, n in zip(chars, chars[1:]))
+            + chars[-1]
+        )
+
+        # While typing, each query extends the previous one, so its matches
+        # are a subset of the previous complete match set.
+        narrowing = snapshot.narrowing
+        if narrowing and key.startswith(narrowing[0]):
+            matches = self._rescan(snapshot, pattern, narrowing[1])
+        else:
+            matches = self._scan(snapshot, pattern)
+
+        excluded = set(exclude)
+        scored = []
+        matched_indices = []
+        seen = set()
+        # Gather a bounded candidate pool, then rank it
+        max_candidates = limit * 20
+        complete = True
+        for index, position, span in matches:
+            if index in seen:
+                continue
+            seen.add(index)
+            matched_indices.append(index)
+            resource_id = snapshot.ids[index]
+            if resource_id in excluded:
+                continue
+            scored.append((span, position, len(resource_id), resource_id))
+            if len(scored) >= max_candidates:
+                complete = False
+                break
+
+        if complete:
+            snapshot.narrowing = (key, matched_indices)
+
+        scored.sort()
+        return [resource_id for *_, resource_id in scored[:limit]]
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[str]:
+        """Prefix matches first, then fuzzy matches, at most `limit` IDs."""
+        limit = limit or self.limit
+        # Both passes search the same snapshot
+        snapshot = self._snapshot
+        results = self._prefix_matches(snapshot, query, limit)
+        if len(results) < limit and query:
+            results += self._fuzzy_matches(
+                snapshot, query, limit - len(results), exclude=results
+            )
+        return results
@@ -0,0 +1,66 @@
+import asyncio
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Absolute time.monotonic() value by which the current work must finish.
+# Context variables are copied into asyncio tasks and into asyncio.to_thread
+# workers, so the deadline follows the turn into provider and MCP calls.
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "deadline", default=None
+)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when work runs past the deadline of the current turn."""
+
+
+@contextmanager
+def within(seconds: Optional[float]):
+    """Sets a deadline `seconds` from now; a tighter outer deadline wins."""
+    if seconds is None:
+        yield
+        return
+    expires_at = time.monotonic() + seconds
+    outer = _deadline.get()
+    if outer is not None:
+        expires_at = min(expires_at, outer)
+    token = _deadline.set(expires_at)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or None without one."""
+    expires_at = _deadline.get()
+    if expires_at is None:
+        return None
+    return expires_at - time.monotonic()
+
+
+def check():
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("Deadline exceeded")
+
+
+async def wait_for(aw: Awaitable[T], timeout: Optional[float] = None) -> T:
+    """Awaits `aw`, cancelling it when the deadline (or `timeout`) passes."""
+    limit = remaining()
+    if timeout is not None:
+        limit = timeout if limit is None else min(limit, timeout)
+    if limit is None:
+        return await aw
+    if limit <= 0:
+        if asyncio.iscoroutine(aw):
+            aw.close()
+        raise DeadlineExceeded("Deadline exceeded")
+    try:
+        return await asyncio.wait_for(aw, limit)
+    except asyncio.TimeoutError as e:
+        raise DeadlineExceeded(f"Deadline exceeded after {limit:.1f}s") from e
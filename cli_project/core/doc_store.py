@@ -0,0 +1,125 @@
+import base64
+from bisect import bisect_right, insort
+from collections import deque
+from collections.abc import MutableMapping
+from typing import Callable, Dict, Iterator, List, Optional
+
+
+class DocumentStore(MutableMapping):
+    """Dict-like document store that tracks changes to its set of IDs.
+
+    Every addition or removal bumps `revision` and is recorded in a bounded
+    change log, so clients can page through the IDs once and then fetch only
+    the changes since the revision they last saw.
+    """
+
+    def __init__(self, docs: Optional[Dict[str, str]] = None, max_log: int = 10000):
+        self._docs: Dict[str, str] = {}
+        # Set from a store-wide counter on every content change, so a
+        # version number is never reused, not even by a document deleted
+        # and added again
+        self._versions: Dict[str, int] = {}
+        self._last_version = 0
+        self._sorted_ids: List[str] = []
+        self._log: deque = deque(maxlen=max_log)
+        self._listeners: List[Callable[[], None]] = []
+        self.revision = 0
+        for doc_id, content in (docs or {}).items():
+            self[doc_id] = content
+
+    def __getitem__(self, doc_id: str) -> str:
+        return self._docs[doc_id]
+
+    def __setitem__(self, doc_id: str, content: str):
+        is_new = doc_id not in self._docs
+        if not is_new and self._docs[doc_id] == content:
+            return
+        self._docs[doc_id] = content
+        self._last_version += 1
+        self._versions[doc_id] = self._last_version
+        if is_new:
+            insort(self._sorted_ids, doc_id)
+            self._record("added", doc_id)
+
+    def __delitem__(self, doc_id: str):
+        del self._docs[doc_id]
+        del self._versions[doc_id]
+        index = bisect_right(self._sorted_ids, doc_id) - 1
+        del self._sorted_ids[index]
+        self._record("removed", doc_id)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._docs)
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def version(self, doc_id: str) -> int:
+        """The document's version. It increases each time the content
+        changes and is unique across the store, so equal versions always
+        mean equal content."""
+        return self._versions[doc_id]
+
+    def on_list_changed(self, callback: Callable[[], None]):
+        """Registers a callback for additions and removals of documents."""
+        self._listeners.append(callback)
+
+    def _record(self, change: str, doc_id: str):
+        self.revision += 1
+        self._log.append((self.revision, change, doc_id))
+        for listener in self._listeners:
+            listener()
+
+    def page(self, cursor: Optional[str] = None, limit: int = 1000) -> Dict:
+        """Returns up to `limit` IDs in sorted order after `cursor`.
+
+        The cursor encodes the last ID of the previous page, so pages stay
+        consistent while documents are added or removed.
+        """
+        start = 0
+        if cursor:
+            last_id = base64.urlsafe_b64decode(cursor.encode()).decode()
+            start = bisect_right(self._sorted_ids, last_id)
+
+        ids = self._sorted_ids[start : start + limit]
+        more = start + limit < len(self._sorted_ids)
+        next_cursor = (
+            base64.urlsafe_b64encode(ids[-1].encode()).decode()
+            if ids and more
+            else None
+        )
+        return {"ids": ids, "next_cursor": next_cursor, "revision": self.revision}
+
+    def changes_since(self, revision: int) -> Dict:
+        """Returns the IDs added and removed after `revision`.
+
+        When the change log no longer reaches back that far the result has
+        `reset` set and the caller should page through the full listing.
+        """
+        if revision > self.revision or (
+            revision < self.revision
+            and (not self._log or self._log[0][0] > revision + 1)
+        ):
+            return {"revision": self.revision, "reset": True}
+
+        # doc_id -> its first change after `revision`; a document first
+        # added after it was unknown to the caller, so its removal isn't
+        # reported (and an ID removed and added again is left out of both)
+        first: Dict[str, str] = {}
+        for entry_revision, change, doc_id in self._log:
+            if entry_revision > revision:
+                first.setdefault(doc_id, change)
+
+        return {
+            "revision": self.revision,
+            "added": [
+                doc_id
+                for doc_id, change in first.items()
+                if change == "added" and doc_id in self._docs
+            ],
+            "removed": [
+                doc_id
+                for doc_id, change in first.items()
+                if change == "removed" and doc_id not in self._docs
+            ],
+        }
@@ -1,6 +1,19 @@
-import google.generativeai as genai
+import base64
 from typing import Any, Dict, List
 
+from core import deadline, profiling
+from core.gemini_schema import SchemaCache
+
+# Compartilhado por todas as instancias: catalogos de tools se repetem
+SCHEMA_CACHE = SchemaCache()
+
+
+def _genai():
+    """Importa o SDK sob demanda; ele domina o tempo de inicializacao"""
+    import google.generativeai as genai
+
+    return genai
+
 
 class GeminiMessage:
     """Wrapper para mensagens do Gemini para compatibilidade"""
@@ -11,9 +24,21 @@ class GeminiMessage:
 
 class Gemini:
     def __init__(self, model: str, api_key: str):
-        genai.configure(api_key=api_key)
         self.model_name = model
-        self.model = genai.GenerativeModel(model)
+        self._api_key = api_key
+        self._configured = False
+
+    def _client(self):
+        """Retorna o SDK configurado, configurando-o na primeira chamada"""
+        genai = _genai()
+        if not self._configured:
+            genai.configure(api_key=self._api_key)
+            self._configured = True
+        return genai
+
+    @property
+    def model(self):
+        return self._client().GenerativeModel(self.model_name)
 
     def add_user_message(self, messages: list, message):
         # Se for uma lista de tool results, converte para formato Gemini
@@ -21,13 +46,23 @@ class Gemini:
             if isinstance(message[0], dict) and message[0].get("type") == "tool_result":
                 # Converte tool results para formato texto por enquanto
                 # O Gemini espera function responses em formato específico
-                tool_results_text = "\n".join([
-                    f"Tool {tr.get('tool_use_id', 'unknown')}: {tr.get('content', '')}"
-                    for tr in message
-                ])
+                lines = []
+                binary_blocks = []
+                for tr in message:
+                    result = tr.get("content", "")
+                    if isinstance(result, list):
+                        # Blocos nao textuais (imagens, documentos) seguem intactos
+                        binary_blocks += [b for b in result if b.get("type") != "text"]
+                        result = self._extract_text_from_content(result)
+                    lines.append(f"Tool {tr.get('tool_use_id', 'unknown')}: {result}")
+                tool_results_text = "\n".join(lines)
+
+                content = tool_results_text
+                if binary_blocks:
+                    content = [{"type": "text", "text": tool_results_text}, *binary_blocks]
                 user_message = {
                     "role": "user",
-                    "content": tool_results_text
+                    "content": content
                 }
                 messages.append(user_message)
                 return
@@ -55,6 +90,7 @@ class Gemini:
         }
         messages.append(assistant_message)
 
+    @profiling.hot_path
     def _extract_text_from_content(self, content):
         """Extrai texto do formato de conteúdo"""
         if isinstance(content, str):
@@ -74,6 +110,15 @@ class Gemini:
         """Extrai texto de uma mensagem Gemini"""
         return self._extract_text_from_content(message.content)
 
+    def message_to_dict(self, message: GeminiMessage) -> Dict:
+        """Serializa uma mensagem Gemini para cache"""
+        return {"content": message.content, "stop_reason": message.stop_reason}
+
+    def message_from_dict(self, data: Dict) -> GeminiMessage:
+        """Reconstroi uma mensagem Gemini a partir do cache"""
+        return GeminiMessage(content=data["content"], stop_reason=data["stop_reason"])
+
+    @profiling.hot_path
     def _convert_messages_to_gemini_format(self, messages: List[Dict]) -> List[Dict]:
         """Converte mensagens para o formato do Gemini"""
         gemini_messages = []
@@ -82,61 +127,44 @@ class Gemini:
             content = msg["content"]
 
             if isinstance(content, list):
-                text_content = self._extract_text_from_content(content)
+                parts = [self._extract_text_from_content(content)]
+                parts += self._binary_parts(content)
             else:
-                text_content = content
+                parts = [content]
 
             gemini_messages.append({
                 "role": role,
-                "parts": [text_content]
+                "parts": parts
             })
         return gemini_messages
 
+    def _binary_parts(self, content: List) -> List[Dict]:
+        """Converte blocos de imagem/documento em partes inline_data"""
+        parts = []
+        for block in content:
+            if isinstance(block, dict) and block.get("type") in ("image", "document"):
+                source = block.get("source", {})
+                if source.get("type") == "base64":
+                    parts.append({
+                        "inline_data": {
+                            "mime_type": source["media_type"],
+                            "data": base64.b64decode(source["data"]),
+                        }
+                    })
+        return parts
+
     def _convert_json_schema_to_gemini(self, json_schema):
         """Converte JSON Schema para o formato do Gemini"""
-        if not json_schema:
-            return {}
-
-        # Remove campos não suportados pelo Gemini
-        gemini_schema = {}
-        if "type" in json_schema:
-            gemini_schema["type_"] = json_schema["type"].upper()
-
-        if "properties" in json_schema:
-            properties = {}
-            for prop_name, prop_schema in json_schema["properties"].items():
-                prop_def = {}
-                if "type" in prop_schema:
-                    prop_def["type_"] = prop_schema["type"].upper()
-                if "description" in prop_schema:
-                    prop_def["description"] = prop_schema["description"]
-                properties[prop_name] = prop_def
-            gemini_schema["properties"] = properties
-
-        if "required" in json_schema:
-            gemini_schema["required"] = json_schema["required"]
-
-        return gemini_schema
+        return SCHEMA_CACHE.convert(json_schema)
 
     def _convert_tools_to_gemini_format(self, tools):
         """Converte tools do formato MCP para o formato do Gemini"""
         if not tools:
             return None
 
-        gemini_tools = []
-        for tool in tools:
-            # Converte o schema de parâmetros
-            parameters_schema = self._convert_json_schema_to_gemini(tool["input_schema"])
-
-            # Gemini espera function declarations
-            function_declaration = {
-                "name": tool["name"],
-                "description": tool["description"],
-                "parameters": parameters_schema
-            }
-            gemini_tools.append(function_declaration)
-
-        return gemini_tools
+        # Gemini espera function declarations; catalogos iguais sao
+        # convertidos uma vez so
+        return SCHEMA_CACHE.convert_tools(tools)
 
     def chat(
         self,
@@ -175,16 +203,27 @@ class Gemini:
         if gemini_tools:
             model_kwargs["tools"] = gemini_tools
 
-        model = genai.GenerativeModel(**model_kwargs)
+        model = self._client().GenerativeModel(**model_kwargs)
 
         # Inicia o chat
         chat = model.start_chat(history=gemini_messages[:-1] if len(gemini_messages) > 1 else [])
 
         # Envia a última mensagem
-        last_message = gemini_messages[-1]["parts"][0] if gemini_messages else ""
+        last_message = ""
+        if gemini_messages:
+            last_parts = gemini_messages[-1]["parts"]
+            last_message = last_parts[0] if len(last_parts) == 1 else last_parts
+        # O prazo do turno (se houver) limita tambem a requisicao HTTP
+        send_kwargs = {}
+        timeout = deadline.remaining()
+        if timeout is not None:
+            deadline.check()
+            send_kwargs["request_options"] = {"timeout": timeout}
+
         response = chat.send_message(
             last_message,
-            generation_config=generation_config
+            generation_config=generation_config,
+            **send_kwargs
         )
 
         # Verifica se há function calls na resposta
@@ -0,0 +1,319 @@
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# Formats the Gemini API accepts for each type; others are dropped
+SUPPORTED_FORMATS = {
+    "STRING": {"enum", "date-time"},
+    "NUMBER": {"float", "double"},
+    "INTEGER": {"int32", "int64"},
+}
+
+# How many times a recursive $ref is expanded along one path
+MAX_REF_EXPANSIONS = 2
+
+
+def schema_hash(value: Any) -> str:
+    return hashlib.sha256(
+        json.dumps(value, sort_keys=True, separators=(",", ":"), default=str).encode()
+    ).hexdigest()
+
+
+def convert_schema(json_schema: Optional[Dict]) -> Dict:
+    """Converts a JSON Schema (as produced for MCP tool inputs) to the
+    OpenAPI subset Gemini function declarations accept.
+
+    Nested objects, array items, enums, `anyOf`/`oneOf`/`allOf`, nullable
+    types and local `$ref`s are all converted. Constructs Gemini has no
+    equivalent for are reduced to the closest type, and constraints it
+    can't express (non-string enums, defaults) move into the description so
+    the model still sees them.
+    """
+    if not json_schema:
+        return {}
+    return _convert(json_schema, json_schema, refs=())
+
+
+def _resolve_ref(ref: str, root: Dict) -> Optional[Dict]:
+    if not ref.startswith("#/"):
+        return None
+    node: Any = root
+    for part in ref[2:].split("/"):
+        part = part.replace("~1", "/").replace("~0", "~")
+        if not isinstance(node, dict) or part not in node:
+            return None
+        node = node[part]
+    return node if isinstance(node, dict) else None
+
+
+def _merge(outer: Dict, inner: Dict) -> Dict:
+    """Schema `inner` with the annotations written next to a $ref or a
+    single-member combinator in `outer` (description, default, ...)."""
+    merged = dict(inner)
+    for key, value in outer.items():
+        if key not in ("$ref", "allOf", "anyOf", "oneOf", "$defs", "definitions"):
+            merged[key] = value
+    return merged
+
+
+def _convert(schema: Any, root: Dict, refs: Tuple[str, ...]) -> Dict:
+    if not isinstance(schema, dict):
+        # `true` / `{}` accept anything; a string is the safest stand-in
+        return {"type_": "STRING"}
+
+    if "$ref" in schema:
+        ref = schema["$ref"]
+        target = (
+            _resolve_ref(ref, root) if refs.count(ref) < MAX_REF_EXPANSIONS else None
+        )
+        if target is None:
+            result = {"type_": "OBJECT"}
+            if schema.get("description"):
+                result["description"] = schema["description"]
+            return result
+        return _convert(_merge(schema, target), root, refs + (ref,))
+
+    if "allOf" in schema:
+        merged, expanded = _merge_all_of(schema, root, refs)
+        return _convert(merged, root, refs + expanded)
+
+    nullable = False
+    for key in ("anyOf", "oneOf"):
+        if key in schema:
+            branches = [
+                b for b in schema[key] if not (isinstance(b, dict) and b.get("type") == "null")
+            ]
+            nullable = len(branches) < len(schema[key])
+            if not branches:
+                schema = _merge(schema, {"type": "string"})
+            else:
+                # Gemini has no unions; the first alternative wins and the
+                # others are listed in the description
+                schema = _merge(schema, branches[0])
+                if len(branches) > 1:
+                    schema = _describe(
+                        schema, "Also accepts: " + ", ".join(_type_name(b) for b in branches[1:])
+                    )
+            break
+    if "$ref" in schema or "allOf" in schema:
+        # The chosen branch still needs resolving, e.g. Optional[Model]
+        # is `anyOf: [{$ref}, {type: null}]`
+        result = _convert(schema, root, refs)
+        if nullable:
+            result = {**result, "nullable": True}
+        return result
+
+    type_ = schema.get("type")
+    if isinstance(type_, list):
+        types = [t for t in type_ if t != "null"]
+        nullable = nullable or len(types) < len(type_)
+        type_ = types[0] if types else "string"
+    if type_ == "null":
+        type_, nullable = "string", True
+
+    enum = schema.get("enum")
+    if enum is None and "const" in schema:
+        enum = [schema["const"]]
+    if type_ is None:
+        type_ = _infer_type(schema, enum)
+    type_ = type_.upper()
+    if type_ not in ("STRING", "NUMBER", "INTEGER", "BOOLEAN", "ARRAY", "OBJECT"):
+        type_ = "STRING"
+
+    result: Dict[str, Any] = {"type_": type_}
+    description = schema.get("description")
+    if description:
+        result["description"] = description
+    if nullable:
+        result["nullable"] = True
+
+    if enum is not None:
+        if type_ == "STRING" and all(isinstance(v, str) for v in enum):
+            result["format_"] = "enum"
+            result["enum"] = list(enum)
+        else:
+            _add_note(result, "Allowed values: " + ", ".join(json.dumps(v) for v in enum))
+    elif schema.get("format") in SUPPORTED_FORMATS.get(type_, ()):
+        result["format_"] = schema["format"]
+
+    if schema.get("default") is not None:
+        _add_note(result, f"Default: {json.dumps(schema['default'], default=str)}")
+
+    if type_ == "ARRAY":
+        result["items"] = _convert(schema.get("items", {}), root, refs)
+        if "minItems" in schema:
+            result["min_items"] = schema["minItems"]
+        if "maxItems" in schema:
+            result["max_items"] = schema["maxItems"]
+    elif type_ == "OBJECT":
+        properties = schema.get("properties") or {}
+        if properties:
+            result["properties"] = {
+                name: _convert(prop, root, refs) for name, prop in properties.items()
+            }
+            # Gemini rejects required names that aren't properties
+            required = [name for name in schema.get("required", []) if name in properties]
+            if required:
+                result["required"] = required
+
+    return result
+
+
+def _merge_all_of(
+    schema: Dict, root: Dict, refs: Tuple[str, ...]
+) -> Tuple[Dict, Tuple[str, ...]]:
+    """Merges the members of `allOf` into one schema; also returns the
+    $refs expanded along the way."""
+    merged: Dict[str, Any] = {}
+    expanded: Tuple[str, ...] = ()
+    properties: Dict[str, Any] = {}
+    required: List[str] = []
+    for part in schema["allOf"]:
+        if isinstance(part, dict) and "$ref" in part:
+            ref = part["$ref"]
+            if refs.count(ref) >= MAX_REF_EXPANSIONS:
+                continue
+            expanded += (ref,)
+            part = _resolve_ref(ref, root) or {}
+        if not isinstance(part, dict):
+            continue
+        properties.update(part.get("properties", {}))
+        required += [r for r in part.get("required", []) if r not in required]
+        merged.update({k: v for k, v in part.items() if k not in ("properties", "required")})
+    merged = _merge(schema, merged)
+    if properties:
+        merged["properties"] = {**properties, **schema.get("properties", {})}
+        merged["required"] = required + [
+            r for r in schema.get("required", []) if r not in required
+        ]
+    return merged, expanded
+
+
+def _infer_type(schema: Dict, enum: Optional[List]) -> str:
+    if "properties" in schema or "additionalProperties" in schema:
+        return "object"
+    if "items" in schema:
+        return "array"
+    if enum:
+        first = enum[0]
+        if isinstance(first, bool):
+            return "boolean"
+        if isinstance(first, int):
+            return "integer"
+        if isinstance(first, float):
+            return "number"
+    return "string"
+
+
+def _type_name(schema: Any) -> str:
+    if not isinstance(schema, dict):
+        return "any"
+    if "$ref" in schema:
+        return schema["$ref"].rsplit("/", 1)[-1]
+    type_ = schema.get("type", "any")
+    return "/".join(type_) if isinstance(type_, list) else str(type_)
+
+
+def _describe(schema: Dict, note: str) -> Dict:
+    schema = dict(schema)
+    description = schema.get("description")
+    schema["description"] = f"{description} ({note})" if description else note
+    return schema
+
+
+def _add_note(result: Dict, note: str):
+    description = result.get("description")
+    result["description"] = f"{description} ({note})" if description else note
+
+
+class SchemaCache:
+    """Memoizes conversions by content hash.
+
+    Tool declarations are cached per tool and per catalog, so an unchanged
+    catalog costs one hash per tool and a changed one converts only the
+    tools that differ. A catalog built from the same schema objects as the
+    previous call (e.g. a lazy client's cached tool list) skips hashing
+    altogether. Entries are evicted least recently used. Cached results are
+    shared, so callers must not modify them.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._last_catalog: Optional[Tuple[List[Tuple], List[Dict], List[Dict]]] = None
+
+    def _get(self, key: str):
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def _put(self, key: str, value):
+        self._entries[key] = value
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def convert(self, json_schema: Optional[Dict]) -> Dict:
+        if not json_schema:
+            return {}
+        key = "schema:" + schema_hash(json_schema)
+        converted = self._get(key)
+        if converted is None:
+            self.misses += 1
+            converted = convert_schema(json_schema)
+            self._put(key, converted)
+        else:
+            self.hits += 1
+        return converted
+
+    def convert_tools(self, tools: List[Dict]) -> List[Dict]:
+        """Function declarations for a list of MCP-style tool dicts (name,
+        description, input_schema)."""
+        signature = [(tool["name"], tool["description"]) for tool in tools]
+        schemas = [tool["input_schema"] for tool in tools]
+        last = self._last_catalog
+        if (
+            last is not None
+            and last[0] == signature
+            and all(a is b for a, b in zip(last[1], schemas))
+        ):
+            self.hits += 1
+            return last[2]
+
+        digests = [schema_hash(tool) for tool in tools]
+        key = "catalog:" + hashlib.sha256("".join(digests).encode()).hexdigest()
+        declarations = self._get(key)
+        if declarations is not None:
+            self.hits += 1
+        else:
+            declarations = [
+                self._declaration(tool, digest) for tool, digest in zip(tools, digests)
+            ]
+            self._put(key, declarations)
+        # Keeps the schemas alive so identity comparisons stay valid
+        self._last_catalog = (signature, schemas, declarations)
+        return declarations
+
+    def _declaration(self, tool: Dict, digest: str) -> Dict:
+        key = "tool:" + digest
+        declaration = self._get(key)
+        if declaration is not None:
+            self.hits += 1
+            return declaration
+        self.misses += 1
+        declaration = {"name": tool["name"], "description": tool["description"]}
+        parameters = convert_schema(tool["input_schema"])
+        # Gemini rejects an OBJECT without properties for a tool that takes
+        # no arguments
+        if parameters.get("properties"):
+            declaration["parameters"] = parameters
+        self._put(key, declaration)
+        return declaration
+
+    def clear(self):
+        self._entries.clear()
+        self._last_catalog = None
+        self.hits = self.misses = 0
@@ -0,0 +1,236 @@
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional, TextIO, Tuple
+
+SUPPORTED_SUFFIXES = (".md", ".txt", ".pdf", ".docx")
+
+
+def extract_text(path: str) -> str:
+    """Extracts the text of a .md, .txt, .pdf or .docx file.
+
+    Runs in worker processes. PDF and Word support needs the `ingest`
+    extra (pypdf and python-docx).
+    """
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix in (".md", ".txt"):
+        with open(path, encoding="utf-8", errors="replace") as f:
+            return f.read()
+    if suffix == ".pdf":
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            raise ImportError("Reading .pdf files needs pypdf: pip install 'app[ingest]'")
+        reader = PdfReader(path)
+        return "\n\n".join(page.extract_text() or "" for page in reader.pages)
+    if suffix == ".docx":
+        try:
+            import docx
+        except ImportError:
+            raise ImportError(
+                "Reading .docx files needs python-docx: pip install 'app[ingest]'"
+            )
+        document = docx.Document(path)
+        return "\n\n".join(paragraph.text for paragraph in document.paragraphs)
+    raise ValueError(f"Unsupported file type: {path}")
+
+
+def doc_id_for(rel_path: str) -> str:
+    """Document IDs go into resource URIs and @mentions, so path separators
+    become ':' and whitespace '_' (e.g. `reports:Q1_plan.pdf`)."""
+    return "_".join(rel_path.replace(os.sep, "/").replace("/", ":").split())
+
+
+@dataclass
+class IngestStats:
+    files: int = 0
+    extracted: int = 0
+    removed: int = 0
+    failed: int = 0
+    bytes_read: int = 0
+    chars: int = 0
+    seconds: float = 0.0
+    syncs: int = 0
+
+    def throughput(self) -> Tuple[float, float]:
+        """(files/s, MB/s) of extraction so far."""
+        if not self.seconds:
+            return 0.0, 0.0
+        return self.extracted / self.seconds, self.bytes_read / 1e6 / self.seconds
+
+
+class DirectoryIngester:
+    """Loads a directory tree into a DocumentStore and keeps it in sync.
+
+    The tree is polled every `interval` seconds. Files are compared by
+    mtime and size, so only new or changed files are extracted again, in a
+    pool of `workers` processes; files that disappear are removed from the
+    store. Progress goes to `log` (stderr: stdout may be the MCP transport).
+    """
+
+    def __init__(
+        self,
+        store,
+        root: str,
+        workers: Optional[int] = None,
+        interval: float = 5.0,
+        log: TextIO = sys.stderr,
+        progress_every: float = 2.0,
+    ):
+        self.store = store
+        self.root = os.path.abspath(root)
+        self.workers = workers or os.cpu_count() or 1
+        self.interval = interval
+        self.log = log
+        self.progress_every = progress_every
+        self.stats = IngestStats()
+        # doc_id -> (path, mtime_ns, size) of the version in the store, or
+        # of the last failed attempt so it isn't retried until it changes
+        self._seen: Dict[str, Tuple[str, int, int]] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def scan(self) -> Dict[str, Tuple[str, int, int]]:
+        """doc_id -> (path, mtime_ns, size) for every supported file."""
+        found: Dict[str, Tuple[str, int, int]] = {}
+        for directory, subdirs, files in os.walk(self.root):
+            subdirs[:] = sorted(d for d in subdirs if not d.startswith("."))
+            for name in sorted(files):
+                if name.startswith(".") or not name.lower().endswith(SUPPORTED_SUFFIXES):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue  # Removed while scanning
+                doc_id = doc_id_for(os.path.relpath(path, self.root))
+                if doc_id in found:
+                    self.log.write(
+                        f"Skipping {path}: its document ID {doc_id} is already "
+                        f"used by {found[doc_id][0]}\n"
+                    )
+                    continue
+                found[doc_id] = (path, stat.st_mtime_ns, stat.st_size)
+        return found
+
+    async def sync(self):
+        """Extracts new and changed files and drops removed ones."""
+        found = await asyncio.to_thread(self.scan)
+        self.stats.files = len(found)
+        self.stats.syncs += 1
+
+        for doc_id in [d for d in self._seen if d not in found]:
+            del self._seen[doc_id]
+            if doc_id in self.store:
+                del self.store[doc_id]
+                self.stats.removed += 1
+
+        changed = [
+            (doc_id, entry)
+            for doc_id, entry in found.items()
+            if self._seen.get(doc_id) != entry
+        ]
+        if changed:
+            await self._extract(changed)
+
+    async def _extract(self, changed):
+        if self._pool is None:
+            # Spawned workers don't inherit the server's threads and locks
+            self._pool = ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        last_report = start
+        done = 0
+        # Bounds the texts held in memory at once
+        limit = self.workers * 2
+        pending: Dict[asyncio.Future, Tuple[str, Tuple[str, int, int]]] = {}
+        items = iter(changed)
+
+        while True:
+            for doc_id, entry in items:
+                future = loop.run_in_executor(self._pool, extract_text, entry[0])
+                pending[future] = (doc_id, entry)
+                if len(pending) >= limit:
+                    break
+            if not pending:
+                break
+
+            finished, _ = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for future in finished:
+                doc_id, entry = pending.pop(future)
+                path, _mtime, size = entry
+                self._seen[doc_id] = entry
+                done += 1
+                try:
+                    text = future.result()
+                except Exception as e:
+                    self.stats.failed += 1
+                    self.log.write(f"Failed to extract {path}: {type(e).__name__}: {e}\n")
+                    continue
+                self.store[doc_id] = text
+                self.stats.extracted += 1
+                self.stats.bytes_read += size
+                self.stats.chars += len(text)
+
+            now = time.perf_counter()
+            self.stats.seconds += now - start
+            start = now
+            if now - last_report >= self.progress_every and pending:
+                last_report = now
+                self._report(f"{done}/{len(changed)} files")
+
+        self._report(f"{done} new or changed files")
+
+    def _report(self, progress: str):
+        files_per_second, mb_per_second = self.stats.throughput()
+        self.log.write(
+            f"Ingest {self.root}: {progress}, {self.stats.bytes_read / 1e6:.1f} MB read "
+            f"({files_per_second:.1f} files/s, {mb_per_second:.1f} MB/s), "
+            f"{self.stats.failed} failed, {self.stats.removed} removed\n"
+        )
+        self.log.flush()
+
+    async def run(self):
+        """Syncs now and then every `interval` seconds."""
+        while True:
+            try:
+                await self.sync()
+            except Exception as e:
+                self.log.write(f"Ingest {self.root} failed: {type(e).__name__}: {e}\n")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Starts polling in the background; calling it again is a no-op."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.close()
+
+    def close(self):
+        """Shuts down the worker processes; safe after the event loop ended."""
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def snapshot(self) -> Dict:
+        files_per_second, mb_per_second = self.stats.throughput()
+        return {
+            "root": self.root,
+            **asdict(self.stats),
+            "seconds": round(self.stats.seconds, 3),
+            "files_per_second": round(files_per_second, 1),
+            "mb_per_second": round(mb_per_second, 2),
+        }
@@ -0,0 +1,379 @@
+import bisect
+import io
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from core.scheduler import estimate_tokens
+
+
+# Seconds; spans cache hits and local RPCs up to slow provider calls
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self) -> str:
+        return f"# HELP {self.name} {self.help}\n# TYPE {self.name} {self.kind}\n"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[Tuple[LabelValues, float]]:
+        with self._lock:
+            return sorted(self._values.items())
+
+    def render(self) -> str:
+        lines = [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}\n"
+            for key, value in self.samples()
+        ]
+        return self.header() + "".join(lines)
+
+
+class _HistogramSeries:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: Dict[LabelValues, _HistogramSeries] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _HistogramSeries(len(self.buckets))
+            series.counts[index] += 1
+            series.sum += value
+            series.count += 1
+
+    def series(self) -> List[Tuple[LabelValues, _HistogramSeries]]:
+        with self._lock:
+            return sorted(self._series.items(), key=lambda item: item[0])
+
+    def quantile(self, q: float, series: _HistogramSeries) -> float:
+        """Estimates a quantile by interpolating within its bucket, like
+        Prometheus' histogram_quantile."""
+        if series.count == 0:
+            return math.nan
+        rank = q * series.count
+        cumulative = 0
+        for i, count in enumerate(series.counts):
+            if cumulative + count >= rank and count:
+                upper = self.buckets[i]
+                lower = self.buckets[i - 1] if i else 0.0
+                if upper == math.inf:
+                    return lower
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-2]
+
+    def render(self) -> str:
+        out = io.StringIO()
+        out.write(self.header())
+        for key, series in self.series():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series.counts):
+                cumulative += count
+                labels = _format_labels(
+                    self.labelnames, key, f'le="{_format_value(bound)}"'
+                )
+                out.write(f"{self.name}_bucket{labels} {cumulative}\n")
+            labels = _format_labels(self.labelnames, key)
+            out.write(f"{self.name}_sum{labels} {_format_value(series.sum)}\n")
+            out.write(f"{self.name}_count{labels} {series.count}\n")
+        return out.getvalue()
+
+
+class GaugeFunc(_Metric):
+    """A gauge whose value is read from a callback at collection time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, fn: Callable[[], float]):
+        super().__init__(name, help)
+        self.fn = fn
+
+    def render(self) -> str:
+        return f"{self.header()}{self.name} {_format_value(self.fn())}\n"
+
+
+class Registry:
+    """Holds metrics and renders them in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labelnames, buckets)
+
+    def gauge_func(self, name: str, help: str, fn: Callable[[], float]) -> GaugeFunc:
+        with self._lock:
+            metric = self._metrics[name] = GaugeFunc(name, help, fn)
+            return metric
+
+    def metrics(self) -> Iterable[_Metric]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render(self) -> str:
+        return "".join(metric.render() for metric in self.metrics())
+
+    def summary(self) -> str:
+        """Human-readable totals and latency percentiles."""
+        out = io.StringIO()
+        for metric in self.metrics():
+            if isinstance(metric, Counter):
+                for key, value in metric.samples():
+                    labels = _format_labels(metric.labelnames, key)
+                    out.write(f"{metric.name}{labels} {_format_value(value)}\n")
+            elif isinstance(metric, Histogram):
+                for key, series in metric.series():
+                    labels = _format_labels(metric.labelnames, key)
+                    p50, p95, p99 = (
+                        metric.quantile(q, series) * 1000 for q in (0.5, 0.95, 0.99)
+                    )
+                    out.write(
+                        f"{metric.name}{labels} n={series.count} "
+                        f"p50={p50:.1f}ms p95={p95:.1f}ms p99={p99:.1f}ms\n"
+                    )
+            elif isinstance(metric, GaugeFunc):
+                out.write(f"{metric.name} {_format_value(metric.fn())}\n")
+        return out.getvalue() or "No metrics recorded yet.\n"
+
+    def dump(self, path: str):
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(f"{path}.tmp", path)
+
+
+REGISTRY = Registry()
+
+PROVIDER_LATENCY = REGISTRY.histogram(
+    "llm_provider_request_seconds",
+    "Latency of provider chat requests.",
+    ["model", "outcome"],
+)
+PROVIDER_TOKENS = REGISTRY.counter(
+    "llm_provider_tokens_total",
+    "Tokens sent to and received from the provider (estimated when the provider doesn't report usage).",
+    ["model", "kind"],
+)
+TOOL_CALLS = REGISTRY.counter(
+    "mcp_tool_calls_total",
+    "Tool calls by server, tool and outcome.",
+    ["server", "tool", "outcome"],
+)
+TOOL_LATENCY = REGISTRY.histogram(
+    "mcp_tool_call_seconds",
+    "Latency of tool calls, including memoized ones.",
+    ["server", "tool"],
+)
+MCP_REQUEST_LATENCY = REGISTRY.histogram(
+    "mcp_request_seconds",
+    "Latency of MCP requests by server and method.",
+    ["server", "method", "outcome"],
+)
+ERRORS = REGISTRY.counter(
+    "errors_total",
+    "Errors by component and exception type.",
+    ["component", "type"],
+)
+
+
+def record_error(component: str, exc: BaseException):
+    ERRORS.inc(component=component, type=type(exc).__name__)
+
+
+def watch_cache(cache) -> None:
+    """Exposes a ResponseCache's hit and miss counts."""
+    REGISTRY.gauge_func(
+        "llm_cache_hits", "Provider responses served from the cache.", lambda: cache.hits
+    )
+    REGISTRY.gauge_func(
+        "llm_cache_misses", "Provider requests not found in the cache.", lambda: cache.misses
+    )
+    REGISTRY.gauge_func(
+        "llm_cache_hit_ratio",
+        "Share of provider requests served from the cache.",
+        lambda: cache.hits / (cache.hits + cache.misses) if cache.hits + cache.misses else 0.0,
+    )
+
+
+def serve(port: int, host: str = "127.0.0.1", registry: Optional[Registry] = None):
+    """Serves /metrics over HTTP from a daemon thread; returns the server."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    registry = registry or REGISTRY
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+class MeteredProvider:
+    """Wraps a provider and records latency, tokens and errors per call."""
+
+    def __init__(self, provider):
+        self.provider = provider
+
+    def __getattr__(self, name):
+        return getattr(self.provider, name)
+
+    def _model_id(self) -> str:
+        provider = self.provider
+        while hasattr(provider, "provider"):
+            provider = provider.provider
+        return getattr(provider, "model_name", None) or str(getattr(provider, "model", ""))
+
+    def chat(
+        self,
+        messages,
+        system=None,
+        temperature=1.0,
+        stop_sequences=[],
+        tools=None,
+        thinking=False,
+        thinking_budget=1024,
+    ):
+        model = self._model_id()
+        start = time.perf_counter()
+        try:
+            response = self.provider.chat(
+                messages=messages,
+                system=system,
+                temperature=temperature,
+                stop_sequences=stop_sequences,
+                tools=tools,
+                thinking=thinking,
+                thinking_budget=thinking_budget,
+            )
+        except Exception as e:
+            PROVIDER_LATENCY.observe(
+                time.perf_counter() - start, model=model, outcome="error"
+            )
+            record_error("provider", e)
+            raise
+        PROVIDER_LATENCY.observe(
+            time.perf_counter() - start, model=model, outcome="ok"
+        )
+
+        usage = getattr(response, "usage", None)
+        if usage is not None and hasattr(usage, "input_tokens"):
+            prompt_tokens, completion_tokens = usage.input_tokens, usage.output_tokens
+        else:
+            prompt_tokens = estimate_tokens(messages, system, tools)
+            completion_tokens = estimate_tokens(
+                self.provider.text_from_message(response)
+            )
+        PROVIDER_TOKENS.inc(prompt_tokens, model=model, kind="prompt")
+        PROVIDER_TOKENS.inc(completion_tokens, model=model, kind="completion")
+        return response
@@ -0,0 +1,157 @@
+import functools
+import io
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, TextIO
+
+
+class Profiler:
+    """Collects cProfile data per chat turn (or for a whole run).
+
+    Each profile is written to `directory` as `<name>-turn-NNNN.prof` (or
+    `<name>-<pid>.prof` for a whole run), loadable with `pstats` or
+    snakeviz. Functions decorated with `hot_path` are also timed directly,
+    including when they run in worker threads that cProfile doesn't see.
+    """
+
+    def __init__(self, directory: str, name: str, top: int = 25):
+        import cProfile
+        import pstats
+
+        self._cprofile = cProfile
+        self._pstats = pstats
+        self.directory = directory
+        self.name = name
+        self.top = top
+        self.turns = 0
+        self._active = None
+        self._run_profile = None
+        self._stats = None
+        self._hot_paths: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def turn(self):
+        """Profiles one turn. Turns that overlap a running one (concurrent
+        batch queries) are attributed to the turn that started first."""
+        if self._active is not None or self._run_profile is not None:
+            yield
+            return
+        self.turns += 1
+        path = os.path.join(self.directory, f"{self.name}-turn-{self.turns:04d}.prof")
+        profile = self._cprofile.Profile()
+        self._active = profile
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            self._active = None
+            self._save(profile, path)
+
+    def start_run(self):
+        """Profiles everything until `shutdown`, e.g. a server process."""
+        self._run_profile = self._cprofile.Profile()
+        self._run_profile.enable()
+
+    def _save(self, profile, path: str):
+        profile.dump_stats(path)
+        if self._stats is None:
+            self._stats = self._pstats.Stats(profile)
+        else:
+            self._stats.add(profile)
+
+    def record_hot_path(self, name: str, seconds: float):
+        with self._lock:
+            entry = self._hot_paths.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def summary(self) -> str:
+        out = io.StringIO()
+        if self._stats is not None:
+            out.write(f"Top {self.top} functions by cumulative time ({self.name}):\n")
+            self._stats.stream = out
+            self._stats.sort_stats("cumulative").print_stats(self.top)
+        if self._hot_paths:
+            out.write("Hot paths:\n")
+            out.write(f"{'calls':>8} {'total ms':>10} {'max ms':>9}  function\n")
+            for name, (calls, total, longest) in sorted(
+                self._hot_paths.items(), key=lambda item: -item[1][1]
+            ):
+                out.write(
+                    f"{calls:>8} {total * 1000:>10.2f} {longest * 1000:>9.3f}  {name}\n"
+                )
+        return out.getvalue()
+
+    def shutdown(self, stream: TextIO = sys.stderr):
+        """Saves a whole-run profile and writes the summary to the directory
+        and to `stream` (stderr by default, never stdout: it may be an MCP
+        transport)."""
+        if self._run_profile is not None:
+            self._run_profile.disable()
+            path = os.path.join(self.directory, f"{self.name}-{os.getpid()}.prof")
+            self._save(self._run_profile, path)
+            self._run_profile = None
+
+        summary = self.summary()
+        if not summary:
+            return
+        path = os.path.join(self.directory, f"{self.name}-summary.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(summary)
+        stream.write(summary)
+        stream.write(f"Profiles written to {self.directory}\n")
+
+
+_profiler: Optional[Profiler] = None
+
+
+def configure(directory: str, name: str) -> Profiler:
+    global _profiler
+    _profiler = Profiler(directory, name)
+    return _profiler
+
+
+def get_profiler() -> Optional[Profiler]:
+    return _profiler
+
+
+@contextmanager
+def turn():
+    """Profiles a chat turn when profiling is configured."""
+    if _profiler is None:
+        yield
+        return
+    with _profiler.turn():
+        yield
+
+
+def shutdown():
+    global _profiler
+    if _profiler is not None:
+        _profiler.shutdown()
+        _profiler = None
+
+
+def hot_path(fn):
+    """Times every call of `fn` while profiling is configured."""
+    name = fn.__qualname__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        profiler = _profiler
+        if profiler is None:
+            return fn(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profiler.record_hot_path(name, time.perf_counter() - start)
+
+    return wrapper
@@ -0,0 +1,220 @@
+import hashlib
+import math
+import re
+import zlib
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence, Tuple
+
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def approx_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)."""
+    return len(text) // 4 + 1
+
+
+def tokenize(text: str) -> List[str]:
+    return _WORD_RE.findall(text.casefold())
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _split_pieces(text: str, max_chars: int) -> List[Tuple[str, str]]:
+    """Paragraphs, or the sentences of paragraphs longer than `max_chars`,
+    as (text, separator from the previous piece) pairs."""
+    pieces: List[Tuple[str, str]] = []
+    for paragraph in _PARAGRAPH_RE.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            pieces.append((paragraph, "\n\n"))
+            continue
+        separator = "\n\n"
+        for sentence in _SENTENCE_RE.split(paragraph):
+            while len(sentence) > max_chars:
+                pieces.append((sentence[:max_chars], separator))
+                sentence = sentence[max_chars:]
+                separator = ""
+            if sentence:
+                pieces.append((sentence, separator))
+            separator = " "
+    return pieces
+
+
+def chunk_text(text: str, max_chars: int = 1200) -> List[str]:
+    """Splits text into chunks of at most `max_chars`.
+
+    Paragraphs are kept together when they fit; longer paragraphs are split
+    on sentence boundaries, and sentences longer than a chunk are cut.
+    """
+    chunks: List[str] = []
+    current = ""
+    for piece, separator in _split_pieces(text, max_chars):
+        if current and len(current) + len(separator) + len(piece) > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current}{separator}{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def chunk_text_stable(text: str, max_chars: int = 8000) -> List[str]:
+    """Like `chunk_text`, but chunk boundaries depend on content rather than
+    position, so an edit changes only the chunks around it.
+
+    A chunk ends after a piece whose checksum hits a fixed pattern once it
+    holds at least half of `max_chars` (or when the next piece wouldn't
+    fit). Inserting or deleting text shifts boundaries only until the next
+    such piece.
+    """
+    min_chars = max_chars // 2
+    chunks: List[str] = []
+    current = ""
+    for piece, separator in _split_pieces(text, max_chars):
+        if current and len(current) + len(separator) + len(piece) > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current}{separator}{piece}" if current else piece
+        if len(current) >= min_chars and zlib.crc32(piece.encode("utf-8")) % 4 == 0:
+            chunks.append(current)
+            current = ""
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+@dataclass
+class DocumentChunks:
+    """Chunks of one document version with their term statistics."""
+
+    doc_id: str
+    chunks: List[str]
+    term_freqs: List[Counter] = field(default_factory=list)
+    lengths: List[int] = field(default_factory=list)
+    doc_freqs: Counter = field(default_factory=Counter)
+
+    @classmethod
+    def build(cls, doc_id: str, content: str, max_chars: int) -> "DocumentChunks":
+        entry = cls(doc_id=doc_id, chunks=chunk_text(content, max_chars))
+        for chunk in entry.chunks:
+            terms = Counter(tokenize(chunk))
+            entry.term_freqs.append(terms)
+            entry.lengths.append(sum(terms.values()))
+            entry.doc_freqs.update(terms.keys())
+        return entry
+
+
+class ChunkRetriever:
+    """Selects the chunks of mentioned documents most relevant to a query.
+
+    Chunks are ranked with BM25 across all mentioned documents. The chunked
+    and tokenized form of each document is cached by content hash, so a
+    repeat question about an unchanged document skips re-indexing it.
+    """
+
+    def __init__(
+        self,
+        chunk_chars: int = 1200,
+        max_cached_documents: int = 128,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.chunk_chars = chunk_chars
+        self.max_cached_documents = max_cached_documents
+        self.k1 = k1
+        self.b = b
+        self._cache: OrderedDict[Tuple[str, str], DocumentChunks] = OrderedDict()
+
+    def index(self, doc_id: str, content: str) -> DocumentChunks:
+        key = (doc_id, content_hash(content))
+        entry = self._cache.get(key)
+        if entry is None:
+            entry = DocumentChunks.build(doc_id, content, self.chunk_chars)
+            self._cache[key] = entry
+            while len(self._cache) > self.max_cached_documents:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(key)
+        return entry
+
+    def _score(
+        self, entries: Sequence[DocumentChunks], query_terms: List[str]
+    ) -> List[Tuple[float, int, int]]:
+        total_chunks = sum(len(e.chunks) for e in entries)
+        all_lengths = [length for e in entries for length in e.lengths]
+        avg_length = sum(all_lengths) / max(len(all_lengths), 1) or 1.0
+
+        idf: Dict[str, float] = {}
+        for term in set(query_terms):
+            df = sum(e.doc_freqs.get(term, 0) for e in entries)
+            if df:
+                idf[term] = math.log(1 + (total_chunks - df + 0.5) / (df + 0.5))
+
+        scored = []
+        for doc_index, entry in enumerate(entries):
+            for chunk_index, terms in enumerate(entry.term_freqs):
+                norm = self.k1 * (
+                    1 - self.b + self.b * entry.lengths[chunk_index] / avg_length
+                )
+                score = 0.0
+                for term, weight in idf.items():
+                    tf = terms.get(term, 0)
+                    if tf:
+                        score += weight * tf * (self.k1 + 1) / (tf + norm)
+                scored.append((score, doc_index, chunk_index))
+        return scored
+
+    def select(
+        self,
+        query: str,
+        documents: Sequence[Tuple[str, str]],
+        token_budget: int,
+    ) -> List[Tuple[str, List[Tuple[int, str]], int]]:
+        """Returns [(doc_id, [(chunk_index, text), ...], total_chunks)].
+
+        Documents that fit the budget together are returned whole. Otherwise
+        the best chunks are taken in score order until the budget is used,
+        then put back in document order. Without any matching query term,
+        the beginning of each document is used; otherwise only matching
+        chunks are included.
+        """
+        if sum(approx_tokens(content) for _, content in documents) <= token_budget:
+            return [(doc_id, [(0, content)], 1) for doc_id, content in documents]
+
+        entries = [self.index(doc_id, content) for doc_id, content in documents]
+
+        scored = self._score(entries, tokenize(query))
+        if any(score > 0 for score, _, _ in scored):
+            # Don't fill the budget with chunks that match nothing
+            scored = [item for item in scored if item[0] > 0]
+        # Highest score first; ties keep document order so that without
+        # matches the leading chunks of each document are picked.
+        scored.sort(key=lambda item: (-item[0], item[2], item[1]))
+
+        selected: Dict[int, List[int]] = {}
+        used = 0
+        for _score, doc_index, chunk_index in scored:
+            cost = approx_tokens(entries[doc_index].chunks[chunk_index])
+            if used + cost > token_budget:
+                continue
+            selected.setdefault(doc_index, []).append(chunk_index)
+            used += cost
+
+        return [
+            (
+                entry.doc_id,
+                [(i, entry.chunks[i]) for i in sorted(selected.get(doc_index, []))],
+                len(entry.chunks),
+            )
+            for doc_index, entry in enumerate(entries)
+        ]
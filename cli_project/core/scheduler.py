@@ -0,0 +1,256 @@
+import contextvars
+import heapq
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Optional, Tuple
+
+from core import deadline
+
+
+INTERACTIVE = 0
+BATCH = 1
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar(
+    "request_priority", default=INTERACTIVE
+)
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+
+_RETRY_AFTER_PATTERNS = (
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)"),
+    re.compile(r"retry in\s*([\d.]+)\s*s", re.IGNORECASE),
+)
+
+
+@contextmanager
+def priority(level: int):
+    """Sets the scheduling priority for provider calls made in this context.
+
+    Lower values run first. The value follows asyncio tasks and
+    asyncio.to_thread calls through contextvars.
+    """
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    """Refills `rate_per_minute` units per minute up to `capacity`."""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def time_until(self, amount: float, now: float) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+
+def retry_info(exc: BaseException) -> Tuple[bool, Optional[float]]:
+    """Classifies a provider error as (retryable, retry_after_seconds)."""
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True, None
+
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    try:
+        status = int(status)
+    except (TypeError, ValueError):
+        return False, None
+    if status not in RETRYABLE_STATUS:
+        return False, None
+
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    retry_after = headers.get("retry-after") if hasattr(headers, "get") else None
+    if retry_after:
+        try:
+            return True, float(retry_after)
+        except ValueError:
+            pass
+
+    message = str(exc)
+    for pattern in _RETRY_AFTER_PATTERNS:
+        match = pattern.search(message)
+        if match:
+            return True, float(match.group(1))
+
+    return True, None
+
+
+class RateLimitScheduler:
+    """Paces provider calls with token buckets and retries transient errors.
+
+    Calls wait in a priority queue; interactive traffic is admitted before
+    batch traffic whenever both are waiting. A retry-after hint from the
+    provider pauses every caller, not only the one that was rejected.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+    ):
+        self.request_bucket = (
+            TokenBucket(requests_per_minute) if requests_per_minute else None
+        )
+        self.token_bucket = (
+            TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        )
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._cond = threading.Condition()
+        self._waiters: list[Tuple[int, int]] = []
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+
+    def _wait_time(self, tokens: float, now: float) -> float:
+        wait = self._paused_until - now
+        if self.request_bucket:
+            wait = max(wait, self.request_bucket.time_until(1, now))
+        if self.token_bucket:
+            wait = max(wait, self.token_bucket.time_until(tokens, now))
+        return wait
+
+    def acquire(self, tokens: float, level: int):
+        """Blocks until this call is first in line and within the limits."""
+        ticket = (level, next(self._sequence))
+        with self._cond:
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    if self._waiters[0] != ticket:
+                        deadline.check()
+                        self._cond.wait(timeout=deadline.remaining())
+                        continue
+
+                    wait = self._wait_time(tokens, time.monotonic())
+                    if wait <= 0:
+                        break
+                    left = deadline.remaining()
+                    if left is not None and wait > left:
+                        raise deadline.DeadlineExceeded(
+                            "Rate limit wait would pass the deadline"
+                        )
+                    self._cond.wait(timeout=wait)
+
+                if self.request_bucket:
+                    self.request_bucket.consume(1)
+                if self.token_bucket:
+                    self.token_bucket.consume(tokens)
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    def pause(self, seconds: float):
+        with self._cond:
+            self._paused_until = max(
+                self._paused_until, time.monotonic() + seconds
+            )
+            self._cond.notify_all()
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float]) -> float:
+        if retry_after is not None:
+            return retry_after + random.uniform(0, self.base_delay)
+        return random.uniform(
+            0, min(self.max_delay, self.base_delay * 2**attempt)
+        )
+
+    def call(self, fn: Callable[[], Any], tokens: float = 0) -> Any:
+        level = _priority.get()
+        attempt = 0
+        while True:
+            self.acquire(tokens, level)
+            try:
+                return fn()
+            except Exception as e:
+                retryable, retry_after = retry_info(e)
+                if not retryable or attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt, retry_after)
+                left = deadline.remaining()
+                if left is not None and delay > left:
+                    raise
+                if retry_after is not None:
+                    self.pause(delay)
+                else:
+                    time.sleep(delay)
+                attempt += 1
+
+    @classmethod
+    def from_env(cls) -> "RateLimitScheduler":
+        """Builds a scheduler from LLM_RPM, LLM_TPM and LLM_MAX_RETRIES."""
+        rpm = os.getenv("LLM_RPM")
+        tpm = os.getenv("LLM_TPM")
+        return cls(
+            requests_per_minute=float(rpm) if rpm else None,
+            tokens_per_minute=float(tpm) if tpm else None,
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "5")),
+        )
+
+
+def estimate_tokens(messages: Any, system: Any = None, tools: Any = None) -> int:
+    """Rough prompt size estimate (~4 characters per token)."""
+    size = len(json.dumps([messages, system, tools], default=str))
+    return size // 4 + 1
+
+
+class ScheduledProvider:
+    """Wraps a provider so every chat call goes through a shared scheduler."""
+
+    def __init__(self, provider, scheduler: RateLimitScheduler):
+        self.provider = provider
+        self.scheduler = scheduler
+
+    def __getattr__(self, name):
+        return getattr(self.provider, name)
+
+    def chat(
+        self,
+        messages,
+        system=None,
+        temperature=1.0,
+        stop_sequences=[],
+        tools=None,
+        thinking=False,
+        thinking_budget=1024,
+    ):
+        return self.scheduler.call(
+            lambda: self.provider.chat(
+                messages=messages,
+                system=system,
+                temperature=temperature,
+                stop_sequences=stop_sequences,
+                tools=tools,
+                thinking=thinking,
+                thinking_budget=thinking_budget,
+            ),
+            tokens=estimate_tokens(messages, system, tools),
+        )
@@ -0,0 +1,199 @@
+import functools
+import inspect
+import json
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, ContextManager, Dict, Optional
+
+from core.metrics import DEFAULT_BUCKETS, Registry
+
+# A middleware receives the call before the handler runs and can read
+# `call.result` (or see the exception) when its context exits.
+Middleware = Callable[["HandlerCall"], ContextManager]
+
+# Local handlers usually finish well under a millisecond
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005) + DEFAULT_BUCKETS
+
+# Powers of 4 from 64 bytes to 16 MiB
+PAYLOAD_BUCKETS = tuple(64 * 4**i for i in range(10))
+
+
+@dataclass
+class HandlerCall:
+    kind: str
+    name: str
+    arguments: Dict[str, Any] = field(default_factory=dict)
+    result: Any = None
+
+
+def _wrap(fn, kind: str, name: str, middleware: Middleware):
+    if inspect.iscoroutinefunction(fn):
+
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            call = HandlerCall(kind, name, kwargs)
+            with middleware(call):
+                call.result = await fn(*args, **kwargs)
+            return call.result
+
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        call = HandlerCall(kind, name, kwargs)
+        with middleware(call):
+            call.result = fn(*args, **kwargs)
+        return call.result
+
+    return wrapper
+
+
+def instrument_handlers(server, middleware: Middleware):
+    """Wraps every tool, resource, resource template and prompt registered
+    on a FastMCP server. Call it after all handlers are registered."""
+    for tool in server._tool_manager._tools.values():
+        tool.fn = _wrap(tool.fn, "tool", tool.name, middleware)
+    for resource in server._resource_manager._resources.values():
+        if hasattr(resource, "fn"):
+            resource.fn = _wrap(resource.fn, "resource", str(resource.uri), middleware)
+    for template in server._resource_manager._templates.values():
+        template.fn = _wrap(template.fn, "resource", template.uri_template, middleware)
+    for prompt in server._prompt_manager._prompts.values():
+        prompt.fn = _wrap(prompt.fn, "prompt", prompt.name, middleware)
+
+
+def instrument_requests(server, middleware: Middleware):
+    """Wraps the low-level request handlers, which include FastMCP's
+    argument validation and result conversion around the handler itself."""
+    handlers = server._mcp_server.request_handlers
+    for request_type, handler in list(handlers.items()):
+        method = request_type.model_fields["method"].annotation.__args__[0]
+        handlers[request_type] = _wrap(handler, "request", method, middleware)
+
+
+def payload_size(value: Any) -> int:
+    """Approximate size in bytes of a handler's arguments or result."""
+    if value is None:
+        return 0
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return len(str(value))
+
+
+class ServerStats:
+    """Call counts, latency, payload sizes and errors for a FastMCP server.
+
+    Handler latency covers only the registered function. Request latency
+    covers the whole low-level request (validation, the handler and result
+    conversion), so the difference is the server's own overhead.
+    """
+
+    def __init__(self, registry: Optional[Registry] = None):
+        self.registry = registry or Registry()
+        self.started_at = time.time()
+        self.calls = self.registry.counter(
+            "mcp_server_calls_total",
+            "Handler calls by kind, name and outcome.",
+            ["kind", "name", "outcome"],
+        )
+        self.handler_latency = self.registry.histogram(
+            "mcp_server_handler_seconds",
+            "Time spent in registered handler functions.",
+            ["kind", "name"],
+            buckets=LATENCY_BUCKETS,
+        )
+        self.request_latency = self.registry.histogram(
+            "mcp_server_request_seconds",
+            "Time spent handling MCP requests, including result conversion.",
+            ["method"],
+            buckets=LATENCY_BUCKETS,
+        )
+        self.payload = self.registry.histogram(
+            "mcp_server_payload_bytes",
+            "Size of handler arguments and results.",
+            ["kind", "name", "direction"],
+            buckets=PAYLOAD_BUCKETS,
+        )
+
+    def instrument(self, server):
+        instrument_handlers(server, self._handler_middleware)
+        instrument_requests(server, self._request_middleware)
+
+    @contextmanager
+    def _handler_middleware(self, call: HandlerCall):
+        self.payload.observe(
+            payload_size(call.arguments), kind=call.kind, name=call.name, direction="in"
+        )
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            yield
+            outcome = "ok"
+        finally:
+            self.handler_latency.observe(
+                time.perf_counter() - start, kind=call.kind, name=call.name
+            )
+            self.calls.inc(kind=call.kind, name=call.name, outcome=outcome)
+            if outcome == "ok":
+                self.payload.observe(
+                    payload_size(call.result),
+                    kind=call.kind,
+                    name=call.name,
+                    direction="out",
+                )
+
+    @contextmanager
+    def _request_middleware(self, call: HandlerCall):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.request_latency.observe(time.perf_counter() - start, method=call.name)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Per-handler and per-method stats as a JSON-serializable dict."""
+        handlers: Dict[str, Dict[str, Any]] = {}
+        for (kind, name, outcome), count in self.calls.samples():
+            entry = handlers.setdefault(
+                f"{kind}:{name}", {"kind": kind, "name": name, "calls": 0, "errors": 0}
+            )
+            entry["calls"] += count
+            if outcome == "error":
+                entry["errors"] += count
+
+        for (kind, name), series in self.handler_latency.series():
+            entry = handlers.get(f"{kind}:{name}")
+            if entry is not None:
+                entry["error_rate"] = round(entry["errors"] / entry["calls"], 4)
+                entry["latency_ms"] = self._latency(self.handler_latency, series)
+
+        for (kind, name, direction), series in self.payload.series():
+            entry = handlers.get(f"{kind}:{name}")
+            if entry is not None and series.count:
+                entry[f"avg_bytes_{direction}"] = round(series.sum / series.count)
+
+        requests = {
+            method: {
+                "count": series.count,
+                "latency_ms": self._latency(self.request_latency, series),
+            }
+            for (method,), series in self.request_latency.series()
+        }
+        return {
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "handlers": list(handlers.values()),
+            "requests": requests,
+        }
+
+    @staticmethod
+    def _latency(histogram, series) -> Dict[str, float]:
+        return {
+            "p50": round(histogram.quantile(0.5, series) * 1000, 3),
+            "p95": round(histogram.quantile(0.95, series) * 1000, 3),
+            "p99": round(histogram.quantile(0.99, series) * 1000, 3),
+            "avg": round(series.sum / series.count * 1000, 3) if series.count else 0.0,
+        }
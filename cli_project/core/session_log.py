@@ -0,0 +1,157 @@
+import json
+import mmap
+import os
+import struct
+from typing import Any, Dict, List, Optional
+
+
+_LENGTH = struct.Struct(">I")
+_OFFSET = struct.Struct(">Q")
+
+
+def _json_default(value: Any) -> Any:
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    return str(value)
+
+
+class SessionLog:
+    """Append-only log of chat turns.
+
+    The data file holds one length-prefixed JSON record per turn with the
+    messages that turn added. A sidecar `.idx` file holds the 8-byte offset
+    of every record, so any turn (including the latest) is found in O(1)
+    and read through a memory map without scanning the log.
+
+    Every `snapshot_every` turns the record also holds the whole message
+    list so far, so resuming reads the latest snapshot and the turns after
+    it instead of replaying the log from the start.
+    """
+
+    def __init__(self, path: str, snapshot_every: int = 50):
+        if snapshot_every < 1:
+            raise ValueError(f"snapshot_every must be at least 1: {snapshot_every}")
+        self.path = path
+        self.snapshot_every = snapshot_every
+        self.index_path = f"{path}.idx"
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._data = open(path, "a+b")
+        self._index = open(self.index_path, "a+b")
+        self._map: Optional[mmap.mmap] = None
+        self._mapped_size = 0
+        self._offsets: List[int] = []
+        # Index of the latest turn with a snapshot, -1 for none; found on
+        # first use, since that means reading records
+        self._snapshot: Optional[int] = None
+        self._recover()
+
+    def _recover(self):
+        """Drops records that were only partially written by a crash.
+
+        Records are contiguous, so only the tail needs checking: the last
+        indexed record must end inside the data file.
+        """
+        self._index.seek(0)
+        raw = self._index.read()
+        whole = len(raw) - len(raw) % _OFFSET.size
+        offsets = [o for (o,) in _OFFSET.iter_unpack(raw[:whole])]
+        data_size = os.fstat(self._data.fileno()).st_size
+
+        end = 0
+        while offsets:
+            offset = offsets[-1]
+            if offset + _LENGTH.size <= data_size:
+                self._data.seek(offset)
+                (length,) = _LENGTH.unpack(self._data.read(_LENGTH.size))
+                end = offset + _LENGTH.size + length
+                if end <= data_size:
+                    break
+            offsets.pop()
+            end = 0
+
+        if end != data_size:
+            self._data.truncate(end)
+        if len(offsets) * _OFFSET.size != len(raw):
+            self._index.truncate(len(offsets) * _OFFSET.size)
+        self._offsets = offsets
+        self._end = end
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def append(self, messages: List[Dict[str, Any]], **metadata) -> int:
+        """Writes one turn and returns its index."""
+        record = {"messages": messages, **metadata}
+        index = len(self._offsets)
+        snapshot = (index + 1) % self.snapshot_every == 0
+        if snapshot:
+            # Reads back at most `snapshot_every` turns
+            record["snapshot"] = self.load_messages() + messages
+        payload = json.dumps(
+            record, ensure_ascii=False, default=_json_default
+        ).encode("utf-8")
+
+        # Both files are opened in append mode, so writes land at the end
+        offset = self._end
+        self._data.write(_LENGTH.pack(len(payload)) + payload)
+        self._data.flush()
+        # The index entry is written last: a record is only visible once
+        # both it and its offset are on disk.
+        self._index.write(_OFFSET.pack(offset))
+        self._index.flush()
+
+        self._offsets.append(offset)
+        self._end = offset + _LENGTH.size + len(payload)
+        if snapshot:
+            self._snapshot = index
+        return index
+
+    def _view(self) -> mmap.mmap:
+        if self._map is None or self._mapped_size < self._end:
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self._data.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapped_size = len(self._map)
+        return self._map
+
+    def turn(self, index: int) -> Dict[str, Any]:
+        """Reads a single turn; negative indexes count from the end."""
+        offset = self._offsets[index]
+        view = self._view()
+        (length,) = _LENGTH.unpack_from(view, offset)
+        start = offset + _LENGTH.size
+        return json.loads(view[start : start + length])
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        return self.turn(-1) if self._offsets else None
+
+    def _latest_snapshot(self) -> int:
+        if self._snapshot is None:
+            index = len(self._offsets) - 1
+            while index >= 0 and "snapshot" not in self.turn(index):
+                index -= 1
+            self._snapshot = index
+        return self._snapshot
+
+    def load_messages(self, last_turns: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Rebuilds the message list, optionally from the last N turns only."""
+        messages: List[Dict[str, Any]] = []
+        if last_turns is None:
+            start = self._latest_snapshot()
+            if start >= 0:
+                messages = self.turn(start)["snapshot"]
+            start += 1
+        else:
+            start = max(len(self._offsets) - last_turns, 0)
+        for index in range(start, len(self._offsets)):
+            messages += self.turn(index)["messages"]
+        return messages
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._data.close()
+        self._index.close()
@@ -0,0 +1,165 @@
+import asyncio
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from core import deadline, tracing
+from core.batch import run_bounded
+from core.retrieval import content_hash
+
+MAP_PROMPT = """Summarize this section of the document "{doc_id}" (part {part} of {total}).
+Keep names, figures, dates and conclusions. Write only the summary.
+
+<section>
+{text}
+</section>"""
+
+REDUCE_PROMPT = """Combine these summaries of consecutive sections of the document "{doc_id}" into one summary.
+Keep names, figures, dates and conclusions. Write only the summary.
+
+{summaries}"""
+
+FINAL_PROMPT = """Please provide a concise summary of the document "{doc_id}". It was too long to read at once, so here are summaries of its sections, in order:
+
+{summaries}"""
+
+
+class ChunkSummaryCache:
+    """Chunk summaries keyed by the hash of the chunk text, so summarizing
+    an edited document only recomputes the chunks that changed."""
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, str] = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        summary = self._entries.get(key)
+        if summary is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return summary
+
+    def put(self, key: str, summary: str):
+        self._entries[key] = summary
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class MapReduceSummarizer:
+    """Summarizes documents too large for a single request.
+
+    Each chunk is summarized separately (the map step), at most
+    `concurrency` at a time. When the chunk summaries together are still
+    longer than `reduce_chars`, consecutive groups of them are summarized
+    again until they fit. The final reduction is left to the caller, which
+    sends `final_prompt` as a regular chat turn.
+    """
+
+    def __init__(
+        self,
+        provider,
+        concurrency: int = 4,
+        cache: Optional[ChunkSummaryCache] = None,
+        reduce_chars: int = 12000,
+    ):
+        self.provider = provider
+        self.concurrency = concurrency
+        self.cache = cache if cache is not None else ChunkSummaryCache()
+        self.reduce_chars = reduce_chars
+
+    async def _complete(self, prompt: str) -> str:
+        response = await deadline.wait_for(
+            asyncio.to_thread(
+                self.provider.chat,
+                messages=[{"role": "user", "content": prompt}],
+            )
+        )
+        return self.provider.text_from_message(response).strip()
+
+    async def _summarize_all(self, prompts: List[Tuple[str, str]]) -> List[str]:
+        """Summarizes (cache key, prompt) pairs, returning results in order."""
+        results: List[Optional[str]] = [None] * len(prompts)
+        todo = []
+        for index, (key, prompt) in enumerate(prompts):
+            results[index] = self.cache.get(key)
+            if results[index] is None:
+                todo.append((index, key, prompt))
+
+        async def summarize(item):
+            index, key, prompt = item
+            summary = await self._complete(prompt)
+            self.cache.put(key, summary)
+            return index, summary
+
+        async for index, summary in run_bounded(todo, summarize, self.concurrency):
+            results[index] = summary
+        return results
+
+    async def summarize_chunks(self, doc_id: str, chunks: List[Dict]) -> List[str]:
+        """Returns section summaries that together fit in `reduce_chars`.
+
+        `chunks` are the items of the `docs://documents/{doc_id}/chunks`
+        resource.
+        """
+        total = len(chunks)
+        hits = self.cache.hits
+        with tracing.span("summarize.map", doc_id=doc_id, chunks=total) as span:
+            # The hash covers the prompt too, so changing it doesn't reuse
+            # summaries written for another one.
+            summaries = await self._summarize_all(
+                [
+                    (
+                        content_hash(MAP_PROMPT + chunk["hash"]),
+                        MAP_PROMPT.format(
+                            doc_id=doc_id, part=index + 1, total=total, text=chunk["text"]
+                        ),
+                    )
+                    for index, chunk in enumerate(chunks)
+                ]
+            )
+            span.set_attribute("cached", self.cache.hits - hits)
+
+        level = 0
+        while len(summaries) > 1 and sum(map(len, summaries)) > self.reduce_chars:
+            level += 1
+            with tracing.span("summarize.reduce", doc_id=doc_id, level=level):
+                groups = self._group(summaries)
+                summaries = await self._summarize_all(
+                    [
+                        (
+                            content_hash(REDUCE_PROMPT + "\0".join(group)),
+                            REDUCE_PROMPT.format(
+                                doc_id=doc_id, summaries=self._join(group)
+                            ),
+                        )
+                        for group in groups
+                    ]
+                )
+        return summaries
+
+    def _group(self, summaries: List[str]) -> List[List[str]]:
+        """Splits consecutive summaries into groups of at most
+        `reduce_chars`, with at least two per group so every level shrinks."""
+        groups: List[List[str]] = [[]]
+        size = 0
+        for summary in summaries:
+            if len(groups[-1]) >= 2 and size + len(summary) > self.reduce_chars:
+                groups.append([])
+                size = 0
+            groups[-1].append(summary)
+            size += len(summary)
+        return groups
+
+    @staticmethod
+    def _join(summaries: List[str]) -> str:
+        return "\n\n".join(
+            f'<summary part="{index + 1}">\n{summary}\n</summary>'
+            for index, summary in enumerate(summaries)
+        )
+
+    def final_prompt(self, doc_id: str, summaries: List[str]) -> str:
+        return FINAL_PROMPT.format(doc_id=doc_id, summaries=self._join(summaries))
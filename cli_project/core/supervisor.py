@@ -0,0 +1,61 @@
+import asyncio
+import sys
+from mcp_client import MCPClient
+
+
+class ServerSupervisor:
+    """Keeps MCP servers alive for long-running sessions.
+
+    Each client is pinged every `interval` seconds, and checked right away
+    when its connection ends (e.g. a broken pipe after a crash). A server
+    that fails the check is respawned with backoff; the other servers are
+    left alone.
+    """
+
+    def __init__(
+        self,
+        clients: dict[str, MCPClient],
+        interval: float = 15.0,
+        ping_timeout: float = 5.0,
+    ):
+        self.clients = clients
+        self.interval = interval
+        self.ping_timeout = ping_timeout
+        self.restarts: dict[str, int] = {}
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self):
+        for name, client in self.clients.items():
+            self._tasks.append(asyncio.create_task(self._watch(name, client)))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _watch(self, name: str, client: MCPClient):
+        while True:
+            await client.wait_closed(timeout=self.interval)
+            if await client.check_health(self.ping_timeout):
+                # A cleaned-up client is healthy but its connection is gone;
+                # don't spin on wait_closed returning immediately.
+                if not client.is_connected:
+                    await asyncio.sleep(self.interval)
+                continue
+
+            print(f"MCP server '{name}' stopped responding or exited; restarting it", file=sys.stderr)
+            failed = client.connection
+            try:
+                await client.reconnect(failed)
+                self.restarts[name] = self.restarts.get(name, 0) + 1
+            except Exception as e:
+                print(f"Error restarting MCP server '{name}': {e}", file=sys.stderr)
+                await asyncio.sleep(self.interval)
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
@@ -0,0 +1,54 @@
+import json
+from typing import Any, Dict, Optional, Tuple
+
+
+def canonical_args(tool_input: Optional[Dict[str, Any]]) -> str:
+    return json.dumps(tool_input or {}, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def _arg_pairs(tool_input: Optional[Dict[str, Any]]):
+    return {(name, canonical_args({"v": value})) for name, value in (tool_input or {}).items()}
+
+
+class ToolCallMemo:
+    """Remembers results of read-only tool calls.
+
+    Entries are keyed by (server, tool, canonical arguments). A call to a
+    tool that isn't read-only drops the entries of the same server that
+    share an argument with it (e.g. the same `doc_id`); a mutating call
+    without arguments drops every entry of that server.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Tuple[str, str, str], Any] = {}
+        self._pairs: Dict[Tuple[str, str, str], set] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, server: str, tool_name: str, tool_input: Optional[Dict]) -> Optional[Any]:
+        entry = self._entries.get((server, tool_name, canonical_args(tool_input)))
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def put(self, server: str, tool_name: str, tool_input: Optional[Dict], result: Any):
+        key = (server, tool_name, canonical_args(tool_input))
+        self._entries[key] = result
+        self._pairs[key] = _arg_pairs(tool_input)
+
+    def invalidate(self, server: str, tool_input: Optional[Dict]):
+        """Drops entries a mutating call with these arguments may affect."""
+        touched = _arg_pairs(tool_input)
+        for key in [k for k in self._entries if k[0] == server]:
+            if not touched or self._pairs[key] & touched:
+                del self._entries[key]
+                del self._pairs[key]
+
+    def clear(self):
+        self._entries.clear()
+        self._pairs.clear()
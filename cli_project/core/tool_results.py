@@ -0,0 +1,168 @@
+import io
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Literal, Optional, Union
+
+from mcp.types import EmbeddedResource, ImageContent, TextContent
+
+
+TruncationStrategy = Literal["head", "head_tail", "summary"]
+
+ToolResultContent = Union[str, List[Dict[str, Any]]]
+
+
+@dataclass
+class ToolResultPolicy:
+    """Limits applied to the result of a tool before it reaches the model.
+
+    strategy:
+        head: keep the first `max_chars` characters.
+        head_tail: keep the beginning and the last `tail_chars` characters.
+        summary: keep a short beginning plus the size of the full result.
+    """
+
+    max_chars: int = 20000
+    strategy: TruncationStrategy = "head_tail"
+    tail_chars: int = 4000
+    summary_chars: int = 2000
+    allow_binary: bool = True
+
+
+class _BoundedText:
+    """Accumulates text up to a limit without copying what gets dropped."""
+
+    def __init__(self, policy: ToolResultPolicy):
+        self.policy = policy
+        if policy.strategy == "summary":
+            head_chars, self.tail_chars = policy.summary_chars, 0
+        elif policy.strategy == "head_tail":
+            self.tail_chars = min(policy.tail_chars, policy.max_chars // 2)
+            head_chars = policy.max_chars - self.tail_chars
+        else:
+            head_chars, self.tail_chars = policy.max_chars, 0
+
+        self._head = io.StringIO()
+        self._head_room = head_chars
+        self._tail = ""
+        self.total_chars = 0
+        self.total_lines = 0
+
+    def write(self, piece: str):
+        self.total_chars += len(piece)
+        self.total_lines += piece.count("\n")
+
+        taken = 0
+        if self._head_room > 0:
+            taken = min(self._head_room, len(piece))
+            self._head.write(piece[:taken])
+            self._head_room -= taken
+
+        if self.tail_chars and taken < len(piece):
+            start = max(taken, len(piece) - self.tail_chars)
+            self._tail = (self._tail + piece[start:])[-self.tail_chars :]
+
+    def getvalue(self) -> str:
+        head = self._head.getvalue()
+        omitted = self.total_chars - len(head) - len(self._tail)
+        if omitted <= 0:
+            return head + self._tail
+
+        if self.policy.strategy == "summary":
+            return (
+                f"{head}\n[Result summarized: {self.total_chars} characters, "
+                f"{self.total_lines + 1} lines in total; only the first "
+                f"{len(head)} characters are shown.]"
+            )
+        return f"{head}\n[... {omitted} characters truncated ...]\n{self._tail}"
+
+
+class ToolResultPipeline:
+    """Turns MCP tool result content into tool result content for the model.
+
+    Text is bounded by the tool's policy while it is accumulated, so large
+    results are never joined or re-encoded in full. Images and embedded
+    resources are passed through as content blocks with their original
+    base64 payload.
+    """
+
+    def __init__(
+        self,
+        default_policy: Optional[ToolResultPolicy] = None,
+        policies: Optional[Dict[str, ToolResultPolicy]] = None,
+    ):
+        self.default_policy = default_policy or ToolResultPolicy()
+        self.policies: Dict[str, ToolResultPolicy] = dict(policies or {})
+
+    @classmethod
+    def from_env(cls) -> "ToolResultPipeline":
+        """Builds the default policy from TOOL_RESULT_MAX_CHARS and
+        TOOL_RESULT_STRATEGY."""
+        policy = ToolResultPolicy()
+        if os.getenv("TOOL_RESULT_MAX_CHARS"):
+            policy.max_chars = int(os.environ["TOOL_RESULT_MAX_CHARS"])
+        strategy = os.getenv("TOOL_RESULT_STRATEGY", policy.strategy)
+        if strategy not in ("head", "head_tail", "summary"):
+            raise ValueError(f"Invalid tool result strategy: {strategy}")
+        policy.strategy = strategy
+        return cls(default_policy=policy)
+
+    def set_policy(self, tool_name: str, policy: ToolResultPolicy):
+        self.policies[tool_name] = policy
+
+    def policy_for(self, tool_name: str) -> ToolResultPolicy:
+        return self.policies.get(tool_name, self.default_policy)
+
+    def process(self, tool_name: str, items: Iterable[Any]) -> ToolResultContent:
+        """Returns a string for text-only results, content blocks otherwise."""
+        policy = self.policy_for(tool_name)
+        text = _BoundedText(policy)
+        blocks: List[Dict[str, Any]] = []
+        first = True
+
+        for item in items:
+            if isinstance(item, TextContent):
+                if not first:
+                    text.write("\n\n")
+                text.write(item.text)
+                first = False
+            elif isinstance(item, ImageContent):
+                blocks.append(self._binary_block(policy, item.mimeType, item.data, "image"))
+            elif isinstance(item, EmbeddedResource):
+                resource = item.resource
+                resource_text = getattr(resource, "text", None)
+                if resource_text is not None:
+                    if not first:
+                        text.write("\n\n")
+                    text.write(f"<resource uri=\"{resource.uri}\">\n")
+                    text.write(resource_text)
+                    text.write("\n</resource>")
+                    first = False
+                else:
+                    mime_type = resource.mimeType or "application/octet-stream"
+                    if not first:
+                        text.write("\n\n")
+                    text.write(f"[Attached resource {resource.uri} ({mime_type})]")
+                    first = False
+                    blocks.append(
+                        self._binary_block(policy, mime_type, resource.blob, "document")
+                    )
+
+        text_value = text.getvalue()
+        if not blocks:
+            return text_value
+        if text_value:
+            blocks.insert(0, {"type": "text", "text": text_value})
+        return blocks
+
+    def _binary_block(
+        self, policy: ToolResultPolicy, mime_type: str, data: str, kind: str
+    ) -> Dict[str, Any]:
+        if not policy.allow_binary:
+            return {
+                "type": "text",
+                "text": f"[{kind} omitted: {mime_type}, {len(data)} base64 characters]",
+            }
+        return {
+            "type": kind,
+            "source": {"type": "base64", "media_type": mime_type, "data": data},
+        }
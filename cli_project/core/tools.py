@@ -1,17 +1,33 @@
 import json
+import time
 from typing import Optional, Literal, List, Dict, Any, TypedDict
-from mcp.types import CallToolResult, Tool, TextContent
+from mcp.types import CallToolResult, Tool
 from mcp_client import MCPClient
+from core import deadline, metrics, tracing
+from core.tool_memo import ToolCallMemo
+from core.tool_results import ToolResultContent, ToolResultPipeline
 
 
 class ToolResultBlockParam(TypedDict):
     tool_use_id: str
     type: str
-    content: str
+    content: ToolResultContent
     is_error: bool
 
 
 class ToolManager:
+    # Size limits and truncation policies for tool results; per-tool
+    # policies can be registered with `get_result_pipeline().set_policy`.
+    # Built on first use rather than at import, so settings loaded from
+    # .env after the import still apply.
+    result_pipeline: Optional[ToolResultPipeline] = None
+
+    @classmethod
+    def get_result_pipeline(cls) -> ToolResultPipeline:
+        if cls.result_pipeline is None:
+            cls.result_pipeline = ToolResultPipeline.from_env()
+        return cls.result_pipeline
+
     @classmethod
     async def get_all_tools(cls, clients: dict[str, MCPClient]) -> list[Tool]:
         """Gets all tools from the provided clients."""
@@ -29,35 +45,128 @@ class ToolManager:
         return tools
 
     @classmethod
-    async def _find_client_with_tool(
-        cls, clients: list[MCPClient], tool_name: str
-    ) -> Optional[MCPClient]:
-        """Finds the first client that has the specified tool."""
-        for client in clients:
+    async def _find_tool(
+        cls, clients: dict[str, MCPClient], tool_name: str
+    ) -> tuple[Optional[str], Optional[MCPClient], Optional[Tool]]:
+        """Finds the first server that has the tool, with its definition."""
+        for server_name, client in clients.items():
             tools = await client.list_tools()
             tool = next((t for t in tools if t.name == tool_name), None)
             if tool:
-                return client
-        return None
+                return server_name, client, tool
+        return None, None, None
+
+    @staticmethod
+    def is_read_only(tool: Tool) -> bool:
+        """True when the server marks the tool with `readOnlyHint`."""
+        return bool(tool.annotations and tool.annotations.readOnlyHint)
 
     @classmethod
     def _build_tool_result_part(
         cls,
         tool_use_id: str,
-        text: str,
+        content: ToolResultContent,
         status: Literal["success"] | Literal["error"],
     ) -> ToolResultBlockParam:
         """Builds a tool result part dictionary."""
         return {
             "tool_use_id": tool_use_id,
             "type": "tool_result",
-            "content": text,
+            "content": content,
             "is_error": status == "error",
         }
 
+    @classmethod
+    async def _dispatch_tool_request(
+        cls,
+        clients: dict[str, MCPClient],
+        tool_use_id: str,
+        tool_name: str,
+        tool_input: dict,
+        memo: Optional[ToolCallMemo] = None,
+    ) -> ToolResultBlockParam:
+        """Runs a single tool request on the client that provides it.
+
+        With a memo, results of read-only tools are reused for identical
+        calls, and other tools invalidate the entries they may affect.
+        """
+        with tracing.span("tool.find_client", tool=tool_name):
+            server_name, client, tool = await cls._find_tool(clients, tool_name)
+
+        if not client:
+            metrics.TOOL_CALLS.inc(server="", tool=tool_name, outcome="not_found")
+            return cls._build_tool_result_part(
+                tool_use_id, "Could not find that tool", "error"
+            )
+
+        start = time.perf_counter()
+        read_only = cls.is_read_only(tool)
+        if memo is not None:
+            if read_only:
+                cached = memo.get(server_name, tool_name, tool_input)
+                if cached is not None:
+                    metrics.TOOL_CALLS.inc(
+                        server=server_name, tool=tool_name, outcome="memoized"
+                    )
+                    metrics.TOOL_LATENCY.observe(
+                        time.perf_counter() - start, server=server_name, tool=tool_name
+                    )
+                    return cls._build_tool_result_part(
+                        tool_use_id, cached, "success"
+                    )
+            else:
+                memo.invalidate(server_name, tool_input)
+
+        try:
+            tool_output: CallToolResult | None = await client.call_tool(
+                tool_name, tool_input, idempotent=read_only
+            )
+            items = []
+            if tool_output:
+                items = tool_output.content
+            tool_result_part = cls._build_tool_result_part(
+                tool_use_id,
+                cls.get_result_pipeline().process(tool_name, items),
+                "error"
+                if tool_output and tool_output.isError
+                else "success",
+            )
+            if (
+                memo is not None
+                and read_only
+                and not tool_result_part["is_error"]
+            ):
+                memo.put(
+                    server_name, tool_name, tool_input, tool_result_part["content"]
+                )
+        except deadline.DeadlineExceeded:
+            raise
+        except Exception as e:
+            metrics.record_error("tool", e)
+            error_message = f"Error executing tool '{tool_name}': {e}"
+            print(error_message)
+            tool_result_part = cls._build_tool_result_part(
+                tool_use_id,
+                json.dumps({"error": error_message}),
+                "error",
+            )
+
+        metrics.TOOL_CALLS.inc(
+            server=server_name,
+            tool=tool_name,
+            outcome="error" if tool_result_part["is_error"] else "success",
+        )
+        metrics.TOOL_LATENCY.observe(
+            time.perf_counter() - start, server=server_name, tool=tool_name
+        )
+        return tool_result_part
+
     @classmethod
     async def execute_tool_requests(
-        cls, clients: dict[str, MCPClient], message: Any
+        cls,
+        clients: dict[str, MCPClient],
+        message: Any,
+        memo: Optional[ToolCallMemo] = None,
     ) -> List[ToolResultBlockParam]:
         """Executes a list of tool requests against the provided clients."""
         # Extract tool requests from message content
@@ -76,45 +185,12 @@ class ToolManager:
             tool_name = tool_request.get("name") if isinstance(tool_request, dict) else tool_request.name
             tool_input = tool_request.get("input") if isinstance(tool_request, dict) else tool_request.input
 
-            client = await cls._find_client_with_tool(
-                list(clients.values()), tool_name
-            )
-
-            if not client:
-                tool_result_part = cls._build_tool_result_part(
-                    tool_use_id, "Could not find that tool", "error"
-                )
-                tool_result_blocks.append(tool_result_part)
-                continue
-
-            try:
-                tool_output: CallToolResult | None = await client.call_tool(
-                    tool_name, tool_input
-                )
-                items = []
-                if tool_output:
-                    items = tool_output.content
-                content_list = [
-                    item.text for item in items if isinstance(item, TextContent)
-                ]
-                content_json = json.dumps(content_list)
-                tool_result_part = cls._build_tool_result_part(
-                    tool_use_id,
-                    content_json,
-                    "error"
-                    if tool_output and tool_output.isError
-                    else "success",
-                )
-            except Exception as e:
-                error_message = f"Error executing tool '{tool_name}': {e}"
-                print(error_message)
-                tool_result_part = cls._build_tool_result_part(
-                    tool_use_id,
-                    json.dumps({"error": error_message}),
-                    "error"
-                    if tool_output and tool_output.isError
-                    else "success",
+            with tracing.span("tool.dispatch", tool=tool_name) as span:
+                tool_result_part = await cls._dispatch_tool_request(
+                    clients, tool_use_id, tool_name, tool_input, memo
                 )
+                if tool_result_part["is_error"]:
+                    span.set_attribute("error", True)
 
             tool_result_blocks.append(tool_result_part)
         return tool_result_blocks
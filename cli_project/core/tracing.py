@@ -0,0 +1,270 @@
+import contextvars
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+
+from core.server_middleware import instrument_handlers
+
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+class Span:
+    """A timed unit of work, serialized in the OTLP/JSON span layout."""
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str],
+        attributes: Dict[str, Any],
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes)
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def record_exception(self, exc: BaseException):
+        self.error = f"{type(exc).__name__}: {exc}"
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)}
+                for key, value in self.attributes.items()
+            ],
+            "status": {"code": 2, "message": self.error}
+            if self.error
+            else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class _NoopSpan:
+    trace_id = None
+    span_id = None
+    traceparent = None
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def record_exception(self, exc: BaseException):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class ConsoleSpanExporter:
+    """Prints one line per finished span to stderr."""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stderr
+
+    def export(self, span: Span, service_name: str):
+        duration_ms = ((span.end_ns or time.time_ns()) - span.start_ns) / 1e6
+        status = f" ERROR {span.error}" if span.error else ""
+        print(
+            f"[trace {span.trace_id[:8]}] {service_name} {span.name} "
+            f"{duration_ms:.2f}ms span={span.span_id} "
+            f"parent={span.parent_id or '-'}{status}",
+            file=self.stream,
+            flush=True,
+        )
+
+    def shutdown(self):
+        pass
+
+
+class FileSpanExporter:
+    """Appends OTLP/JSON export requests to a file, one per line.
+
+    The layout matches the OpenTelemetry collector file exporter, so the
+    output can be loaded by OTLP-aware tooling.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def export(self, span: Span, service_name: str):
+        record = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {
+                                "key": "service.name",
+                                "value": {"stringValue": service_name},
+                            }
+                        ]
+                    },
+                    "scopeSpans": [
+                        {"scope": {"name": "mcp_chat"}, "spans": [span.to_otlp()]}
+                    ],
+                }
+            ]
+        }
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def shutdown(self):
+        with self._lock:
+            self._file.close()
+
+
+class Tracer:
+    def __init__(self, service_name: str = "mcp-chat", exporter=None):
+        self.service_name = service_name
+        self.exporter = exporter
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    @contextmanager
+    def span(self, name: str, traceparent: Optional[str] = None, **attributes):
+        """Starts a span as a child of the current span or of `traceparent`."""
+        if not self.enabled:
+            yield _NOOP_SPAN
+            return
+
+        parent = _current_span.get()
+        remote = parse_traceparent(traceparent) if traceparent else None
+        if remote:
+            trace_id, parent_id = remote
+        elif parent:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        else:
+            trace_id, parent_id = secrets.token_hex(16), None
+
+        span = Span(name, trace_id, parent_id, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            self.exporter.export(span, self.service_name)
+
+    def shutdown(self):
+        if self.exporter:
+            self.exporter.shutdown()
+            self.exporter = None
+
+
+_tracer = Tracer()
+
+
+def configure(service_name: str, exporter=None) -> Tracer:
+    _tracer.service_name = service_name
+    _tracer.exporter = exporter
+    return _tracer
+
+
+def configure_from_env(service_name: str) -> Tracer:
+    """Configures tracing from TRACE_EXPORTER (console|file) and TRACE_FILE."""
+    exporter_name = os.getenv("TRACE_EXPORTER", "")
+    exporter = None
+    if exporter_name == "console":
+        exporter = ConsoleSpanExporter()
+    elif exporter_name == "file":
+        exporter = FileSpanExporter(os.getenv("TRACE_FILE", "traces.jsonl"))
+    elif exporter_name:
+        raise ValueError(f"Unknown TRACE_EXPORTER: {exporter_name}")
+    return configure(service_name, exporter)
+
+
+def exported_env() -> Dict[str, str]:
+    """TRACE_* variables to forward to spawned server processes."""
+    return {k: v for k, v in os.environ.items() if k.startswith("TRACE_")}
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def span(name: str, traceparent: Optional[str] = None, **attributes):
+    return _tracer.span(name, traceparent=traceparent, **attributes)
+
+
+def current_traceparent() -> Optional[str]:
+    current = _current_span.get()
+    return current.traceparent if current else None
+
+
+def parse_traceparent(value: str) -> Optional[Tuple[str, str]]:
+    """Parses a W3C traceparent header into (trace_id, span_id)."""
+    parts = value.split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2]
+
+
+def _request_traceparent(server) -> Optional[str]:
+    try:
+        meta = server._mcp_server.request_context.meta
+    except LookupError:
+        return None
+    return getattr(meta, "traceparent", None) if meta else None
+
+
+def trace_server_handlers(server):
+    """Wraps every registered FastMCP handler in a server-side span.
+
+    The span continues the trace whose `traceparent` the client sent in
+    the request `_meta`.
+    """
+
+    @contextmanager
+    def traced(call):
+        with span(
+            f"mcp.server.{call.kind}",
+            traceparent=_request_traceparent(server),
+            handler=call.name,
+        ):
+            yield
+
+    instrument_handlers(server, traced)
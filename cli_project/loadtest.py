@@ -0,0 +1,272 @@
+"""Load test for the document MCP server.
+
+Opens N client sessions and drives a weighted mix of tool calls, resource
+reads and prompt fetches for a fixed duration, then reports ops/sec and
+p50/p95/p99 latency per operation.
+
+Over stdio every session spawns its own server process; over HTTP all
+sessions share one server started with `--transport streamable-http`.
+
+    python loadtest.py --sessions 8 --duration 10
+    python loadtest.py --transport http --sessions 32 --docs 1000 --doc-size 20000
+    python loadtest.py --mix read=50,edit=20,resource=20,prompt=10 --json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+
+from mcp_client import HTTPMCPClient, MCPClient
+
+OPERATIONS = ("read", "edit", "resource", "prompt")
+DEFAULT_MIX = "read=60,edit=10,resource=20,prompt=10"
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mcp_server.py")
+
+
+def parse_mix(value: str) -> dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(
+                f"unknown operation '{name}' (expected one of {', '.join(OPERATIONS)})"
+            )
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("the mix needs at least one positive weight")
+    return mix
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return math.nan
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_operation(client: MCPClient, op: str, doc_id: str) -> bool:
+    """Runs one operation; returns False when the server reported an error."""
+    if op == "read":
+        result = await client.call_tool(
+            "read_document", {"doc_id": doc_id}, idempotent=True
+        )
+        return not result.isError
+    if op == "edit":
+        # Replaces a word with itself so documents keep their size
+        result = await client.call_tool(
+            "edit_document", {"doc_id": doc_id, "old_str": "load", "new_str": "load"}
+        )
+        return not result.isError
+    if op == "resource":
+        await client.read_resource(f"docs://documents/{doc_id}")
+        return True
+    await client.get_prompt("summarize", {"doc_id": doc_id})
+    return True
+
+
+async def worker(
+    client: MCPClient,
+    doc_ids: list[str],
+    mix: dict[str, float],
+    rng: random.Random,
+    warmup_until: float,
+    stop_at: float,
+    latencies: dict[str, list[float]],
+    errors: dict[str, int],
+):
+    ops, weights = zip(*mix.items())
+    while True:
+        now = time.perf_counter()
+        if now >= stop_at:
+            return
+        op = rng.choices(ops, weights)[0]
+        doc_id = rng.choice(doc_ids)
+        try:
+            ok = await run_operation(client, op, doc_id)
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - now
+        if now < warmup_until:
+            continue
+        latencies[op].append(elapsed)
+        if not ok:
+            errors[op] += 1
+
+
+def start_http_server(args: argparse.Namespace) -> subprocess.Popen:
+    return subprocess.Popen(
+        [
+            sys.executable,
+            SERVER_SCRIPT,
+            *server_args(args),
+            "--transport",
+            "streamable-http",
+            "--port",
+            str(args.port),
+        ]
+    )
+
+
+def server_args(args: argparse.Namespace) -> list[str]:
+    return ["--seed-docs", str(args.docs), "--doc-size", str(args.doc_size)]
+
+
+async def wait_for_port(port: int, timeout: float = 15.0):
+    """Waits until the HTTP server accepts connections; the streamable HTTP
+    client would otherwise wait forever for its initialize response."""
+    give_up_at = time.monotonic() + timeout
+    while True:
+        try:
+            _reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        except OSError:
+            if time.monotonic() > give_up_at:
+                raise
+            await asyncio.sleep(0.1)
+            continue
+        writer.close()
+        await writer.wait_closed()
+        return
+
+
+async def run(args: argparse.Namespace) -> dict:
+    server = None
+    clients: list[MCPClient] = []
+    try:
+        if args.transport == "http":
+            server = start_http_server(args)
+            url = f"http://127.0.0.1:{args.port}/mcp"
+            await wait_for_port(args.port)
+            for _ in range(args.sessions):
+                client = HTTPMCPClient(url)
+                await client.connect()
+                clients.append(client)
+        else:
+            command = [sys.executable, SERVER_SCRIPT, *server_args(args)]
+
+            async def connect_stdio():
+                client = MCPClient(command=command[0], args=command[1:])
+                await client.connect()
+                return client
+
+            clients = list(
+                await asyncio.gather(*(connect_stdio() for _ in range(args.sessions)))
+            )
+
+        doc_ids = [f"doc-{i:04d}.txt" for i in range(args.docs)]
+        latencies = {op: [] for op in args.mix}
+        errors = {op: 0 for op in args.mix}
+        start = time.perf_counter()
+        warmup_until = start + args.warmup
+        stop_at = warmup_until + args.duration
+        await asyncio.gather(
+            *(
+                worker(
+                    client,
+                    doc_ids,
+                    args.mix,
+                    random.Random(args.seed + i),
+                    warmup_until,
+                    stop_at,
+                    latencies,
+                    errors,
+                )
+                for i, client in enumerate(clients)
+            )
+        )
+        elapsed = time.perf_counter() - warmup_until
+        server_stats = await clients[0].read_resource("stats://server")
+    finally:
+        await asyncio.gather(
+            *(client.cleanup() for client in clients), return_exceptions=True
+        )
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    return report(args, latencies, errors, elapsed, server_stats)
+
+
+def summarize(values: list[float], errors: int, elapsed: float) -> dict:
+    values = sorted(values)
+    return {
+        "ops": len(values),
+        "errors": errors,
+        "ops_per_sec": round(len(values) / elapsed, 1),
+        "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+    }
+
+
+def report(args, latencies, errors, elapsed, server_stats) -> dict:
+    operations = {
+        op: summarize(values, errors[op], elapsed)
+        for op, values in latencies.items()
+    }
+    total = summarize(
+        [v for values in latencies.values() for v in values],
+        sum(errors.values()),
+        elapsed,
+    )
+    return {
+        "transport": args.transport,
+        "sessions": args.sessions,
+        "docs": args.docs,
+        "doc_size": args.doc_size,
+        "duration_s": round(elapsed, 2),
+        "total": total,
+        "operations": operations,
+        # Only the first session's server over stdio; the shared one over HTTP
+        "server": server_stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transport", choices=["stdio", "http"], default="stdio")
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10.0, metavar="SECONDS")
+    parser.add_argument(
+        "--warmup",
+        type=float,
+        default=1.0,
+        metavar="SECONDS",
+        help="Run this long before recording latencies",
+    )
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    parser.add_argument("--docs", type=int, default=100, help="Documents to seed")
+    parser.add_argument("--doc-size", type=int, default=1000, metavar="CHARS")
+    parser.add_argument("--port", type=int, default=8765, help="Port for --transport http")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the op mix")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+    if args.sessions < 1 or args.docs < 1:
+        parser.error("--sessions and --docs must be at least 1")
+
+    result = asyncio.run(run(args))
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(
+        f"{result['transport']}: {result['sessions']} sessions, {result['docs']} docs "
+        f"x {result['doc_size']} chars, {result['duration_s']}s"
+    )
+    print(f"{'operation':<10} {'ops':>8} {'errors':>7} {'ops/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    rows = [*result["operations"].items(), ("total", result["total"])]
+    for name, row in rows:
+        print(
+            f"{name:<10} {row['ops']:>8} {row['errors']:>7} {row['ops_per_sec']:>9} "
+            f"{row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
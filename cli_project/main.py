@@ -1,14 +1,24 @@
+import argparse
 import asyncio
 import sys
 import os
 from dotenv import load_dotenv
 from contextlib import AsyncExitStack
 
-from mcp_client import MCPClient
+from mcp_client import MCPClient, LazyMCPClient
 from core.gemini import Gemini
+from core.cache import CachedProvider, ResponseCache
+from core.scheduler import RateLimitScheduler, ScheduledProvider
+from core import metrics, profiling, tracing
+from core.metrics import MeteredProvider
 
 from core.cli_chat import CliChat
-from core.cli import CliApp
+from core.batch import run_batch
+from core.session_log import SessionLog
+from core.supervisor import ServerSupervisor
+from core.summarize import MapReduceSummarizer
+from core.tool_results import ToolResultPipeline
+from core.tools import ToolManager
 
 load_dotenv()
 
@@ -23,43 +33,251 @@ assert google_api_key, (
 )
 
 
-async def main():
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1: {value}")
+    return number
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="MCP Chat")
+    parser.add_argument(
+        "server_scripts",
+        nargs="*",
+        help="Additional MCP server scripts to launch with 'uv run'",
+    )
+    parser.add_argument(
+        "--batch",
+        metavar="FILE",
+        help="Run queries from a JSONL file ('-' for stdin) instead of the interactive prompt",
+    )
+    parser.add_argument(
+        "--output",
+        metavar="FILE",
+        default="-",
+        help="Where to write batch results as JSONL ('-' for stdout)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Number of concurrent chat sessions in batch mode, and of documents processed at once by commands like '/summarize *.md'",
+    )
+    parser.add_argument(
+        "--lazy",
+        action="store_true",
+        help="Spawn MCP servers on first use, listing tools from a cached manifest",
+    )
+    parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        metavar="SECONDS",
+        help="With --lazy, shut down servers that have been idle this long",
+    )
+    parser.add_argument(
+        "--session",
+        metavar="FILE",
+        help="Save the conversation to this log and resume it if it exists",
+    )
+    parser.add_argument(
+        "--health-interval",
+        type=float,
+        default=15.0,
+        metavar="SECONDS",
+        help="Ping MCP servers this often and restart any that crash or hang; 0 disables it",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        metavar="PORT",
+        help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        metavar="FILE",
+        help="Write Prometheus metrics to FILE at exit",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="DIR",
+        help="Write a cProfile file per turn to DIR and print the top functions at exit",
+    )
+    parser.add_argument(
+        "--docs-dir",
+        metavar="DIR",
+        help="Serve the .md, .txt, .pdf and .docx files under DIR as the documents",
+    )
+    parser.add_argument(
+        "--tool-memo",
+        choices=["turn", "session", "off"],
+        default="turn",
+        help="Reuse results of read-only tool calls within a turn or the whole session",
+    )
+    parser.add_argument(
+        "--turn-timeout",
+        type=float,
+        default=300.0,
+        metavar="SECONDS",
+        help="Abort a turn (provider, tool and MCP calls) after this long; 0 disables it",
+    )
+    parser.add_argument(
+        "--max-iterations",
+        type=positive_int,
+        default=20,
+        help="Maximum provider calls per turn; the last one is made without tools",
+    )
+    parser.add_argument(
+        "--summary-concurrency",
+        type=int,
+        default=4,
+        help="Chunks summarized in parallel when /summarize splits a long document",
+    )
+    return parser.parse_args(argv)
+
+
+def make_client(args: argparse.Namespace, command: str, server_args: list[str]):
+    auto_reconnect = args.health_interval > 0
+    if args.lazy:
+        return LazyMCPClient(
+            command=command,
+            args=server_args,
+            idle_timeout=args.idle_timeout,
+            auto_reconnect=auto_reconnect,
+        )
+    return MCPClient(
+        command=command, args=server_args, auto_reconnect=auto_reconnect
+    )
+
+
+async def run_batch_mode(args: argparse.Namespace, chat_factory):
+    input_stream = sys.stdin if args.batch == "-" else open(args.batch)
+    output_stream = (
+        sys.stdout if args.output == "-" else open(args.output, "w")
+    )
+    try:
+        await run_batch(
+            chat_factory,
+            input_stream,
+            output_stream,
+            concurrency=args.concurrency,
+        )
+    finally:
+        if input_stream is not sys.stdin:
+            input_stream.close()
+        if output_stream is not sys.stdout:
+            output_stream.close()
+
+
+async def main(args: argparse.Namespace):
+    tracing.configure_from_env("mcp-chat")
+    if args.profile:
+        profiling.configure(args.profile, "cli")
+
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+
     gemini_service = Gemini(model=gemini_model, api_key=google_api_key)
+    gemini_service = MeteredProvider(gemini_service)
+    gemini_service = ScheduledProvider(
+        gemini_service, RateLimitScheduler.from_env()
+    )
+
+    # After load_dotenv, so TOOL_RESULT_* from .env apply; a bad value
+    # fails here rather than on the first tool call
+    ToolManager.result_pipeline = ToolResultPipeline.from_env()
+
+    response_cache = ResponseCache.from_env()
+    if response_cache:
+        gemini_service = CachedProvider(gemini_service, response_cache)
+        metrics.watch_cache(response_cache)
 
-    server_scripts = sys.argv[1:]
+    server_scripts = args.server_scripts
     clients = {}
 
-    command, args = (
+    doc_command, doc_args = (
         ("uv", ["run", "mcp_server.py"])
         if os.getenv("USE_UV", "0") == "1"
         else ("python", ["mcp_server.py"])
     )
+    if args.profile:
+        doc_args = [*doc_args, "--profile", args.profile]
+    if args.docs_dir:
+        doc_args = [*doc_args, "--docs-dir", os.path.abspath(args.docs_dir)]
 
     async with AsyncExitStack() as stack:
         doc_client = await stack.enter_async_context(
-            MCPClient(command=command, args=args)
+            make_client(args, doc_command, doc_args)
         )
         clients["doc_client"] = doc_client
 
         for i, server_script in enumerate(server_scripts):
             client_id = f"client_{i}_{server_script}"
             client = await stack.enter_async_context(
-                MCPClient(command="uv", args=["run", server_script])
+                make_client(args, "uv", ["run", server_script])
             )
             clients[client_id] = client
 
-        chat = CliChat(
-            doc_client=doc_client,
-            clients=clients,
-            gemini_service=gemini_service,
+        if args.health_interval > 0:
+            await stack.enter_async_context(
+                ServerSupervisor(clients, interval=args.health_interval)
+            )
+
+        tool_memo_scope = None if args.tool_memo == "off" else args.tool_memo
+        turn_timeout = args.turn_timeout or None
+        # Shared so chunk summaries are reused across sessions and turns
+        summarizer = MapReduceSummarizer(
+            gemini_service, concurrency=args.summary_concurrency
         )
+        try:
+            if args.batch:
+                await run_batch_mode(
+                    args,
+                    lambda: CliChat(
+                        doc_client=doc_client,
+                        clients=clients,
+                        gemini_service=gemini_service,
+                        verbose=False,
+                        tool_memo_scope=tool_memo_scope,
+                        turn_timeout=turn_timeout,
+                        max_iterations=args.max_iterations,
+                        summarizer=summarizer,
+                        batch_concurrency=args.concurrency,
+                    ),
+                )
+                return
+
+            # prompt_toolkit is only needed for the interactive prompt
+            from core.cli import CliApp
+
+            session_log = SessionLog(args.session) if args.session else None
+            if session_log is not None:
+                stack.callback(session_log.close)
+
+            chat = CliChat(
+                doc_client=doc_client,
+                clients=clients,
+                gemini_service=gemini_service,
+                session_log=session_log,
+                tool_memo_scope=tool_memo_scope,
+                turn_timeout=turn_timeout,
+                max_iterations=args.max_iterations,
+                summarizer=summarizer,
+                batch_concurrency=args.concurrency,
+            )
+            chat.resume()
 
-        cli = CliApp(chat)
-        await cli.initialize()
-        await cli.run()
+            cli = CliApp(chat)
+            await cli.initialize()
+            await cli.run()
+        finally:
+            tracing.get_tracer().shutdown()
+            profiling.shutdown()
+            if args.metrics_file:
+                metrics.REGISTRY.dump(args.metrics_file)
 
 
 if __name__ == "__main__":
     if sys.platform == "win32":
         asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
-    asyncio.run(main())
+    asyncio.run(main(parse_args()))
@@ -1,39 +1,247 @@
 import json
+import os
+import random
 import sys
+import time
 import asyncio
+import hashlib
+from datetime import timedelta
 from typing import Optional, Any
 from contextlib import AsyncExitStack
+
+import anyio
 from mcp import ClientSession, StdioServerParameters, types
-from mcp.client.stdio import stdio_client
+from mcp.shared.exceptions import McpError
+from mcp.client.stdio import stdio_client, get_default_environment
 from pydantic import AnyUrl
 
+from core import deadline, metrics, tracing
+
+
+class ServerConnectionLost(ConnectionError):
+    """The server process exited or stopped responding mid-request."""
+
+
 class MCPClient:
+    # Seconds to wait for a server to exit before it is killed
+    stop_timeout = 5.0
+
     def __init__(
         self,
         command: str,
         args: list[str],
         env: Optional[dict] = None,
+        auto_reconnect: bool = False,
+        max_replays: int = 2,
+        max_reconnect_attempts: int = 5,
     ):
         self._command = command
         self._args = args
         self._env = env
         self._session: Optional[ClientSession] = None
-        self._exit_stack: AsyncExitStack = AsyncExitStack()
+        self._connection_task: Optional[asyncio.Task] = None
+        self._stop_event: Optional[asyncio.Event] = None
+        self._notification_handlers: dict[str, list] = {}
+        self._reconnect_handlers: list = []
+        self._connected_before = False
+        # With auto_reconnect, idempotent requests interrupted by a server
+        # crash are replayed on a respawned server.
+        self._auto_reconnect = auto_reconnect
+        self._max_replays = max_replays
+        self._max_reconnect_attempts = max_reconnect_attempts
+        self._reconnect_lock = asyncio.Lock()
+        self._reconnecting: Optional[asyncio.Task] = None
 
     async def connect(self):
+        await self._start_connection()
+
+    async def _start_connection(self):
+        # Reap a connection that ended on its own (e.g. a crashed server)
+        await self._stop_connection()
+        # The stdio transport must be entered and exited by the same task, so
+        # a dedicated task owns the connection for its whole lifetime. That
+        # lets any task connect or disconnect the client.
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        self._stop_event = asyncio.Event()
+        self._connection_task = asyncio.create_task(
+            self._run_connection(ready, self._stop_event)
+        )
+        # A crashed server's transport can fail on teardown; that is
+        # reported through the lost connection, not as a task error.
+        self._connection_task.add_done_callback(
+            lambda t: t.cancelled() or t.exception()
+        )
+        try:
+            await ready
+        except BaseException:
+            task, self._connection_task = self._connection_task, None
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            raise
+        if self._connected_before:
+            # As tasks: a handler's requests must not wait on a reconnect
+            # that is still holding its lock
+            for handler in self._reconnect_handlers:
+                asyncio.create_task(handler())
+        self._connected_before = True
+
+    async def _run_connection(
+        self, ready: asyncio.Future, stop_event: asyncio.Event
+    ):
+        try:
+            async with AsyncExitStack() as exit_stack:
+                _stdio, _write = await self._open_transport(exit_stack)
+                # Pending requests never complete once the server's stdout
+                # closes, so watch the stream to notice a crashed server.
+                lost = asyncio.Event()
+                sink, watched = anyio.create_memory_object_stream(0)
+                forwarder = asyncio.create_task(self._forward(_stdio, sink, lost))
+                exit_stack.callback(forwarder.cancel)
+                session = await exit_stack.enter_async_context(
+                    ClientSession(
+                        watched, _write, message_handler=self._handle_message
+                    )
+                )
+                await session.initialize()
+                self._session = session
+                ready.set_result(None)
+
+                waiters = [
+                    asyncio.create_task(stop_event.wait()),
+                    asyncio.create_task(lost.wait()),
+                ]
+                try:
+                    await asyncio.wait(
+                        waiters, return_when=asyncio.FIRST_COMPLETED
+                    )
+                finally:
+                    for waiter in waiters:
+                        waiter.cancel()
+        except BaseException as e:
+            if not ready.done():
+                if isinstance(e, asyncio.CancelledError):
+                    ready.cancel()
+                else:
+                    ready.set_exception(e)
+            raise
+        finally:
+            self._session = None
+
+    async def _open_transport(self, exit_stack: AsyncExitStack):
+        """Starts the server and returns its (read, write) streams."""
+        env = self._env
+        if env is None and tracing.exported_env():
+            env = {**get_default_environment(), **tracing.exported_env()}
         server_params = StdioServerParameters(
             command=self._command,
             args=self._args,
-            env=self._env,
-        )
-        stdio_transport = await self._exit_stack.enter_async_context(
-            stdio_client(server_params)
+            env=env,
         )
-        _stdio, _write = stdio_transport
-        self._session = await self._exit_stack.enter_async_context(
-            ClientSession(_stdio, _write)
-        )
-        await self._session.initialize()
+        return await exit_stack.enter_async_context(stdio_client(server_params))
+
+    @staticmethod
+    async def _forward(source, sink, lost: asyncio.Event):
+        try:
+            async with sink:
+                async for message in source:
+                    await sink.send(message)
+        except (anyio.ClosedResourceError, anyio.BrokenResourceError):
+            pass
+        finally:
+            lost.set()
+
+    @property
+    def connection(self) -> Optional[asyncio.Task]:
+        """The task owning the current connection; pass it to reconnect()."""
+        return self._connection_task
+
+    @property
+    def is_connected(self) -> bool:
+        task = self._connection_task
+        return task is not None and not task.done() and self._session is not None
+
+    async def wait_closed(self, timeout: Optional[float] = None):
+        """Waits until the connection ends (e.g. the server exits)."""
+        task = self._connection_task
+        if task is not None:
+            await asyncio.wait({task}, timeout=timeout)
+
+    async def check_health(self, timeout: float) -> bool:
+        """Pings the server. A client that was never connected or has been
+        cleaned up has nothing to check and counts as healthy."""
+        task = self._connection_task
+        if task is None:
+            return True
+        if task.done():
+            return False
+        try:
+            await asyncio.wait_for(
+                self._send_once(
+                    types.PingRequest(method="ping"), types.EmptyResult, task
+                ),
+                timeout,
+            )
+            return True
+        except (asyncio.TimeoutError, ConnectionError, McpError):
+            return False
+
+    async def reconnect(self, failed: Optional[asyncio.Task] = None):
+        """Respawns the server with exponential backoff.
+
+        `failed` is the connection that was seen failing; if another caller
+        has already replaced it, the new connection is kept.
+        """
+        async with self._reconnect_lock:
+            if (
+                failed is not None
+                and self._connection_task is not failed
+                and self.is_connected
+            ):
+                return
+            await self._stop_connection()
+
+            # Requests made while respawning (e.g. refreshing a manifest)
+            # must not wait for this reconnect to finish.
+            self._reconnecting = asyncio.current_task()
+            try:
+                attempt = 0
+                while True:
+                    try:
+                        await self._respawn()
+                        return
+                    except Exception:
+                        attempt += 1
+                        if attempt >= self._max_reconnect_attempts:
+                            raise
+                        delay = random.uniform(0, min(30.0, 0.5 * 2**attempt))
+                        await deadline.wait_for(asyncio.sleep(delay))
+            finally:
+                self._reconnecting = None
+
+    async def _respawn(self):
+        await self._start_connection()
+
+    def on_notification(self, method: str, handler):
+        """Registers an async handler for a server notification method,
+        e.g. "notifications/resources/list_changed"."""
+        self._notification_handlers.setdefault(method, []).append(handler)
+
+    def on_reconnect(self, handler):
+        """Registers an async handler called with no arguments each time
+        the server is started again (after a crash or an idle shutdown).
+        The new process has none of the old one's per-session state, such
+        as which clients asked for list_changed notifications."""
+        self._reconnect_handlers.append(handler)
+
+    async def _handle_message(self, message):
+        if not isinstance(message, types.ServerNotification):
+            return
+        notification = message.root
+        # Handlers run as tasks: the session's receive loop calls this, so
+        # awaiting a request from here would deadlock.
+        for handler in self._notification_handlers.get(notification.method, []):
+            asyncio.create_task(handler(notification))
 
     def session(self) -> ClientSession:
         if self._session is None:
@@ -42,28 +250,163 @@ class MCPClient:
             )
         return self._session
 
+    def _request_meta(self) -> Optional[types.RequestParams.Meta]:
+        """Carries the current trace context across the MCP boundary"""
+        traceparent = tracing.current_traceparent()
+        if traceparent is None:
+            return None
+        return types.RequestParams.Meta(traceparent=traceparent)
+
+    async def _send(self, request, result_type, idempotent: bool = True):
+        """Sends a request, replaying it after a server crash if it is
+        idempotent and auto_reconnect is enabled"""
+        replays = 0
+        while True:
+            if (
+                self._reconnect_lock.locked()
+                and asyncio.current_task() is not self._reconnecting
+            ):
+                # Wait for a respawn in progress instead of failing
+                async with self._reconnect_lock:
+                    pass
+            connection = self._connection_task
+            try:
+                return await self._send_once(request, result_type, connection)
+            except ServerConnectionLost:
+                if (
+                    not (self._auto_reconnect and idempotent)
+                    or replays >= self._max_replays
+                ):
+                    raise
+                replays += 1
+                await self.reconnect(connection)
+
+    async def _send_once(self, request, result_type, connection):
+        """Sends a request once and records its latency and outcome"""
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await self._exchange(request, result_type, connection)
+            outcome = "ok"
+            return result
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        except Exception as e:
+            metrics.record_error("mcp", e)
+            raise
+        finally:
+            metrics.MCP_REQUEST_LATENCY.observe(
+                time.perf_counter() - start,
+                server=self._server_name(),
+                method=request.method,
+                outcome=outcome,
+            )
+
+    async def _exchange(self, request, result_type, connection):
+        """Sends a request, timing out at the current turn deadline and
+        failing fast if the connection ends before the response arrives"""
+        if connection is not None and connection.done():
+            raise ServerConnectionLost(f"Server {self._server_name()} is not running")
+        session = self.session()
+        left = deadline.remaining()
+        read_timeout = None
+        if left is not None:
+            deadline.check()
+            read_timeout = timedelta(seconds=left)
+        pending = asyncio.create_task(
+            session.send_request(
+                types.ClientRequest(request),
+                result_type,
+                request_read_timeout_seconds=read_timeout,
+            )
+        )
+        # No connection task while _stop_connection is tearing it down;
+        # the session then fails the request itself
+        waiters = {pending} if connection is None else {pending, connection}
+        try:
+            await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            if not pending.done():
+                pending.cancel()
+                await asyncio.gather(pending, return_exceptions=True)
+        if pending.cancelled():
+            raise ServerConnectionLost(
+                f"Server {self._server_name()} exited during {request.method}"
+            )
+
+        try:
+            return pending.result()
+        except McpError as e:
+            if left is not None and deadline.remaining() <= 0:
+                raise deadline.DeadlineExceeded(e.error.message) from e
+            raise
+
     async def list_tools(self) -> list[types.Tool]:
         """Return a list of tools defined by the MCP server"""
-        response = await self.session().list_tools()
+        with tracing.span("mcp.list_tools", server=self._server_name()):
+            response = await self._send(
+                types.ListToolsRequest(method="tools/list"),
+                types.ListToolsResult,
+            )
         return response.tools
 
     async def call_tool(
-        self, tool_name: str, tool_input: dict
+        self, tool_name: str, tool_input: dict, idempotent: bool = False
     ) -> types.CallToolResult | None:
-        """Call a particular tool and return the result"""
-        response = await self.session().call_tool(tool_name, arguments=tool_input)
+        """Call a particular tool and return the result. Only idempotent
+        calls are replayed if the server crashes mid-call."""
+        with tracing.span(
+            "mcp.call_tool", server=self._server_name(), tool=tool_name
+        ):
+            request = types.CallToolRequest(
+                method="tools/call",
+                params=types.CallToolRequestParams(
+                    name=tool_name,
+                    arguments=tool_input,
+                    _meta=self._request_meta(),
+                ),
+            )
+            response = await self._send(
+                request, types.CallToolResult, idempotent=idempotent
+            )
         return response
 
     async def list_prompts(self) -> list[types.Prompt]:
-        result = await self.session().list_prompts()
+        with tracing.span("mcp.list_prompts", server=self._server_name()):
+            result = await self._send(
+                types.ListPromptsRequest(method="prompts/list"),
+                types.ListPromptsResult,
+            )
         return result.prompts
 
     async def get_prompt(self, prompt_name, args: dict[str, str]):
-        result = await self.session().get_prompt(prompt_name, args)
+        with tracing.span(
+            "mcp.get_prompt", server=self._server_name(), prompt=prompt_name
+        ):
+            request = types.GetPromptRequest(
+                method="prompts/get",
+                params=types.GetPromptRequestParams(
+                    name=prompt_name,
+                    arguments=args,
+                    _meta=self._request_meta(),
+                ),
+            )
+            result = await self._send(request, types.GetPromptResult)
         return result.messages
 
     async def read_resource(self, uri: str) -> Any:
-        result = await self.session().read_resource(AnyUrl(uri))
+        with tracing.span(
+            "mcp.read_resource", server=self._server_name(), uri=uri
+        ):
+            request = types.ReadResourceRequest(
+                method="resources/read",
+                params=types.ReadResourceRequestParams(
+                    uri=AnyUrl(uri),
+                    _meta=self._request_meta(),
+                ),
+            )
+            result = await self._send(request, types.ReadResourceResult)
         resource = result.contents[0]
 
         if isinstance(resource, types.TextResourceContents):
@@ -72,17 +415,36 @@ class MCPClient:
 
             return resource.text
 
-    async def cleanup(self):
-        """Clean up resources properly to avoid Windows pipe warnings"""
+    def _server_name(self) -> str:
+        return " ".join([self._command, *self._args])
+
+    async def _stop_connection(self) -> bool:
+        task = self._connection_task
+        self._connection_task = None
+        if task is None:
+            return False
         try:
-            await self._exit_stack.aclose()
-        except Exception:
-            pass  # Ignore errors during cleanup
+            self._stop_event.set()
+            # A hung server may not exit on SIGTERM; cancelling the owner
+            # task makes the transport kill the process instead.
+            done, _ = await asyncio.wait({task}, timeout=self.stop_timeout)
+            if not done:
+                task.cancel()
+            # Collects teardown errors and the cancellation issued above;
+            # a cancellation of the caller (e.g. Ctrl-C) still propagates.
+            await asyncio.gather(task, return_exceptions=True)
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
         finally:
             self._session = None
+        return True
+
+    async def cleanup(self):
+        """Clean up resources properly to avoid Windows pipe warnings"""
+        if await self._stop_connection() and sys.platform == "win32":
             # Give time for Windows to clean up pipes
-            if sys.platform == "win32":
-                await asyncio.sleep(0.1)
+            await asyncio.sleep(0.1)
 
     async def __aenter__(self):
         await self.connect()
@@ -92,6 +454,177 @@ class MCPClient:
         await self.cleanup()
 
 
+class LazyMCPClient(MCPClient):
+    """MCPClient that only spawns its server when it is actually needed.
+
+    Tools and prompts are served from a manifest cached on disk, so listing
+    them does not start the server. The process is spawned on the first
+    call_tool, get_prompt or read_resource and, with an idle timeout, shut
+    down again once it has not been used for that many seconds.
+    """
+
+    def __init__(
+        self,
+        command: str,
+        args: list[str],
+        env: Optional[dict] = None,
+        manifest_dir: str = ".mcp_manifests",
+        idle_timeout: Optional[float] = None,
+        auto_reconnect: bool = False,
+    ):
+        super().__init__(
+            command=command, args=args, env=env, auto_reconnect=auto_reconnect
+        )
+        self._manifest_dir = manifest_dir
+        self._idle_timeout = idle_timeout
+        self._tools: Optional[list[types.Tool]] = None
+        self._prompts: Optional[list[types.Prompt]] = None
+        self._connect_lock = asyncio.Lock()
+        self._in_flight = 0
+        self._last_used = time.monotonic()
+        self._idle_task: Optional[asyncio.Task] = None
+
+    def _manifest_path(self) -> str:
+        key = [self._command, *self._args]
+        # Invalidate the manifest when a server script changes
+        for arg in self._args:
+            if os.path.isfile(arg):
+                stat = os.stat(arg)
+                key.append(f"{stat.st_mtime_ns}:{stat.st_size}")
+        digest = hashlib.sha256("\0".join(key).encode()).hexdigest()[:16]
+        return os.path.join(self._manifest_dir, f"{digest}.json")
+
+    def _load_manifest(self) -> bool:
+        try:
+            with open(self._manifest_path(), encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return False
+        self._tools = [types.Tool.model_validate(t) for t in manifest["tools"]]
+        self._prompts = [
+            types.Prompt.model_validate(p) for p in manifest["prompts"]
+        ]
+        return True
+
+    def _save_manifest(self):
+        manifest = {
+            "tools": [t.model_dump(mode="json") for t in self._tools or []],
+            "prompts": [p.model_dump(mode="json") for p in self._prompts or []],
+        }
+        os.makedirs(self._manifest_dir, exist_ok=True)
+        path = self._manifest_path()
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(f"{path}.tmp", path)
+
+    @property
+    def is_running(self) -> bool:
+        return self._session is not None
+
+    async def connect(self):
+        if not self._load_manifest():
+            await self._ensure_running()
+        if self._idle_timeout:
+            self._idle_task = asyncio.create_task(self._shutdown_when_idle())
+
+    async def _ensure_running(self):
+        async with self._connect_lock:
+            if self._session is not None:
+                return
+            await super().connect()
+            # Refresh the manifest on every spawn so it never goes stale
+            self._tools = await super().list_tools()
+            self._prompts = await super().list_prompts()
+            self._save_manifest()
+
+    async def _respawn(self):
+        await self._ensure_running()
+
+    async def check_health(self, timeout: float) -> bool:
+        # A stopped lazy server is respawned on demand, not by a supervisor
+        if not self.is_running:
+            return True
+        return await super().check_health(timeout)
+
+    def _is_idle(self) -> bool:
+        return (
+            self._session is not None
+            and self._in_flight == 0
+            and time.monotonic() - self._last_used >= self._idle_timeout
+        )
+
+    async def _shutdown_when_idle(self):
+        while True:
+            await asyncio.sleep(self._idle_timeout / 2)
+            if not self._is_idle():
+                continue
+            async with self._connect_lock:
+                # A request may have started while waiting for the lock
+                if self._is_idle():
+                    await super().cleanup()
+
+    async def _run(self, method, *args):
+        # Counted before spawning, so an idle shutdown waiting for the
+        # connect lock sees the request and leaves the server running
+        self._in_flight += 1
+        try:
+            await self._ensure_running()
+            return await method(*args)
+        finally:
+            self._in_flight -= 1
+            self._last_used = time.monotonic()
+
+    async def list_tools(self) -> list[types.Tool]:
+        if self._tools is None:
+            await self._ensure_running()
+        return self._tools
+
+    async def list_prompts(self) -> list[types.Prompt]:
+        if self._prompts is None:
+            await self._ensure_running()
+        return self._prompts
+
+    async def call_tool(
+        self, tool_name: str, tool_input: dict, idempotent: bool = False
+    ) -> types.CallToolResult | None:
+        return await self._run(
+            super().call_tool, tool_name, tool_input, idempotent
+        )
+
+    async def get_prompt(self, prompt_name, args: dict[str, str]):
+        return await self._run(super().get_prompt, prompt_name, args)
+
+    async def read_resource(self, uri: str) -> Any:
+        return await self._run(super().read_resource, uri)
+
+    async def cleanup(self):
+        if self._idle_task:
+            self._idle_task.cancel()
+            await asyncio.gather(self._idle_task, return_exceptions=True)
+            self._idle_task = None
+        await super().cleanup()
+
+
+class HTTPMCPClient(MCPClient):
+    """Connects to an already running server over streamable HTTP, e.g.
+    `mcp_server.py --transport streamable-http`."""
+
+    def __init__(self, url: str, **kwargs):
+        super().__init__(command="", args=[], **kwargs)
+        self._url = url
+
+    async def _open_transport(self, exit_stack: AsyncExitStack):
+        from mcp.client.streamable_http import streamablehttp_client
+
+        read, write, _get_session_id = await exit_stack.enter_async_context(
+            streamablehttp_client(self._url)
+        )
+        return read, write
+
+    def _server_name(self) -> str:
+        return self._url
+
+
 # For testing
 async def main():
     async with MCPClient(
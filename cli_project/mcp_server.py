@@ -1,23 +1,102 @@
+import argparse
+import asyncio
+import signal
+import sys
+import weakref
+from contextlib import asynccontextmanager
+
 from mcp.server.fastmcp import FastMCP
 from pydantic import Field
 from mcp.server.fastmcp.prompts import base
+from mcp.types import ToolAnnotations
+
+from core import profiling, tracing
+from core.doc_store import DocumentStore
+from core.ingest import DirectoryIngester
+from core.retrieval import chunk_text_stable, content_hash
+from core.server_middleware import ServerStats
+
+# Set from --docs-dir; started by the lifespan once the event loop runs
+ingester = None
+
+
+@asynccontextmanager
+async def lifespan(server):
+    # Streamable HTTP runs the lifespan once per session; start() is a no-op
+    # after the first
+    if ingester is not None:
+        ingester.start()
+    yield
+
 
-mcp = FastMCP("DocumentMCP", log_level="ERROR")
+mcp = FastMCP("DocumentMCP", log_level="ERROR", lifespan=lifespan)
+stats = ServerStats()
 
+DOC_PAGE_SIZE = 1000
+# Seconds to gather document additions and removals into one
+# list_changed notification
+LIST_CHANGED_DELAY = 0.5
+# Characters per chunk for map-reduce summarization
+DOC_CHUNK_CHARS = 8000
+# Longest diff returned by edit_document
+EDIT_DIFF_MAX_LINES = 40
+EDIT_DIFF_MAX_CHARS = 2000
+# Characters shown on each side of a match in edit_document's diff
+EDIT_DIFF_CONTEXT_CHARS = 80
 
-docs = {
+docs = DocumentStore({
     "deposition.md": "This deposition covers the testimony of Angela Smith, P.E.",
     "report.pdf": "The report details the state of a 20m condenser tower.",
     "financials.docx": "These financials outline the project's budget and expenditures.",
     "outlook.pdf": "This document presents the projected future performance of the system.",
     "plan.md": "The plan outlines the steps for the project's implementation.",
     "spec.txt": "These specifications define the technical requirements for the equipment.",
-}
+})
+
+# Sessions that have paged through the document listing and should be told
+# when documents are added or removed.
+_listing_sessions = weakref.WeakSet()
+
+
+def _remember_session():
+    try:
+        _listing_sessions.add(mcp._mcp_server.request_context.session)
+    except LookupError:
+        pass
+
+
+_list_changed_pending = False
+
+
+def _send_list_changed():
+    global _list_changed_pending
+    _list_changed_pending = False
+    loop = asyncio.get_running_loop()
+    for session in list(_listing_sessions):
+        loop.create_task(session.send_resource_list_changed())
+
+
+def _notify_list_changed():
+    # Ingesting a directory adds documents by the thousand; one notification
+    # covers a whole burst.
+    global _list_changed_pending
+    if _list_changed_pending:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    _list_changed_pending = True
+    loop.call_later(LIST_CHANGED_DELAY, _send_list_changed)
+
+
+docs.on_list_changed(_notify_list_changed)
 
 
 @mcp.tool(
     name="read_document",
     description="Reads the contents of a document given its string ID.",
+    annotations=ToolAnnotations(readOnlyHint=True),
 )
 def read_document(
     doc_id: str = Field(description="The ID of the document to read."),
@@ -26,18 +105,93 @@ def read_document(
         raise ValueError(f"Doc with id {doc_id} not found.")
     return docs[doc_id]
 
+
+def _edit_diff(
+    doc_id: str, before: str, after: str, old_str: str, new_str: str
+) -> str:
+    """A diff of an edit with one hunk per group of nearby matches.
+
+    Hunks show the lines holding each match, clipped to
+    EDIT_DIFF_CONTEXT_CHARS characters on either side, so an edit inside a
+    long line (a paragraph, or a document with no line breaks) still shows
+    the change itself. The diff
+    is cut short after EDIT_DIFF_MAX_LINES lines or EDIT_DIFF_MAX_CHARS
+    characters.
+    """
+    positions = []
+    position = before.find(old_str)
+    while position != -1:
+        positions.append(position)
+        # Same non-overlapping matches as str.replace
+        position = before.find(old_str, position + max(len(old_str), 1))
+    if not positions:
+        return ""
+
+    # (start, end, matches before the group, matches in the group)
+    groups = []
+    for k, position in enumerate(positions):
+        # The lines holding the match, clipped around it
+        line_start = before.rfind("\n", 0, position) + 1
+        line_end = before.find("\n", position + len(old_str))
+        if line_end == -1:
+            line_end = len(before)
+        start = max(position - EDIT_DIFF_CONTEXT_CHARS, line_start)
+        end = min(position + len(old_str) + EDIT_DIFF_CONTEXT_CHARS, line_end)
+        if groups and start <= groups[-1][1]:
+            groups[-1][1] = end
+            groups[-1][3] += 1
+        else:
+            groups.append([start, end, k, 1])
+
+    shift = len(new_str) - len(old_str)
+    lines = [f"--- {doc_id}@before", f"+++ {doc_id}@after"]
+    for start, end, matches_before, matches in groups:
+        # Every match before the group moved the text by `shift`
+        after_start = start + matches_before * shift
+        after_end = end + (matches_before + matches) * shift
+        prefix = "..." if start > 0 and before[start - 1] != "\n" else ""
+        suffix = "..." if end < len(before) and before[end] != "\n" else ""
+        lines.append(f"@@ line {before.count(chr(10), 0, start) + 1} @@")
+        for sign, text in (("-", before[start:end]), ("+", after[after_start:after_end])):
+            lines += [sign + line for line in f"{prefix}{text}{suffix}".split("\n")]
+
+    if len(lines) > EDIT_DIFF_MAX_LINES:
+        omitted = len(lines) - EDIT_DIFF_MAX_LINES
+        lines = lines[:EDIT_DIFF_MAX_LINES] + [f"... {omitted} more diff lines"]
+    diff = "\n".join(lines)
+    if len(diff) > EDIT_DIFF_MAX_CHARS:
+        omitted = len(diff) - EDIT_DIFF_MAX_CHARS
+        diff = diff[:EDIT_DIFF_MAX_CHARS] + f"\n... {omitted} more characters"
+    return diff
+
+
 @mcp.tool(
     name="edit_document",
-    description="Edits the contents of a document given its string ID and new content.",
+    description=(
+        "Edits the contents of a document given its string ID and new content. "
+        "Replaces every occurrence of old_str and returns the number of matches, "
+        "the document's new version and a diff of the change, so there is no "
+        "need to read the document again to check the edit."
+    ),
+    annotations=ToolAnnotations(readOnlyHint=False),
 )
 def edit_document(
     doc_id: str = Field(description="The ID of the document to edit."),
     old_str: str = Field(description="The old content to be replaced in the document."),
     new_str: str = Field(description="The new content to replace the old content with."),
-):
+) -> dict:
     if doc_id not in docs:
         raise ValueError(f"Doc with id {doc_id} not found.")
-    docs[doc_id] = docs[doc_id].replace(old_str, new_str)
+    before = docs[doc_id]
+    matches = before.count(old_str)
+    after = before.replace(old_str, new_str)
+    docs[doc_id] = after
+    return {
+        "doc_id": doc_id,
+        "matches": matches,
+        "version": docs.version(doc_id),
+        "diff": _edit_diff(doc_id, before, after, old_str, new_str),
+    }
 
 
 # Resources
@@ -47,6 +201,34 @@ def list_document_ids() -> str:
     return list(docs.keys())
 
 
+@mcp.resource("docs://documents/pages/{cursor}", mime_type="application/json")
+def list_document_ids_page(cursor: str) -> dict:
+    """Returns one page of document IDs. Use the cursor "start" for the first page."""
+    _remember_session()
+    return docs.page(None if cursor == "start" else cursor, DOC_PAGE_SIZE)
+
+
+@mcp.resource("docs://documents/changes/{revision}", mime_type="application/json")
+def list_document_changes(revision: str) -> dict:
+    """Returns the document IDs added and removed since a listing revision"""
+    _remember_session()
+    return docs.changes_since(int(revision))
+
+
+@mcp.resource("docs://documents/{doc_id}/chunks", mime_type="application/json")
+def get_document_chunks(doc_id: str) -> dict:
+    """Returns a document split into chunks, each with a content hash"""
+    if doc_id not in docs:
+        raise ValueError(f"Doc with id {doc_id} not found.")
+    return {
+        "doc_id": doc_id,
+        "chunks": [
+            {"index": index, "hash": content_hash(text), "text": text}
+            for index, text in enumerate(chunk_text_stable(docs[doc_id], DOC_CHUNK_CHARS))
+        ],
+    }
+
+
 @mcp.resource("docs://documents/{doc_id}",mime_type="text/plain")
 def get_document_content(doc_id: str) -> str:
     """Returns the content of a specific document"""
@@ -55,6 +237,20 @@ def get_document_content(doc_id: str) -> str:
     return docs[doc_id]
 
 
+@mcp.resource("stats://server", mime_type="application/json")
+def server_stats() -> dict:
+    """Returns call counts, latency percentiles, payload sizes and error rates per handler"""
+    return stats.snapshot()
+
+
+@mcp.resource("stats://ingest", mime_type="application/json")
+def ingest_stats() -> dict:
+    """Returns files, bytes and throughput of the documents directory ingestion"""
+    if ingester is None:
+        raise ValueError("No documents directory is being ingested (see --docs-dir).")
+    return ingester.snapshot()
+
+
 # Prompts
 @mcp.prompt(
     name="format",
@@ -95,5 +291,98 @@ def summarize_document(doc_id: str = Field(description="The ID of the document t
     ]
 
 
+def seed_documents(count: int, size: int):
+    """Adds `count` generated documents of about `size` characters each,
+    named `doc-0000.txt`, ... (for load tests)."""
+    words = ("tower", "budget", "pressure", "report", "valve", "schedule", "load", "spec")
+    for i in range(count):
+        paragraphs = []
+        length = 0
+        while length < size:
+            n = len(paragraphs)
+            sentence = " ".join(words[(i + n + j) % len(words)] for j in range(12))
+            paragraph = f"Section {n + 1}. " + ". ".join([sentence] * 4) + "."
+            paragraphs.append(paragraph)
+            length += len(paragraph) + 2
+        docs[f"doc-{i:04d}.txt"] = "\n\n".join(paragraphs)[:size]
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Document MCP server")
+    parser.add_argument(
+        "--transport",
+        choices=["stdio", "streamable-http"],
+        default="stdio",
+        help="Serve over stdio or streamable HTTP (at http://HOST:PORT/mcp)",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--seed-docs",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Add N generated documents",
+    )
+    parser.add_argument(
+        "--doc-size",
+        type=int,
+        default=1000,
+        metavar="CHARS",
+        help="Size of each generated document",
+    )
+    parser.add_argument(
+        "--docs-dir",
+        metavar="DIR",
+        help="Serve the .md, .txt, .pdf and .docx files under DIR instead of "
+        "the sample documents, reindexing changed files as they change",
+    )
+    parser.add_argument(
+        "--ingest-workers",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Processes extracting text from --docs-dir (default: one per CPU)",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=5.0,
+        metavar="SECONDS",
+        help="How often --docs-dir is checked for changes",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="DIR",
+        help="Profile the whole run and write the profile and a summary to DIR",
+    )
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
-    mcp.run(transport="stdio")
+    args = parse_args()
+    tracing.configure_from_env("document-mcp")
+    if args.docs_dir:
+        docs.clear()
+        ingester = DirectoryIngester(
+            docs, args.docs_dir, args.ingest_workers, args.poll_interval
+        )
+    seed_documents(args.seed_docs, args.doc_size)
+    tracing.trace_server_handlers(mcp)
+    stats.instrument(mcp)
+    # Clients stop stdio servers with SIGTERM; exit through the finally
+    # below so the profile is still written and ingest workers don't outlive
+    # the server.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    if args.profile:
+        profiling.configure(args.profile, "server").start_run()
+    mcp.settings.host = args.host
+    mcp.settings.port = args.port
+    try:
+        mcp.run(transport=args.transport)
+    finally:
+        if ingester is not None:
+            ingester.close()
+        # The summary goes to stderr and the profile directory; stdout is
+        # the MCP transport.
+        profiling.shutdown()
@@ -0,0 +1,103 @@
+import asyncio
+import io
+import json
+
+import pytest
+
+from core.batch import run_batch, run_bounded
+
+
+async def _slow(item):
+    await asyncio.sleep(10)
+    return item
+
+
+async def _double(item):
+    await asyncio.sleep(0)
+    return item * 2
+
+
+def test_run_bounded_yields_every_result():
+    async def collect():
+        return [r async for r in run_bounded(range(50), _double, 4)]
+
+    assert sorted(asyncio.run(collect())) == [i * 2 for i in range(50)]
+
+
+def test_run_bounded_cancelled_consumer_does_not_hang():
+    async def consume():
+        async for _ in run_bounded(range(100), _slow, 4):
+            pass
+
+    async def main():
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.wait_for(asyncio.gather(task, return_exceptions=True), 2)
+        assert task.cancelled()
+
+    asyncio.run(main())
+
+
+def test_run_bounded_worker_error_with_full_queue_does_not_hang():
+    async def worker(item):
+        if item == 0:
+            raise ValueError("bad item")
+        await asyncio.sleep(10)
+        return item
+
+    async def consume():
+        return [r async for r in run_bounded(range(100), worker, 4)]
+
+    async def main():
+        with pytest.raises(ValueError, match="bad item"):
+            await asyncio.wait_for(consume(), 2)
+
+    asyncio.run(main())
+
+
+def test_run_bounded_items_error_is_raised():
+    def items():
+        yield 1
+        raise RuntimeError("broken input")
+
+    async def consume():
+        return [r async for r in run_bounded(items(), _double, 2)]
+
+    async def main():
+        with pytest.raises(RuntimeError, match="broken input"):
+            await asyncio.wait_for(consume(), 2)
+
+    asyncio.run(main())
+
+
+class FakeChat:
+    async def run(self, query):
+        if query == "fail":
+            raise RuntimeError("model error")
+        return f"answer to {query}"
+
+
+def test_run_batch_writes_an_error_per_bad_line():
+    lines = [
+        '{"id": "a", "query": "first"}',
+        '{"id": "b"}',
+        "not json",
+        "[1, 2]",
+        "",
+        '"plain string"',
+        '{"query": "fail"}',
+    ]
+    output = io.StringIO()
+    summary = asyncio.run(
+        run_batch(FakeChat, io.StringIO("\n".join(lines) + "\n"), output, concurrency=2)
+    )
+    results = {r["id"]: r for r in map(json.loads, output.getvalue().splitlines())}
+
+    assert summary["queries"] == 6 and summary["errors"] == 4
+    assert results["a"]["response"] == "answer to first"
+    assert 'missing "query"' in results["b"]["error"]
+    assert results[3]["error"].startswith("JSONDecodeError")
+    assert "got list" in results[4]["error"]
+    assert results[6]["response"] == "answer to plain string"
+    assert results[7]["error"] == "RuntimeError: model error"
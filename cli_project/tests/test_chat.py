@@ -0,0 +1,37 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from core.chat import Chat
+
+
+class FakeProvider:
+    """Answers every request with a plain text reply."""
+
+    def __init__(self):
+        self.tools = []
+
+    def chat(self, messages, tools=None):
+        self.tools.append(tools)
+        return SimpleNamespace(content="done", stop_reason="end_turn")
+
+    def add_assistant_message(self, messages, response):
+        messages.append({"role": "assistant", "content": response.content})
+
+    def text_from_message(self, response):
+        return response.content
+
+
+@pytest.mark.parametrize("max_iterations", [0, -1])
+def test_max_iterations_below_one_is_rejected(max_iterations):
+    with pytest.raises(ValueError):
+        Chat(FakeProvider(), {}, max_iterations=max_iterations)
+
+
+def test_single_iteration_answers_without_tools():
+    provider = FakeProvider()
+    chat = Chat(provider, {}, verbose=False, max_iterations=1)
+    assert asyncio.run(chat.run("hello")) == "done"
+    assert provider.tools == [None]
+    assert [m["role"] for m in chat.messages] == ["user", "assistant"]
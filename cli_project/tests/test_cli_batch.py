@@ -0,0 +1,101 @@
+import asyncio
+import os
+import signal
+import threading
+import time
+from types import SimpleNamespace
+
+from core.cli import CliApp
+from core.cli_chat import CliChat
+
+
+class FakeDocClient:
+    def __init__(self, doc_ids):
+        self.doc_ids = doc_ids
+
+    async def read_resource(self, uri):
+        assert uri == "docs://documents/pages/start"
+        return {"ids": self.doc_ids, "next_cursor": None}
+
+    async def get_prompt(self, command, arguments):
+        return []
+
+
+class FakeProvider:
+    """Answers every request after `delay` seconds (on a worker thread)."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.started = 0
+        self._lock = threading.Lock()
+
+    def chat(self, messages, tools=None):
+        with self._lock:
+            self.started += 1
+        time.sleep(self.delay)
+        return SimpleNamespace(content="done", stop_reason="end_turn")
+
+    def add_assistant_message(self, messages, message):
+        messages.append({"role": "assistant", "content": message.content})
+
+    def add_user_message(self, messages, message):
+        messages.append({"role": "user", "content": message})
+
+    def text_from_message(self, message):
+        return message.content
+
+
+def _chat(doc_count, delay, concurrency=2):
+    doc_ids = [f"doc{i}.md" for i in range(doc_count)]
+    provider = FakeProvider(delay)
+    chat = CliChat(
+        doc_client=FakeDocClient(doc_ids),
+        clients={},
+        gemini_service=provider,
+        verbose=False,
+        batch_concurrency=concurrency,
+    )
+    return chat, provider
+
+
+def test_batch_command_yields_every_document():
+    chat, _ = _chat(5, 0.0)
+
+    async def collect():
+        return [r async for r in chat.run_batch_command("/summarize *.md")]
+
+    results = asyncio.run(collect())
+    assert sorted(r["doc_id"] for r in results) == [f"doc{i}.md" for i in range(5)]
+    assert all(r["response"] == "done" for r in results)
+    assert chat.messages[-2]["content"] == "/summarize *.md"
+
+
+def test_ctrl_c_cancels_batch_command_and_returns():
+    chat, provider = _chat(20, 0.3)
+    app = SimpleNamespace(agent=chat)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.1, os.kill, os.getpid(), signal.SIGINT)
+        run = CliApp._run_cancellable(app, CliApp._run_batch(app, "/summarize *.md"))
+        return await asyncio.wait_for(run, 3)
+
+    assert asyncio.run(main()) is None
+    # Only the first window of documents was started
+    assert provider.started <= 2 * 2
+    assert chat.messages == []
+
+
+def test_batch_detection_needs_a_glob_or_listed_documents():
+    chat, _ = _chat(3, 0.0)
+
+    def is_batch(query):
+        return asyncio.run(chat.is_batch_command(query))
+
+    assert is_batch("/summarize *.md")
+    assert is_batch("/summarize doc0.md doc2.md")
+    assert is_batch("/summarize doc0.md doc*.md")
+    assert not is_batch("/summarize doc0.md")
+    assert not is_batch("/format report.pdf use bullet points")
+    assert not is_batch("/format doc0.md use bullet points")
+    assert not is_batch("what about doc0.md doc1.md")
@@ -0,0 +1,64 @@
+import asyncio
+
+from core import cli
+from core.cli import CliApp
+
+
+class FakeAgent:
+    """Serves a two-page listing; the change log reports `resets` resets
+    before returning real changes."""
+
+    def __init__(self, resets):
+        self.resets = resets
+        self.page_reads = 0
+        self.change_reads = 0
+
+    async def list_docs_page(self, cursor=None):
+        self.page_reads += 1
+        if cursor is None:
+            return {"ids": ["a.md", "b.md"], "revision": 5, "next_cursor": "c1"}
+        return {"ids": ["c.md"], "revision": 5, "next_cursor": None}
+
+    async def list_docs_changes(self, revision):
+        self.change_reads += 1
+        if self.resets:
+            self.resets -= 1
+            return {"reset": True, "revision": 9}
+        return {"added": ["d.md"], "removed": ["a.md"], "revision": 6}
+
+
+def _app(agent):
+    app = CliApp.__new__(CliApp)
+    app.agent = agent
+    app.completer = cli.UnifiedCompleter()
+    app._resources_revision = 0
+    app._resources_lock = asyncio.Lock()
+    return app
+
+
+def test_refresh_pages_then_applies_changes():
+    agent = FakeAgent(resets=0)
+    app = _app(agent)
+    asyncio.run(app.refresh_resources())
+    assert sorted(app.resources) == ["b.md", "c.md", "d.md"]
+    assert app._resources_revision == 6
+    assert agent.page_reads == 2
+
+
+def test_notification_reset_reloads_once():
+    agent = FakeAgent(resets=1)
+    app = _app(agent)
+    asyncio.run(app._on_resources_changed(None))
+    assert sorted(app.resources) == ["b.md", "c.md", "d.md"]
+    assert agent.page_reads == 2
+
+
+def test_repeated_resets_stop_after_the_reload_limit():
+    agent = FakeAgent(resets=1000)
+    app = _app(agent)
+    asyncio.run(app._on_resources_changed(None))
+    assert agent.change_reads == cli.MAX_RESOURCE_RELOADS + 1
+    assert agent.page_reads == 2 * cli.MAX_RESOURCE_RELOADS
+    # The last full listing stands
+    assert sorted(app.resources) == ["a.md", "b.md", "c.md"]
+    assert app._resources_revision == 5
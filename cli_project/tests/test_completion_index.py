@@ -0,0 +1,54 @@
+import threading
+
+from core.completion_index import ResourceIndex
+
+
+def test_prefix_then_fuzzy_matches():
+    index = ResourceIndex(["Report.pdf", "plan.md", "spec.txt", "deposition.md"], limit=3)
+    assert index.search("re")[0] == "Report.pdf"
+    assert "deposition.md" in index.search("dpm")
+    assert index.search("zzz") == []
+
+
+def test_extend_add_and_discard():
+    index = ResourceIndex(["b.md"])
+    index.extend(["a.md", "c.md", "b.md"])
+    index.add("B.md")
+    assert sorted(index.ids()) == ["B.md", "a.md", "b.md", "c.md"]
+    index.discard_many(["a.md", "missing.md"])
+    index.discard("B.md")
+    assert index.ids() == ["b.md", "c.md"]
+    assert "b.md" in index and "B.md" not in index
+    assert index.search("c") == ["c.md"]
+
+
+def test_search_while_updating_from_another_thread():
+    ids = [f"doc-{i:05d}.md" for i in range(2000)]
+    index = ResourceIndex(ids, limit=20)
+    errors = []
+    stop = threading.Event()
+
+    def complete():
+        while not stop.is_set():
+            try:
+                for result in index.search("doc-01"):
+                    assert result.startswith("doc-01")
+                index.search("d1m")
+            except Exception as e:  # pragma: no cover - the failure case
+                errors.append(e)
+                return
+
+    reader = threading.Thread(target=complete)
+    reader.start()
+    try:
+        for round_ in range(200):
+            removed = ids[round_ * 5 : round_ * 5 + 5]
+            index.discard_many(removed)
+            index.extend(removed)
+            index.add(f"new-{round_}.md")
+    finally:
+        stop.set()
+        reader.join()
+
+    assert errors == []
+    assert len(index) == len(ids) + 200
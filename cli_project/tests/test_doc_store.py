@@ -0,0 +1,80 @@
+from core.doc_store import DocumentStore
+
+
+def _all_pages(store, limit):
+    ids, cursor = [], None
+    while True:
+        page = store.page(cursor, limit)
+        ids += page["ids"]
+        cursor = page["next_cursor"]
+        if not cursor:
+            return ids
+
+
+def test_pages_cover_every_id_in_order():
+    store = DocumentStore({f"doc{i:02d}.md": "x" for i in range(25)})
+    assert _all_pages(store, 10) == sorted(store)
+    last = store.page(store.page(store.page(None, 10)["next_cursor"], 10)["next_cursor"], 10)
+    assert len(last["ids"]) == 5 and last["next_cursor"] is None
+
+
+def test_cursor_stays_valid_when_ids_change():
+    store = DocumentStore({f"doc{i}.md": "x" for i in range(6)})
+    first = store.page(None, 3)
+    assert first["ids"] == ["doc0.md", "doc1.md", "doc2.md"]
+    del store["doc2.md"]
+    store["doc1a.md"] = "x"  # Sorts before the cursor
+    store["doc4a.md"] = "x"
+    rest = store.page(first["next_cursor"], 10)
+    assert rest["ids"] == ["doc3.md", "doc4.md", "doc4a.md", "doc5.md"]
+
+
+def test_changes_since_revision():
+    store = DocumentStore({"a.md": "x", "b.md": "x"})
+    revision = store.page()["revision"]
+    store["c.md"] = "x"
+    del store["a.md"]
+    store["b.md"] = "edited"  # Content changes aren't listing changes
+    store["tmp.md"] = "x"  # Added and removed: never seen by the caller
+    del store["tmp.md"]
+    del store["b.md"]  # Removed and added again: unchanged for the caller
+    store["b.md"] = "x"
+
+    changes = store.changes_since(revision)
+    assert changes["added"] == ["c.md"]
+    assert changes["removed"] == ["a.md"]
+    assert changes["revision"] == store.revision
+    assert store.changes_since(store.revision) == {
+        "revision": store.revision,
+        "added": [],
+        "removed": [],
+    }
+
+
+def test_changes_reset_when_log_is_too_short():
+    store = DocumentStore(max_log=3)
+    for i in range(5):
+        store[f"doc{i}.md"] = "x"
+    assert store.changes_since(0)["reset"]
+    assert store.changes_since(store.revision + 1)["reset"]
+    assert store.changes_since(store.revision - 3)["added"] == ["doc2.md", "doc3.md", "doc4.md"]
+
+
+def test_versions_and_list_changed_listeners():
+    store = DocumentStore()
+    calls = []
+    store.on_list_changed(lambda: calls.append(store.revision))
+    store["a.md"] = "one"
+    first = store.version("a.md")
+    store["a.md"] = "one"
+    assert store.version("a.md") == first
+    store["a.md"] = "two"
+    second = store.version("a.md")
+    assert second > first
+    del store["a.md"]
+    assert calls == [1, 2]
+    assert "a.md" not in store
+
+    # Re-adding a deleted document doesn't reuse an earlier version
+    store["a.md"] = "three"
+    assert store.version("a.md") > second
@@ -0,0 +1,96 @@
+import enum
+from typing import List, Optional
+
+from pydantic import BaseModel, Field, create_model
+
+from core.gemini_schema import SchemaCache, convert_schema
+
+
+class Color(str, enum.Enum):
+    red = "red"
+    blue = "blue"
+
+
+class Range(BaseModel):
+    start: int
+    end: Optional[int] = None
+
+
+class Node(BaseModel):
+    name: str
+    children: List["Node"] = Field(default_factory=list)
+
+
+def test_optional_model_is_resolved():
+    model = create_model("M", r=(Optional[Range], None))
+    converted = convert_schema(model.model_json_schema())
+    r = converted["properties"]["r"]
+    assert r["type_"] == "OBJECT" and r["nullable"] is True
+    assert r["properties"]["start"] == {"type_": "INTEGER"}
+    assert r["required"] == ["start"]
+
+
+def test_optional_scalar_and_list_of_models():
+    model = create_model(
+        "M",
+        limit=(Optional[int], Field(None, description="Max results")),
+        ranges=(List[Range], Field(default_factory=list)),
+    )
+    properties = convert_schema(model.model_json_schema())["properties"]
+    assert properties["limit"]["type_"] == "INTEGER"
+    assert properties["limit"]["nullable"] is True
+    assert properties["limit"]["description"] == "Max results"
+    items = properties["ranges"]["items"]
+    assert items["type_"] == "OBJECT" and "start" in items["properties"]
+
+
+def test_enum_via_ref_and_non_string_enum():
+    model = create_model("M", color=(Color, Color.red))
+    color = convert_schema(model.model_json_schema())["properties"]["color"]
+    assert color["type_"] == "STRING"
+    assert color["format_"] == "enum" and color["enum"] == ["red", "blue"]
+    assert "Default" in color["description"]
+
+    level = convert_schema({"type": "integer", "enum": [1, 2]})
+    assert "enum" not in level and "Allowed values: 1, 2" in level["description"]
+
+
+def test_union_keeps_first_branch_and_notes_the_rest():
+    converted = convert_schema({"anyOf": [{"type": "string"}, {"type": "integer"}]})
+    assert converted["type_"] == "STRING"
+    assert "Also accepts: integer" in converted["description"]
+
+
+def test_recursive_ref_is_cut_off():
+    converted = convert_schema(Node.model_json_schema())
+    depth = 0
+    node = converted
+    while "properties" in node:
+        node = node["properties"]["children"]["items"]
+        depth += 1
+    assert depth <= 3 and node["type_"] == "OBJECT"
+
+
+def test_all_of_merges_properties():
+    schema = {
+        "$defs": {"Base": {"type": "object", "properties": {"a": {"type": "string"}}, "required": ["a"]}},
+        "allOf": [{"$ref": "#/$defs/Base"}],
+        "properties": {"b": {"type": "boolean"}},
+        "required": ["b", "missing"],
+    }
+    converted = convert_schema(schema)
+    assert set(converted["properties"]) == {"a", "b"}
+    assert converted["required"] == ["a", "b"]
+
+
+def test_cache_reuses_declarations_and_skips_empty_parameters():
+    cache = SchemaCache()
+    tools = [
+        {"name": "ping", "description": "No arguments", "input_schema": {"type": "object", "properties": {}}},
+        {"name": "read", "description": "Read", "input_schema": {"type": "object", "properties": {"id": {"type": "string"}}}},
+    ]
+    first = cache.convert_tools(tools)
+    assert "parameters" not in first[0]
+    assert first[1]["parameters"]["properties"]["id"] == {"type_": "STRING"}
+    assert cache.convert_tools([dict(t) for t in tools]) == first
+    assert cache.hits >= 1
@@ -0,0 +1,73 @@
+import asyncio
+import io
+import os
+
+from core.doc_store import DocumentStore
+from core.ingest import DirectoryIngester, doc_id_for
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _touch_later(path):
+    """Moves the mtime forward, whatever the filesystem's resolution."""
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2_000_000_000))
+
+
+def test_doc_id_for():
+    assert doc_id_for(os.path.join("reports", "Q1 plan.pdf")) == "reports:Q1_plan.pdf"
+
+
+def test_incremental_reindexing(tmp_path):
+    root = str(tmp_path)
+    for i in range(10):
+        _write(f"{root}/notes/n{i}.md", f"note {i}\n" * 100)
+    _write(f"{root}/readme.txt", "hello")
+    _write(f"{root}/.git/ignored.txt", "hidden")
+    _write(f"{root}/script.py", "not a document")
+    _write(f"{root}/broken.pdf", "not really a pdf")
+
+    store = DocumentStore()
+    log = io.StringIO()
+    ingester = DirectoryIngester(store, root, workers=2, log=log)
+
+    async def run():
+        try:
+            await ingester.sync()
+            assert sorted(store) == sorted(
+                [f"notes:n{i}.md" for i in range(10)] + ["readme.txt"]
+            )
+            assert store["notes:n3.md"] == "note 3\n" * 100
+            # The PDF fails (not a PDF, or pypdf missing) and is not retried
+            assert ingester.stats.failed == 1
+            extracted = ingester.stats.extracted
+
+            await ingester.sync()
+            assert ingester.stats.extracted == extracted
+            assert ingester.stats.failed == 1
+
+            version = store.version("notes:n3.md")
+            # Same size, newer mtime
+            _write(f"{root}/notes/n3.md", "NOTE 3\n" * 100)
+            _touch_later(f"{root}/notes/n3.md")
+            os.remove(f"{root}/notes/n4.md")
+            _write(f"{root}/notes/new.md", "new")
+            await ingester.sync()
+
+            assert ingester.stats.extracted == extracted + 2
+            assert store["notes:n3.md"] == "NOTE 3\n" * 100
+            assert store.version("notes:n3.md") > version
+            assert "notes:n4.md" not in store
+            assert store["notes:new.md"] == "new"
+            assert ingester.stats.removed == 1
+            # 10 notes, readme.txt and broken.pdf
+            assert ingester.snapshot()["files"] == 12
+        finally:
+            await ingester.stop()
+
+    asyncio.run(run())
+    assert "Failed to extract" in log.getvalue() and "broken.pdf" in log.getvalue()
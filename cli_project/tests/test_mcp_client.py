@@ -0,0 +1,135 @@
+import asyncio
+import os
+import signal
+import sys
+
+import pytest
+
+from core.supervisor import ServerSupervisor
+from mcp_client import LazyMCPClient, MCPClient
+
+SERVER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mcp_server.py")
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="uses a stdio subprocess")
+def test_idle_shutdown_rechecks_under_the_connect_lock(tmp_path):
+    async def main():
+        client = LazyMCPClient(
+            sys.executable, [SERVER], manifest_dir=str(tmp_path), idle_timeout=0.2
+        )
+        await client.connect()
+        try:
+            connection = client.connection
+            # Hold the lock until the idle check has passed and the shutdown
+            # is waiting for it, then start a request
+            async with client._connect_lock:
+                await asyncio.sleep(0.5)
+                request = asyncio.create_task(client.read_resource("docs://documents"))
+                await asyncio.sleep(0)
+            assert "plan.md" in await asyncio.wait_for(request, 10)
+            # The server that served the request is the one started above
+            assert client.connection is connection and client.is_connected
+        finally:
+            await client.cleanup()
+
+    asyncio.run(main())
+
+
+def test_exchange_without_connection_task_waits_on_the_request():
+    from mcp import types
+
+    from mcp_client import MCPClient
+
+    class FakeSession:
+        async def send_request(self, request, result_type, request_read_timeout_seconds=None):
+            return types.EmptyResult()
+
+    async def main():
+        client = MCPClient("unused", [])
+        # As while _stop_connection has cleared the task but not the session
+        client._session = FakeSession()
+        result = await client._exchange(
+            types.PingRequest(method="ping"), types.EmptyResult, None
+        )
+        assert isinstance(result, types.EmptyResult)
+
+    asyncio.run(main())
+
+
+def test_stop_connection_propagates_the_callers_cancellation():
+    from mcp_client import MCPClient
+
+    async def main():
+        client = MCPClient("unused", [])
+        client._stop_event = asyncio.Event()
+        # A connection that doesn't react to the stop event, like a hung server
+        client._connection_task = asyncio.create_task(asyncio.sleep(60))
+        connection = client._connection_task
+
+        stopping = asyncio.create_task(client._stop_connection())
+        await asyncio.sleep(0.05)
+        stopping.cancel()
+        try:
+            await stopping
+        except asyncio.CancelledError:
+            pass
+        else:
+            raise AssertionError("_stop_connection swallowed the cancellation")
+        await asyncio.sleep(0)
+        assert connection.cancelled()
+        assert client._session is None
+
+    asyncio.run(main())
+
+
+def _kill_server():
+    """SIGKILLs the mcp_server.py processes started by this test process."""
+    killed = 0
+    for pid in filter(str.isdigit, os.listdir("/proc")):
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                cmdline = f.read()
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == os.getpid() and b"mcp_server.py" in cmdline:
+            os.kill(int(pid), signal.SIGKILL)
+            killed += 1
+    assert killed, "no server process found"
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="finds the server through /proc")
+def test_idempotent_request_after_a_crash_respawns_the_server():
+    async def main():
+        async with MCPClient(sys.executable, [SERVER], auto_reconnect=True) as client:
+            connection = client.connection
+            _kill_server()
+            assert "plan.md" in await asyncio.wait_for(
+                client.read_resource("docs://documents"), 15
+            )
+            assert client.connection is not connection
+
+    asyncio.run(main())
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="finds the server through /proc")
+def test_supervisor_restarts_a_crashed_server_and_runs_reconnect_handlers():
+    async def main():
+        async with MCPClient(sys.executable, [SERVER]) as client:
+            reconnected = asyncio.Event()
+
+            async def on_reconnect():
+                reconnected.set()
+
+            client.on_reconnect(on_reconnect)
+            async with ServerSupervisor({"docs": client}, interval=0.2) as supervisor:
+                _kill_server()
+                await asyncio.wait_for(reconnected.wait(), 15)
+                assert supervisor.restarts == {"docs": 1}
+                result = await client.call_tool(
+                    "read_document", {"doc_id": "plan.md"}, idempotent=True
+                )
+                assert not result.isError
+
+    asyncio.run(main())
@@ -0,0 +1,47 @@
+import mcp_server
+from mcp_server import docs, edit_document
+
+
+def _edit(doc_id, text, old_str, new_str):
+    docs[doc_id] = text
+    try:
+        return edit_document(doc_id, old_str, new_str)
+    finally:
+        del docs[doc_id]
+
+
+def test_edit_inside_a_long_line_shows_the_change():
+    text = "lorem ipsum " * 1250 + "TARGET" + " dolor sit" * 1000
+    result = _edit("long.md", text, "TARGET", "CHANGED")
+    assert result["matches"] == 1
+    assert "-..." in result["diff"] and "TARGET" in result["diff"]
+    assert "CHANGED" in result["diff"]
+    assert len(result["diff"]) < 600
+
+
+def test_edit_diff_groups_nearby_matches_and_counts_lines():
+    text = "first line\nsecond a b a\n" + "filler\n" * 50 + "last a"
+    result = _edit("multi.md", text, "a", "A")
+    diff = result["diff"]
+    assert result["matches"] == 4
+    # One hunk per line with matches, holding only that line
+    assert diff.splitlines()[2:] == [
+        "@@ line 2 @@",
+        "-second a b a",
+        "+second A b A",
+        "@@ line 53 @@",
+        "-last a",
+        "+lAst A",
+    ]
+
+
+def test_edit_diff_is_capped():
+    text = "\n\n".join(f"paragraph {i} with x in it" for i in range(200))
+    diff = _edit("many.md", text, "x", "y")["diff"]
+    assert len(diff) <= mcp_server.EDIT_DIFF_MAX_CHARS + 40
+    assert "more" in diff.splitlines()[-1]
+
+
+def test_edit_without_matches_has_no_diff():
+    result = _edit("none.md", "unchanged", "missing", "x")
+    assert result["matches"] == 0 and result["diff"] == ""
@@ -0,0 +1,107 @@
+import os
+
+from core.session_log import SessionLog
+
+
+def _turn(n):
+    return [
+        {"role": "user", "content": f"question {n}"},
+        {"role": "assistant", "content": f"answer {n} – ünïcode"},
+    ]
+
+
+def test_round_trip_across_reopen(tmp_path):
+    path = str(tmp_path / "logs" / "work.log")
+    log = SessionLog(path)
+    for n in range(3):
+        assert log.append(_turn(n), model="test") == n
+    log.close()
+
+    log = SessionLog(path)
+    assert len(log) == 3
+    assert log.turn(1) == {"messages": _turn(1), "model": "test"}
+    assert log.latest()["messages"] == _turn(2)
+    assert log.load_messages() == _turn(0) + _turn(1) + _turn(2)
+    log.append(_turn(3))
+    assert log.latest()["messages"] == _turn(3)
+    log.close()
+
+
+def test_load_messages_last_turns(tmp_path):
+    log = SessionLog(str(tmp_path / "work.log"))
+    for n in range(5):
+        log.append(_turn(n))
+    assert log.load_messages(2) == _turn(3) + _turn(4)
+    assert log.load_messages(10) == log.load_messages()
+    assert log.load_messages(0) == []
+    log.close()
+
+
+def test_empty_log(tmp_path):
+    log = SessionLog(str(tmp_path / "work.log"))
+    assert len(log) == 0
+    assert log.latest() is None
+    assert log.load_messages() == []
+    log.close()
+
+
+def test_partially_written_turn_is_dropped(tmp_path):
+    path = str(tmp_path / "work.log")
+    log = SessionLog(path)
+    log.append(_turn(0))
+    log.append(_turn(1))
+    log.close()
+    # A crash in the middle of the second record
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 5)
+
+    log = SessionLog(path)
+    assert len(log) == 1
+    assert log.load_messages() == _turn(0)
+    log.append(_turn(2))
+    log.close()
+
+    log = SessionLog(path)
+    assert log.load_messages() == _turn(0) + _turn(2)
+    log.close()
+
+
+def test_resume_reads_from_the_latest_snapshot(tmp_path):
+    path = str(tmp_path / "work.log")
+    log = SessionLog(path, snapshot_every=4)
+    for n in range(10):
+        log.append(_turn(n))
+    assert "snapshot" in log.turn(3) and "snapshot" in log.turn(7)
+    assert "snapshot" not in log.turn(8)
+    log.close()
+
+    log = SessionLog(path, snapshot_every=4)
+    reads = []
+    turn = log.turn
+    log.turn = lambda index: reads.append(index) or turn(index)
+    expected = [m for n in range(10) for m in _turn(n)]
+    assert log.load_messages() == expected
+    # Back to the snapshot in turn 7, then the two turns after it
+    assert sorted(set(reads)) == [7, 8, 9]
+    assert log.load_messages(3) == expected[-6:]
+    log.close()
+
+
+def test_snapshot_dropped_by_a_crash_falls_back_to_the_previous_one(tmp_path):
+    path = str(tmp_path / "work.log")
+    log = SessionLog(path, snapshot_every=2)
+    for n in range(4):
+        log.append(_turn(n))
+    log.close()
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 5)
+
+    log = SessionLog(path, snapshot_every=2)
+    assert log.load_messages() == _turn(0) + _turn(1) + _turn(2)
+    log.append(_turn(3))
+    assert "snapshot" in log.latest()
+    log.close()
+
+    log = SessionLog(path, snapshot_every=2)
+    assert log.load_messages() == [m for n in range(4) for m in _turn(n)]
+    log.close()
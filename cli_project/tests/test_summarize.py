@@ -0,0 +1,67 @@
+import asyncio
+import threading
+
+import pytest
+
+from core.summarize import MapReduceSummarizer
+
+
+class FakeProvider:
+    """Answers map prompts with a short summary; fails on `fail_on`."""
+
+    def __init__(self, fail_on=None, delay=0.0):
+        self.fail_on = fail_on
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def chat(self, messages, tools=None):
+        with self._lock:
+            self.calls += 1
+        prompt = messages[-1]["content"]
+        if self.fail_on and self.fail_on in prompt:
+            raise RuntimeError("provider failed")
+        if self.delay:
+            threading.Event().wait(self.delay)
+        return "summary of " + prompt.splitlines()[0][-20:]
+
+    def text_from_message(self, response):
+        return response
+
+
+def _chunks(n):
+    return [{"index": i, "hash": f"h{i}", "text": f"chunk text {i}"} for i in range(n)]
+
+
+def test_summarize_chunks_uses_cache_on_second_run():
+    provider = FakeProvider()
+    summarizer = MapReduceSummarizer(provider, concurrency=3)
+    first = asyncio.run(summarizer.summarize_chunks("doc.md", _chunks(10)))
+    calls = provider.calls
+    second = asyncio.run(summarizer.summarize_chunks("doc.md", _chunks(10)))
+    assert first == second and len(first) == 10
+    assert provider.calls == calls
+
+
+def test_failed_chunk_raises_instead_of_hanging():
+    provider = FakeProvider(fail_on="chunk text 0", delay=0.2)
+    summarizer = MapReduceSummarizer(provider, concurrency=2)
+
+    async def main():
+        with pytest.raises(RuntimeError, match="provider failed"):
+            await asyncio.wait_for(summarizer.summarize_chunks("doc.md", _chunks(20)), 5)
+
+    asyncio.run(main())
+
+
+def test_cancelled_summary_does_not_hang():
+    summarizer = MapReduceSummarizer(FakeProvider(delay=0.2), concurrency=2)
+
+    async def main():
+        task = asyncio.create_task(summarizer.summarize_chunks("doc.md", _chunks(20)))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.wait_for(asyncio.gather(task, return_exceptions=True), 5)
+        assert task.cancelled()
+
+    asyncio.run(main())
@@ -0,0 +1,25 @@
+import pytest
+
+from core.tool_results import ToolResultPipeline
+from core.tools import ToolManager
+
+
+@pytest.fixture
+def fresh_pipeline(monkeypatch):
+    monkeypatch.setattr(ToolManager, "result_pipeline", None)
+
+
+def test_pipeline_reads_settings_set_after_import(fresh_pipeline, monkeypatch):
+    # As load_dotenv does in main.py, after core.tools was imported
+    monkeypatch.setenv("TOOL_RESULT_MAX_CHARS", "123")
+    monkeypatch.setenv("TOOL_RESULT_STRATEGY", "head")
+    policy = ToolManager.get_result_pipeline().default_policy
+    assert (policy.max_chars, policy.strategy) == (123, "head")
+    assert ToolManager.get_result_pipeline() is ToolManager.get_result_pipeline()
+
+
+def test_invalid_strategy_fails_when_built():
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("TOOL_RESULT_STRATEGY", "bogus")
+        with pytest.raises(ValueError, match="bogus"):
+            ToolResultPipeline.from_env()